@@ -0,0 +1,56 @@
+"""
+Size and speed of the students.data codecs (cliApp.core.codec) on a generated
+cohort, against the original pretty-printed JSON:
+
+  size     bytes on disk, and as a share of the pretty JSON
+  encode   records -> bytes, what every full rewrite pays
+  decode   bytes -> records, what every full load pays
+
+Times are the best of --repeat runs.
+
+Run from the project root:
+    python -m benchmarks.codecs [--students 100k] [--repeat 3] [--codecs json,minified,gzip,binary]
+"""
+import argparse, json, time
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.cohort import parse_size, make_records
+from cliApp.core.codec import CODECS, decode, encode
+
+def _best(fn: Callable[[], object], repeat: int) -> Tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+def run(n: int, codecs: List[str], repeat: int) -> Dict[str, Tuple[int, float, float]]:
+    # codec -> (bytes, encode seconds, decode seconds)
+    records = json.loads(json.dumps(make_records(n)))   # fresh strings, as after a load
+    out: Dict[str, Tuple[int, float, float]] = {}
+    for name in codecs:
+        enc, data = _best(lambda: encode(records, name), repeat)
+        dec, back = _best(lambda: decode(data), repeat)
+        if back != records:
+            raise SystemExit(f"{name}: records changed in the round trip")
+        out[name] = (len(data), enc, dec)
+    return out
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", default="100k", help="1k, 100k, 1m or a number")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--codecs", default=",".join(CODECS))
+    args = ap.parse_args(argv)
+    n = parse_size(args.students)
+    codecs = [c.strip() for c in args.codecs.split(",") if c.strip()]
+    results = run(n, codecs, args.repeat)
+    base = results.get("json", next(iter(results.values())))[0]
+    print(f"{n} students")
+    print(f"  {'codec':<10} {'size':>14} {'':>6} {'encode':>11} {'decode':>11}")
+    for name, (size, enc, dec) in results.items():
+        print(f"  {name:<10} {size:>14,} {size / base:>6.0%} {enc * 1000:>8.0f} ms {dec * 1000:>8.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Seeded generator for realistic students.data files.
+
+Every student gets a distinct random id (6 digits, then 7 once the 6-digit
+space is used up, like the id allocator), a "First Last" name, an email and
+password that pass the CLI's format checks, and 0-4 subjects with random marks.
+The same --seed always gives the same file.
+
+Run from the project root:
+    python -m benchmarks.cohort --students 100k [--seed 42] [--backend json|journal|sqlite|sharded|records] [--out students.data]
+"""
+import argparse, os, random, time
+from typing import Dict, List
+
+from cliApp.core.models import grade_from_mark
+from cliApp.core.store import BACKENDS, open_store
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+FIRST = ["james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda", "william", "elizabeth",
+         "david", "susan", "richard", "jessica", "joseph", "sarah", "thomas", "karen", "charles", "nancy",
+         "wei", "mei", "hiroshi", "yuki", "arjun", "priya", "omar", "fatima", "lucas", "sofia"]
+LAST = ["smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis", "rodriguez", "martinez",
+        "wilson", "anderson", "taylor", "thomas", "moore", "jackson", "martin", "lee", "nguyen", "chen",
+        "wang", "kim", "patel", "singh", "khan", "tanaka", "silva", "rossi", "muller", "dubois"]
+
+def parse_size(text: str) -> int:
+    # "1k" / "100k" / "1m" or a plain number
+    text = text.strip().lower()
+    return SIZES[text] if text in SIZES else int(text.replace("_", ""))
+
+def _letters(n: int) -> str:
+    # 0 -> "a", 25 -> "z", 26 -> "aa", ...: makes emails unique without digits
+    out = ""
+    n += 1
+    while n:
+        n, r = divmod(n - 1, 26)
+        out = chr(97 + r) + out
+    return out
+
+def make_ids(n: int, rnd: random.Random) -> List[str]:
+    ids = [f"{i:06d}" for i in rnd.sample(range(1, 1_000_000), min(n, 999_999))]
+    width, low = 7, 1_000_000
+    while len(ids) < n:
+        high = 10 ** width
+        take = min(n - len(ids), high - low)
+        ids += [f"{i:0{width}d}" for i in rnd.sample(range(low, high), take)]
+        width, low = width + 1, high
+    return ids
+
+def make_password(rnd: random.Random) -> str:
+    word = rnd.choice(FIRST)
+    return word[0].upper() + (word[1:] + "abcd")[:rnd.randint(4, 7)] + str(rnd.randint(100, 9999))
+
+def make_records(n: int, seed: int = 42) -> List[Dict]:
+    rnd = random.Random(seed)
+    out = []
+    for i, sid in enumerate(make_ids(n, rnd)):
+        first, last = rnd.choice(FIRST), rnd.choice(LAST)
+        subs = []
+        for j in rnd.sample(range(1000), rnd.randint(0, 4)):
+            mark = rnd.randint(25, 100)
+            subs.append({"id": f"{j:03d}", "mark": mark, "grade": grade_from_mark(mark)})
+        out.append({"id": sid, "name": f"{first.title()} {last.title()}",
+                    "email": f"{first}.{last}{_letters(i)}@university.com",
+                    "password": make_password(rnd), "subjects": subs})
+    return out
+
+def write_cohort(path: str, n: int, seed: int = 42, backend: str = "json") -> List[Dict]:
+    records = make_records(n, seed)
+    store = open_store(path, backend)
+    store.save_all(records)
+    store.close()
+    return records
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", default="1k", help="1k, 100k, 1m or a number")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--backend", choices=BACKENDS, default="json")
+    ap.add_argument("--out", default="students.data")
+    args = ap.parse_args(argv)
+    if os.path.exists(args.out):
+        ap.error(f"{args.out} already exists")
+    start = time.perf_counter()
+    n = parse_size(args.students)
+    write_cohort(args.out, n, args.seed, args.backend)
+    print(f"wrote {n} students to {args.out} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Multi-process stress run for the storage layer: many processes read and write
+one data file at once, then the result is checked for lost updates.
+
+Each worker repeatedly
+  - bumps a shared counter (student 000001's name) with read, +1, upsert,
+    retrying when the upsert is rejected as stale,
+  - enrols its own student in a new subject (through tracked_write, so the
+    persisted grade view is updated as well),
+  - reads the whole dataset.
+At the end the counter must equal the number of increments, every subject must
+be there, and the grade view must agree with the data (the persisted one, or
+the one rebuilt from the store if the workers' writes left it stale).
+
+Run from the project root:
+    python -m benchmarks.concurrency [--backend json|journal|sqlite|sharded|records] [--workers N] [--ops N]
+"""
+import argparse, json, multiprocessing, os, shutil, sys, tempfile, time
+from typing import Dict
+
+from cliApp.core.grade_view import GradeView, grade_view_for
+from cliApp.core.sidecar import tracked_write
+from cliApp.core.store import BACKENDS, StaleRecordError, open_store
+
+COUNTER_ID = "000001"
+
+def _student_id(worker: int) -> str:
+    return f"{worker + 2:06d}"
+
+def _worker(args) -> Dict[str, int]:
+    path, backend, worker, ops = args
+    store = open_store(path, backend)
+    grade_view_for(store).ensure(store)
+    stats = {"increments": 0, "retries": 0, "reads": 0}
+    sid = _student_id(worker)
+    for i in range(ops):
+        while True:
+            rec = store.get(COUNTER_ID)
+            rec["name"] = str(int(rec["name"]) + 1)
+            try:
+                store.upsert(rec)
+                break
+            except StaleRecordError:
+                stats["retries"] += 1
+        stats["increments"] += 1
+
+        sub = {"id": f"{i % 1000:03d}", "mark": 25 + (worker + i) % 76, "grade": "Z"}
+        tracked_write(store, lambda: store.add_subject(sid, sub),
+                      {GradeView: lambda v: v.update(sid, f"W{worker}",
+                                                     [int(s["mark"]) for s in store.get(sid)["subjects"]])})
+
+        if len(store.load_all()) < 2:
+            raise AssertionError("dataset shrank")
+        stats["reads"] += 1
+    grade_view_for(store).flush()
+    store.close()
+    return stats
+
+def run(backend: str, workers: int, ops: int) -> Dict:
+    folder = tempfile.mkdtemp(prefix="uni-stress-")
+    path = os.path.join(folder, "students.data")
+    try:
+        store = open_store(path, backend)
+        store.save_all([{"id": COUNTER_ID, "name": "0", "email": "counter.only@university.com",
+                         "password": "Password123", "subjects": []}] +
+                       [{"id": _student_id(w), "name": f"W{w}", "email": f"worker.no{chr(97 + w % 26)}@university.com",
+                         "password": "Password123", "subjects": []} for w in range(workers)])
+        store.close()
+
+        start = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(workers) as pool:
+            results = pool.map(_worker, [(path, backend, w, ops) for w in range(workers)])
+        seconds = time.perf_counter() - start
+
+        store = open_store(path, backend)
+        records = {r["id"]: r for r in store.load_all()}
+        counter = records[COUNTER_ID]
+        problems = []
+        if int(counter["name"]) != workers * ops:
+            problems.append(f"counter is {counter['name']}, expected {workers * ops} (lost updates)")
+        if int(counter.get("rev", 0)) != workers * ops:
+            problems.append(f"counter revision is {counter.get('rev')}, expected {workers * ops}")
+        for w in range(workers):
+            n = len(records[_student_id(w)]["subjects"])
+            if n != min(ops, 1000):
+                problems.append(f"worker {w} has {n} subjects, expected {min(ops, 1000)}")
+        view = GradeView.load(store.path + GradeView.suffix)
+        view_in_sync = view.in_sync(store.signature())
+        view.ensure(store)          # rebuilt from the store when stale, checked either way
+        if view.verify(list(records.values())):
+            problems.append("grade view disagrees with the data")
+        store.close()
+        return {
+            "backend": backend, "workers": workers, "ops_per_worker": ops, "seconds": round(seconds, 3),
+            "writes_per_second": round(2 * workers * ops / seconds, 1),
+            "stale_retries": sum(r["retries"] for r in results),
+            "grade_view_in_sync": view_in_sync,
+            "problems": problems,
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backend", choices=BACKENDS, action="append",
+                    help=f"repeatable; default: all of {', '.join(BACKENDS)}")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--ops", type=int, default=50, help="iterations per worker")
+    args = ap.parse_args(argv)
+    results = [run(b, args.workers, args.ops) for b in args.backend or BACKENDS]
+    print(json.dumps(results, indent=2))
+    if any(r["problems"] for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Memory footprint of the hydrated dataset: the original dict-backed models vs
+the __slots__ models in cliApp.core.models, plus the SubjectTable form.
+
+Run from the project root:
+    python -m benchmarks.memory [--students N]
+"""
+import argparse, gc, json, tracemalloc
+from typing import Callable, List
+
+from benchmarks import cohort
+from cliApp.core.models import Student, SubjectTable
+
+class LegacySubject:
+    # the models as they were before __slots__, kept here only for comparison
+    def __init__(self, sid, mark, grade):
+        self.id = sid
+        self.mark = mark
+        self.grade = grade
+
+class LegacyStudent:
+    def __init__(self, sid, name, email, password, subjects):
+        self.id = sid
+        self.name = name
+        self.email = email
+        self.password = password
+        self.subjects = subjects
+
+def make_records(n: int, seed: int = 42) -> List[dict]:
+    # round-trip through JSON so every string is a fresh object, as after json.load
+    return json.loads(json.dumps(cohort.make_records(n, seed)))
+
+def measure(build: Callable[[], object]) -> int:
+    # bytes still held by what build() returns; its inputs are created and
+    # released inside build(), so only what the result keeps alive is counted
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", type=int, default=100_000)
+    args = ap.parse_args(argv)
+
+    legacy = measure(lambda: [LegacyStudent(r["id"], r["name"], r["email"], r["password"],
+                                            [LegacySubject(s["id"], s["mark"], s["grade"]) for s in r["subjects"]])
+                              for r in make_records(args.students)])
+    slots = measure(lambda: [Student.from_dict(r) for r in make_records(args.students)])
+    table = measure(lambda: SubjectTable.from_records(make_records(args.students)))
+    raw = measure(lambda: make_records(args.students))
+
+    sizes = {"json_dicts": raw, "legacy_models": legacy, "slots_models": slots, "subject_table": table}
+    print(json.dumps({
+        "students": args.students,
+        "bytes": sizes,
+        "bytes_per_student": {k: round(v / args.students, 1) for k, v in sizes.items()},
+        "slots_vs_legacy": round(slots / legacy, 3),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Single-student operations on the fixed-width record store
+(cliApp.core.record_store, UNI_STORAGE=records) against the JSON file, on a
+generated cohort:
+
+  write all       save_all of the whole cohort
+  open + get      a fresh store (as a new process would) reading one student
+  get             one student by id
+  sign in         find_by_email, as authenticate does
+  remove subject  remove_subject then add_subject back (two writes)
+
+Per-operation times are medians over --ops random students (--json-ops for the
+JSON file, where every operation parses the whole of it).
+
+Run from the project root:
+    python -m benchmarks.records [--students 1m] [--ops 2000] [--json-ops 5]
+"""
+import argparse, os, random, shutil, tempfile, time
+from typing import Callable, Dict, List
+
+from benchmarks.cohort import parse_size, make_records
+from cliApp.core.record_store import RecordStore
+from cliApp.core.store import JsonStore, Store
+
+def _median(fn: Callable[[Dict], object], picks: List[Dict]) -> float:
+    times = []
+    for r in picks:
+        t = time.perf_counter()
+        fn(r)
+        times.append(time.perf_counter() - t)
+    return sorted(times)[len(times) // 2]
+
+def _swap_subject(store: Store, r: Dict) -> None:
+    s = r["subjects"][0]
+    store.remove_subject(r["id"], s["id"])
+    store.add_subject(r["id"], s)
+
+def run(n: int, ops: int, json_ops: int) -> Dict[str, Dict[str, float]]:
+    folder = tempfile.mkdtemp(prefix="uni-records-")
+    try:
+        records = make_records(n)
+        rnd = random.Random(3)
+        picks = [r for r in (rnd.choice(records) for _ in range(4 * ops)) if r["subjects"]][:ops]
+        out: Dict[str, Dict[str, float]] = {}
+        for name, make, count in (("json", lambda: JsonStore(os.path.join(folder, "students.data"), codec="json"), json_ops),
+                                  ("records", lambda: RecordStore(os.path.join(folder, "students.rec")), ops)):
+            store = make()
+            res = out[name] = {}
+            t = time.perf_counter()
+            store.save_all(records)
+            res["write all"] = time.perf_counter() - t
+            t = time.perf_counter()
+            fresh = make()
+            fresh.get(picks[0]["id"])
+            res["open + get"] = time.perf_counter() - t
+            fresh.close()
+            res["get"] = _median(lambda r: store.get(r["id"]), picks[:count])
+            res["sign in"] = _median(lambda r: store.find_by_email(r["email"]), picks[:count])
+            res["remove subject"] = _median(lambda r: _swap_subject(store, r), picks[:count])
+            store.close()
+        return out
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", default="1m", help="1k, 100k, 1m or a number")
+    ap.add_argument("--ops", type=int, default=2000, help="operations timed per kind (record store)")
+    ap.add_argument("--json-ops", type=int, default=5, help="operations timed per kind (JSON file)")
+    args = ap.parse_args(argv)
+    n = parse_size(args.students)
+    results = run(n, args.ops, args.json_ops)
+    print(f"{n} students")
+    print(f"  {'':<16}" + "".join(f"{name:>14}" for name in results))
+    for label in next(iter(results.values())):
+        cells = []
+        for res in results.values():
+            v = res[label]
+            cells.append(f"{v:>12.2f} s" if v >= 0.1 else f"{v * 1e6:>11.1f} us")
+        print(f"  {label:<16}" + "".join(cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Latency of the name/email lookup (cliApp.core.search) on a generated cohort:
+
+  build    the index from every record, then written and read back as <data>.search
+  update   one student registered, renamed and removed (incremental, no rebuild)
+  lookups  median and 99th percentile per kind of query: name and email
+           prefixes, a full name being typed, misspelt words, no match at all
+
+Run from the project root:
+    python -m benchmarks.search [--students 1m] [--queries 2000] [--limit 20]
+"""
+import argparse, os, random, shutil, tempfile, time
+from typing import Callable, Dict, List
+
+from benchmarks.cohort import parse_size, make_records
+from cliApp.core.search import SearchIndex
+
+def _typo(word: str, rnd: random.Random) -> str:
+    # swap two neighbouring letters or drop one
+    i = rnd.randrange(len(word) - 1)
+    if rnd.random() < 0.5:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + word[i + 1:]
+
+def _queries(records: List[Dict], n: int, seed: int) -> Dict[str, List[str]]:
+    rnd = random.Random(seed)
+    picks = [rnd.choice(records) for _ in range(n)]
+    return {
+        "name word prefix": [p["name"].split()[rnd.randrange(2)][:rnd.randint(1, 4)] for p in picks],
+        "email prefix": [p["email"][:rnd.randint(6, 14)] for p in picks],
+        "full name, typing": [p["name"][:len(p["name"].split()[0]) + rnd.randint(2, 4)] for p in picks],
+        "misspelt word": [_typo(p["name"].split()[1].lower(), rnd) for p in picks],
+        "misspelt full name": [" ".join(_typo(w.lower(), rnd) for w in p["name"].split()) for p in picks],
+        "no match": ["zq" + p["id"] for p in picks],
+    }
+
+def _latency(fn: Callable[[str], object], queries: List[str]) -> List[float]:
+    times = []
+    for q in queries:
+        t = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - t)
+    return sorted(times)
+
+def run(n: int, queries: int, limit: int) -> Dict[str, str]:
+    folder = tempfile.mkdtemp(prefix="uni-search-")
+    try:
+        records = make_records(n)
+        out: Dict[str, str] = {}
+        index = SearchIndex(os.path.join(folder, "students.data" + SearchIndex.suffix))
+        t = time.perf_counter()
+        index.rebuild(records)
+        out["build"] = f"{time.perf_counter() - t:9.2f} s"
+        index._synced, index._dirty = "bench", True
+        t = time.perf_counter()
+        index.flush()
+        out["save"] = f"{time.perf_counter() - t:9.2f} s"
+        t = time.perf_counter()
+        index = SearchIndex.load(index.path)
+        out["load"] = f"{time.perf_counter() - t:9.2f} s"
+
+        t = time.perf_counter()
+        index.update("0000000", "Ada Lovelace", "ada.lovelace@university.com")
+        index.update("0000000", "Ada King", "ada.king@university.com")
+        index.remove("0000000")
+        out["register, rename, remove"] = f"{(time.perf_counter() - t) * 1e6:9.1f} us"
+
+        for label, qs in _queries(records, queries, 7).items():
+            times = _latency(lambda q: index.search(q, limit), qs)
+            out[label] = (f"{times[len(times) // 2] * 1e6:9.1f} us median "
+                          f"{times[int(len(times) * 0.99)] * 1e6:9.1f} us p99")
+        return out
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", default="1m", help="1k, 100k, 1m or a number")
+    ap.add_argument("--queries", type=int, default=2000, help="lookups timed per kind")
+    ap.add_argument("--limit", type=int, default=20, help="matches asked for per lookup")
+    args = ap.parse_args(argv)
+    n = parse_size(args.students)
+    print(f"{n} students")
+    for label, value in run(n, args.queries, args.limit).items():
+        print(f"  {label:<26} {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Load test for the enrolment server (python -m cliApp.app serve): many
+concurrent client sessions against one server process.
+
+Each session signs in as its own student, then loops over get_student,
+enrol_new_subject and delete_subject; one session in 200 also asks for the
+pass/fail report (the whole dataset) every round, like an admin would. When
+the server is stopped, every student's subjects on disk must match what the
+session last saw.
+
+Run from the project root:
+    python -m benchmarks.service [--sessions N] [--rounds N] [--students N] [--backend json|journal|sqlite|sharded|records]
+"""
+import argparse, asyncio, json, os, shutil, signal, subprocess, sys, tempfile, time
+from typing import Dict, List
+
+from benchmarks.cohort import make_records
+from cliApp.core.store import BACKENDS, open_store
+from cliApp.net.client import AsyncServiceClient
+from cliApp.net.protocol import ServiceError
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not on Windows
+    resource = None
+
+def _raise_fd_limit() -> None:
+    # one socket per session on each side
+    if resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+async def _session(address: str, rec: Dict, rounds: int, admin: bool, latencies: List[float]) -> List[str]:
+    client = await AsyncServiceClient.connect(address)
+    try:
+        ok, code = await client.authenticate(rec["email"], rec["password"])
+        if not ok:
+            raise AssertionError(f"sign-in failed for {rec['email']}: {code}")
+        for i in range(rounds):
+            t = time.perf_counter()
+            student = await client.get_student(rec["email"])
+            if len(student["subjects"]) >= 4:
+                await client.delete_subject(rec["email"], student["subjects"][0]["id"])
+            else:
+                try:
+                    await client.enrol_new_subject(rec["email"])
+                except ServiceError as e:
+                    if e.code != "limit_reached":
+                        raise
+            if admin:
+                await client.grades_by_pass_fail()
+            latencies.append(time.perf_counter() - t)
+        return [s["id"] for s in (await client.get_student(rec["email"]))["subjects"]]
+    finally:
+        await client.close()
+
+async def _drive(address: str, records: List[Dict], rounds: int):
+    latencies: List[float] = []
+    start = time.perf_counter()
+    seen = await asyncio.gather(*(_session(address, r, rounds, i % 200 == 0, latencies)
+                                  for i, r in enumerate(records)))
+    return time.perf_counter() - start, latencies, seen
+
+def _wait_for(path: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if proc.poll() is not None or time.time() > deadline:
+            raise RuntimeError("server did not start")
+        time.sleep(0.05)
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=2000)
+    ap.add_argument("--rounds", type=int, default=20, help="request groups per session")
+    ap.add_argument("--students", type=int, default=20_000)
+    ap.add_argument("--backend", choices=BACKENDS, default="journal")
+    args = ap.parse_args(argv)
+    _raise_fd_limit()
+
+    folder = tempfile.mkdtemp(prefix="uni-service-")
+    try:
+        path = os.path.join(folder, "students.data")
+        records = make_records(args.students)
+        store = open_store(path, args.backend)
+        store.save_all(records)
+        store.close()
+
+        sock = os.path.join(folder, "uni.sock")
+        env = dict(os.environ, UNI_STORAGE=args.backend)
+        proc = subprocess.Popen([sys.executable, "-m", "cliApp.app", "serve", "--listen", f"unix:{sock}"],
+                                cwd=folder, env=dict(env, PYTHONPATH=os.getcwd()), stdout=subprocess.DEVNULL)
+        try:
+            _wait_for(sock, proc)
+            seconds, latencies, seen = asyncio.run(_drive(f"unix:{sock}", records[:args.sessions], args.rounds))
+        finally:
+            proc.send_signal(signal.SIGINT)
+            proc.wait(timeout=60)
+
+        stored = {r["id"]: [s["id"] for s in r["subjects"]] for r in open_store(path, args.backend).load_all()}
+        mismatched = [r["id"] for r, ids in zip(records, seen) if stored[r["id"]] != ids]
+        latencies.sort()
+        requests = len(latencies) * 2 + 2 * len(seen)      # get + write per round, sign-in and final get
+        print(json.dumps({
+            "backend": args.backend, "sessions": len(seen), "rounds": args.rounds, "students": args.students,
+            "seconds": round(seconds, 3),
+            "requests_per_second": round(requests / seconds),
+            "round_ms_p50": round(1000 * latencies[len(latencies) // 2], 2),
+            "round_ms_p99": round(1000 * latencies[int(len(latencies) * 0.99)], 2),
+            "mismatched_students": len(mismatched),
+        }, indent=2))
+        if mismatched:
+            sys.exit(1)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Start-up time of the CLI and the GUI, each measured in new interpreters so
+nothing is imported or cached in memory beforehand:
+
+  import   python -X importtime -c "import cliApp.app" (and guiApp.app): the
+           total, and the modules that cost the most (cumulative and self)
+  login    a process that opens the data and signs one student in, on a
+           generated cohort: with UNI_SNAPSHOT=0 (JSON parsed every time), with
+           the snapshot missing (parsed, then written), and with it in place
+
+Times are the best of --repeat runs.
+
+Run from the project root:
+    python -m benchmarks.startup [--students 100k] [--backend json|journal|sqlite|sharded|records] [--repeat 5] [--top 10]
+"""
+import argparse, os, shutil, subprocess, sys, tempfile
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.cohort import parse_size, write_cohort
+from cliApp.core.snapshot import SNAPSHOT_ENV, SUFFIX
+from cliApp.core.store import BACKENDS, STORAGE_ENV, open_store
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOGIN = ("import time; t = time.perf_counter(); "
+         "from cliApp.core.repository import get_repository; "
+         "assert get_repository().get_by_email({email!r}) is not None; "
+         "print(time.perf_counter() - t)")
+
+def _run(code: str, env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None,
+         flags: Tuple[str, ...] = ()) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=ROOT, **(env or {}))
+    return subprocess.run([sys.executable, *flags, "-c", code], env=env, cwd=cwd or ROOT,
+                          capture_output=True, text=True, check=True)
+
+def import_times(module: str, repeat: int) -> List[Tuple[str, int, int]]:
+    # (module, self us, cumulative us) from the fastest of `repeat` imports, costliest first
+    best: Optional[List[Tuple[str, int, int]]] = None
+    for _ in range(repeat):
+        rows = []
+        for line in _run(f"import {module}", flags=("-X", "importtime")).stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+                continue
+            own, cumulative, name = line[len("import time:"):].split("|")
+            rows.append((name.strip(), int(own), int(cumulative)))
+        total = next(c for n, _, c in rows if n == module)
+        if best is None or total < best[0][2]:
+            best = sorted(rows, key=lambda r: -r[2])
+    return best
+
+def login_times(n: int, backend: str, repeat: int) -> Dict[str, float]:
+    folder = tempfile.mkdtemp(prefix="uni-startup-")
+    try:
+        path = os.path.join(folder, "students.data")
+        records = write_cohort(path, n, backend=backend)
+        code = LOGIN.format(email=records[len(records) // 2]["email"])
+        env = {STORAGE_ENV: backend}
+        store = open_store(path, backend)
+        snap = store.path + SUFFIX if store.files() else None   # sqlite is queried directly, no snapshot
+        store.close()
+        out: Dict[str, float] = {}
+        cases = [("parse (UNI_SNAPSHOT=0)", "0", False)]
+        if snap:
+            cases += [("snapshot missing", "1", True), ("snapshot", "1", False)]
+        for label, flag, remove in cases:
+            times = []
+            for _ in range(repeat):
+                if remove and os.path.exists(snap):
+                    os.remove(snap)
+                times.append(float(_run(code, dict(env, **{SNAPSHOT_ENV: flag}), cwd=folder).stdout))
+            out[label] = min(times)
+        return out
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", default="100k", help="1k, 100k, 1m or a number")
+    ap.add_argument("--backend", choices=BACKENDS, default="json")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="modules listed per app")
+    args = ap.parse_args(argv)
+
+    for module in ("cliApp.app", "guiApp.app"):
+        rows = import_times(module, args.repeat)
+        print(f"import {module}: {rows[0][2] / 1000:.1f} ms")
+        for name, own, cumulative in rows[1:args.top + 1]:
+            print(f"  {cumulative / 1000:>8.1f} ms  {own / 1000:>7.1f} ms self  {name}")
+    n = parse_size(args.students)
+    for label, seconds in login_times(n, args.backend, args.repeat).items():
+        print(f"start + sign in, {n} students, {label:<24} {seconds * 1000:>9.1f} ms")
+
+if __name__ == "__main__":
+    main()
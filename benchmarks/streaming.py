@@ -0,0 +1,69 @@
+"""
+Streamed reads of students.data (cliApp.core.stream) against loading it whole,
+on a generated cohort written as pretty-printed JSON:
+
+  list      every student's name, id and email: time to the first one, total
+            time and peak memory (tracemalloc)
+  report    the g report's buckets: from every record loaded at once
+            (GradeView.rebuild) and in one streamed pass (stream_report)
+
+Run from the project root:
+    python -m benchmarks.streaming [--students 1m]
+"""
+import argparse, os, shutil, tempfile, time, tracemalloc
+from typing import Callable, Dict, Iterator, Tuple
+
+from benchmarks.cohort import parse_size, make_records
+from cliApp.core.grade_view import GradeView, stream_report
+from cliApp.core.store import JsonStore
+
+def _measure(run: Callable[[], Iterator]) -> Tuple[float, float, int]:
+    # (seconds to the first item, seconds in all, peak bytes allocated)
+    tracemalloc.start()
+    t = time.perf_counter()
+    first = None
+    for _ in run():
+        if first is None:
+            first = time.perf_counter() - t
+    total = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first or total, total, peak
+
+def _loaded_report(store: JsonStore) -> Iterator:
+    view = GradeView("unused")
+    view.rebuild(store.load_all())
+    for rows in view.by_grade().values():
+        yield from rows
+
+def _streamed_report(store: JsonStore) -> Iterator:
+    with stream_report(store.iter_records(), by_grade=True) as buckets:
+        for k in ("N/A", "Z", "P", "C", "D", "HD"):
+            yield from buckets.rows(k)
+
+def run(n: int) -> Dict[str, Tuple[float, float, int]]:
+    folder = tempfile.mkdtemp(prefix="uni-stream-")
+    try:
+        store = JsonStore(os.path.join(folder, "students.data"), codec="json")
+        store.save_all(make_records(n))
+        return {
+            "list, loaded": _measure(lambda: ((r["name"], r["id"], r["email"]) for r in store.load_all())),
+            "list, streamed": _measure(lambda: ((r["name"], r["id"], r["email"]) for r in store.iter_records())),
+            "report, loaded": _measure(lambda: _loaded_report(store)),
+            "report, streamed": _measure(lambda: _streamed_report(store)),
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", default="1m", help="1k, 100k, 1m or a number")
+    args = ap.parse_args(argv)
+    n = parse_size(args.students)
+    print(f"{n} students")
+    print(f"  {'':<18} {'first':>10} {'total':>10} {'peak memory':>14}")
+    for label, (first, total, peak) in run(n).items():
+        print(f"  {label:<18} {first * 1000:>7.1f} ms {total:>8.2f} s {peak / 2 ** 20:>10.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Timing and peak-memory benchmarks for the CLI and GUI data paths.
+
+For each cohort size a seeded students.data is generated (benchmarks.cohort)
+in a temp folder, then every benchmark is run --repeat times:
+
+  cli.load_students / cli.save_students    Database.load_students / save_students
+  cli.login_cold / cli.login_warm          sign-in lookup, first in the process / repeated
+  cli.enrol_subject                        enrolment_controller.enrol_subject
+  cli.group_by_grade[_cold]                admin_controller.admin_group_by_grade (g)
+  cli.group_pass_fail[_cold]               admin_controller.admin_group_pass_fail (p)
+  gui.authenticate_cold / _warm            DatabaseManager.authenticate
+  gui.enrol / gui.delete                   DatabaseManager.enrol_new_subject / delete_subject
+
+"_cold" runs start from a fresh process state (nothing loaded or cached in
+memory, the files on disk as they are). Times are wall-clock seconds
+(min and median over the repeats); peak_bytes is the tracemalloc peak of one
+extra run. Results are written as JSON; --compare OLD.json prints the change in
+median time against an earlier run and exits non-zero on a slowdown beyond
+--threshold.
+
+Run from the project root:
+    python -m benchmarks.suite [--sizes 1k,100k,1m] [--backend json|journal|sqlite|sharded|records] [--repeat 5]
+                               [--only PREFIX] [--out results.json] [--compare OLD.json]
+"""
+import argparse, contextlib, gc, io, json, os, platform, shutil, statistics, subprocess, sys, tempfile, time, tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.cohort import parse_size, write_cohort
+from cliApp.cli import ui
+from cliApp.cli.admin_controller import admin_group_by_grade, admin_group_pass_fail
+from cliApp.cli.enrolment_controller import enrol_subject
+from cliApp.core import repository, sidecar
+from cliApp.core.db import Database
+from cliApp.core.store import BACKENDS, open_store
+from guiApp.database_manager import DatabaseManager
+
+Setup = Callable[["Cohort"], Callable[[], object]]   # prepares one run, returns what to time
+
+class Cohort:
+    # one generated data file plus what the benchmarks need to pick targets from it
+    def __init__(self, folder: str, n: int, seed: int, backend: str):
+        self.path = os.path.join(folder, "students.data")
+        self.backend = backend
+        self.records = write_cohort(self.path, n, seed, backend)
+        self.emails = [r["email"] for r in self.records]
+        self._dm: Optional[DatabaseManager] = None
+        self._enrol = self._targets(lambda r: len(r["subjects"]) < 3)
+        self._delete = self._targets(lambda r: len(r["subjects"]) > 1)
+
+    def _targets(self, wanted: Callable[[Dict], bool]) -> Iterator[Dict]:
+        # a different student each run; none is used twice in a row
+        while True:
+            yield from (r for r in self.records if wanted(r))
+
+    def next_enrol(self) -> Dict:
+        return next(self._enrol)
+
+    def next_delete(self) -> Dict:
+        return next(self._delete)
+
+    def middle_email(self) -> str:
+        return self.emails[len(self.emails) // 2]
+
+    def fresh(self) -> None:
+        # forget everything this process loaded or cached, as if it had just started
+        # (after saving the sidecars, as the exit handler of a real process would)
+        self.close_sidecars()
+        repository._repo = None
+        Database.use(open_store(self.path, self.backend))
+        self._dm = None
+
+    @staticmethod
+    def close_sidecars() -> None:
+        for sc in sidecar._open.values():
+            sc.flush()
+        sidecar._open.clear()
+
+    def manager(self) -> DatabaseManager:
+        if self._dm is None:
+            self._dm = DatabaseManager(self.path, open_store(self.path, self.backend))
+        return self._dm
+
+# ------------------------------- benchmarks --------------------------------
+
+def _load(c: Cohort):
+    c.fresh()
+    return Database.load_students
+
+def _save(c: Cohort):
+    c.fresh()
+    students = Database.load_students()
+    return lambda: Database.save_students(students)
+
+def _login_cold(c: Cohort):
+    c.fresh()
+    email = c.middle_email()
+    return lambda: repository.get_repository().get_by_email(email)
+
+def _login_warm(c: Cohort):
+    email = c.middle_email()
+    repository.get_repository()
+    return lambda: repository.get_repository().get_by_email(email)
+
+def _cli_enrol(c: Cohort):
+    stu = repository.get_repository().get_by_email(c.next_enrol()["email"])
+    return lambda: enrol_subject(0, stu)
+
+def _report(show: Callable[[int], None], cold: bool) -> Setup:
+    def setup(c: Cohort):
+        if cold:
+            c.fresh()
+        else:
+            repository.get_grade_view()
+        return lambda: show(0)
+    return setup
+
+def _gui_auth(cold: bool) -> Setup:
+    def setup(c: Cohort):
+        if cold:
+            c.fresh()
+        rec = c.records[len(c.records) // 2]
+        dm = c.manager()
+        if not cold:
+            dm.authenticate(rec["email"], rec["password"])
+        return lambda: dm.authenticate(rec["email"], rec["password"])
+    return setup
+
+def _gui_enrol(c: Cohort):
+    dm, email = c.manager(), c.next_enrol()["email"]
+    return lambda: dm.enrol_new_subject(email)
+
+def _gui_delete(c: Cohort):
+    dm, email = c.manager(), c.next_delete()["email"]
+    subject = dm.get_student(email)["subjects"][0]["id"]
+    return lambda: dm.delete_subject(email, subject)
+
+BENCHMARKS: List[Tuple[str, Setup]] = [
+    ("cli.load_students", _load),
+    ("cli.save_students", _save),
+    ("cli.login_cold", _login_cold),
+    ("cli.login_warm", _login_warm),
+    ("cli.enrol_subject", _cli_enrol),
+    ("cli.group_by_grade_cold", _report(admin_group_by_grade, cold=True)),
+    ("cli.group_by_grade", _report(admin_group_by_grade, cold=False)),
+    ("cli.group_pass_fail_cold", _report(admin_group_pass_fail, cold=True)),
+    ("cli.group_pass_fail", _report(admin_group_pass_fail, cold=False)),
+    ("gui.authenticate_cold", _gui_auth(cold=True)),
+    ("gui.authenticate_warm", _gui_auth(cold=False)),
+    ("gui.enrol", _gui_enrol),
+    ("gui.delete", _gui_delete),
+]
+
+# --------------------------------- runner ----------------------------------
+
+def _quiet(fn: Callable[[], object]) -> Callable[[], object]:
+    # the CLI functions print their reports: collect them in memory instead
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+            ui.flush()
+    return run
+
+def measure(cohort: Cohort, setup: Setup, repeat: int) -> Dict:
+    times = []
+    for _ in range(repeat):
+        fn = _quiet(setup(cohort))
+        gc.collect()
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    fn = _quiet(setup(cohort))
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds_min": round(min(times), 6), "seconds_median": round(statistics.median(times), 6),
+            "peak_bytes": peak}
+
+def run(sizes: List[int], backend: str, repeat: int, seed: int, only: Optional[str] = None) -> Dict:
+    ui.start_batch([], use_colour=False)
+    results = []
+    for n in sizes:
+        folder = tempfile.mkdtemp(prefix="uni-bench-")
+        try:
+            cohort = Cohort(folder, n, seed, backend)
+            for name, setup in BENCHMARKS:
+                if only and not name.startswith(only):
+                    continue
+                row = {"name": name, "students": n, **measure(cohort, setup, repeat)}
+                print(f"{n:>9} {name:<26} {row['seconds_median'] * 1000:>11.3f} ms  "
+                      f"{row['peak_bytes'] / 2 ** 20:>9.1f} MiB", file=sys.stderr)
+                results.append(row)
+            cohort.close_sidecars()
+            Database.store().close()
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+    return {"meta": _meta(backend, repeat, seed), "results": results}
+
+def _meta(backend: str, repeat: int, seed: int) -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"backend": backend, "repeat": repeat, "seed": seed, "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+def compare(old: Dict, new: Dict, threshold: float) -> List[str]:
+    # benchmarks whose median got slower by more than `threshold` (0.2 = 20%)
+    before = {(r["name"], r["students"]): r for r in old["results"]}
+    slower = []
+    for r in new["results"]:
+        prev = before.get((r["name"], r["students"]))
+        if prev is None or not prev["seconds_median"]:
+            continue
+        ratio = r["seconds_median"] / prev["seconds_median"]
+        print(f"{r['students']:>9} {r['name']:<26} x{ratio:.2f}", file=sys.stderr)
+        if ratio > 1 + threshold:
+            slower.append(f"{r['name']} @ {r['students']}: x{ratio:.2f}")
+    return slower
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="1k,100k", help="comma-separated: 1k, 100k, 1m or numbers")
+    ap.add_argument("--backend", choices=BACKENDS, default="json")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--only", default=None, help="run only benchmarks whose name starts with this")
+    ap.add_argument("--out", default="bench-results.json")
+    ap.add_argument("--compare", default=None, help="earlier results file to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression")
+    args = ap.parse_args(argv)
+
+    results = run([parse_size(s) for s in args.sizes.split(",")], args.backend, args.repeat, args.seed, args.only)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.out}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(json.load(f), results, args.threshold)
+        if slower:
+            print("slower than before:\n  " + "\n  ".join(slower), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Cost of writing many changes one at a time versus in one transaction, on a
+generated cohort:
+
+  per-op       K students each enrolled in a subject, one store write each
+  transaction  the same K enrolments inside one StudentRepository.transaction()
+  threads      T threads each committing M one-enrolment transactions, straight
+               to the store and then through a GroupCommit (writes counted)
+
+Run from the project root:
+    python -m benchmarks.transactions [--students 10000] [--backend json|journal|sqlite|sharded|records] [--enrol 200] [--threads 8] [--ops 25]
+"""
+import argparse, os, shutil, tempfile, threading, time
+from typing import Callable, Dict
+
+from benchmarks.cohort import parse_size, write_cohort
+from cliApp.core import repository
+from cliApp.core.db import Database
+from cliApp.core.models import Subject
+from cliApp.core.store import BACKENDS, open_store
+from cliApp.core.transaction import GroupCommit
+
+def _enrol(repo: repository.StudentRepository, k: int, subject_id: str) -> None:
+    for stu in repo.all()[:k]:
+        stu.subjects = [s for s in stu.subjects if s.id != subject_id][:3]   # room for one more
+        repo.add_subject(stu, Subject(subject_id, 70))
+
+def _threads(n: int, ops: int, commit: Callable[[int, int], None]) -> float:
+    start = time.perf_counter()
+    workers = [threading.Thread(target=lambda w=w: [commit(w, i) for i in range(ops)]) for w in range(n)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start
+
+def run(n: int, backend: str, k: int, threads: int, ops: int) -> Dict[str, str]:
+    folder = tempfile.mkdtemp(prefix="uni-tx-")
+    try:
+        path = os.path.join(folder, "students.data")
+        records = write_cohort(path, n, backend=backend)
+        Database.use(open_store(path, backend))
+        out: Dict[str, str] = {}
+
+        repo = repository.get_repository()
+        t = time.perf_counter()
+        _enrol(repo, k, "901")
+        out[f"per-op ({k} writes)"] = f"{(time.perf_counter() - t) * 1000:9.1f} ms"
+
+        repo = repository.get_repository()
+        t = time.perf_counter()
+        with repo.transaction():
+            _enrol(repo, k, "902")
+        out["transaction (1 write)"] = f"{(time.perf_counter() - t) * 1000:9.1f} ms"
+
+        store = Database.store()
+        ids = [r["id"] for r in records[:threads]]
+        def direct(w: int, i: int) -> None:
+            with store.transaction() as tx:
+                tx.add_subject(ids[w], {"id": f"{i % 1000:03d}", "mark": 50, "grade": "P"})
+        seconds = _threads(threads, ops, direct)
+        out[f"threads, direct ({threads * ops} writes)"] = f"{seconds * 1000:9.1f} ms"
+
+        group = GroupCommit(store)
+        def grouped(w: int, i: int) -> None:
+            with group.transaction() as tx:
+                tx.add_subject(ids[w], {"id": f"{i % 1000:03d}", "mark": 50, "grade": "P"})
+        seconds = _threads(threads, ops, grouped)
+        out[f"threads, group commit ({group.batches} writes)"] = f"{seconds * 1000:9.1f} ms"
+        return out
+    finally:
+        Database.store().close()
+        Database._store = None
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--students", default="10000", help="1k, 100k, 1m or a number")
+    ap.add_argument("--backend", choices=BACKENDS, default="json")
+    ap.add_argument("--enrol", type=int, default=200, help="students enrolled per-op and in one transaction")
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--ops", type=int, default=25, help="transactions per thread")
+    args = ap.parse_args(argv)
+    n = parse_size(args.students)
+    print(f"{n} students, {args.backend}")
+    for label, value in run(n, args.backend, args.enrol, args.threads, args.ops).items():
+        print(f"  {label:<36} {value}")
+
+if __name__ == "__main__":
+    main()
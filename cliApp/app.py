@@ -1,12 +1,101 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse, sys
+
 from .cli.university_menu import university_menu
+from .cli.bulk_controller import run_import, run_export, run_enrol
+from .cli.server_controller import run_serve
+from .cli.admin_controller import run_query, run_search
+from .cli import ui
 from .cli.ui import say, C_YELLOW
+from .core import metrics
+from .core.bulk import FORMATS
+from .core.search import SEARCH_LIMIT
+from .net.protocol import server_address
 
-if __name__ == "__main__":
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m cliApp.app",
+                                     description="University system (interactive menu when run without a command)")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"time storage/controller/output calls and print a report at exit (or set {metrics.PROFILE_ENV}=1)")
+    parser.add_argument("--cprofile", metavar="FILE", default=None,
+                        help=f"also run under cProfile and save the stats to FILE (or set {metrics.CPROFILE_ENV})")
+    sub = parser.add_subparsers(dest="command")
+
+    imp = sub.add_parser("import", help="bulk-load students from CSV or JSONL")
+    imp.add_argument("path", help="input file, or - for stdin")
+    imp.add_argument("--format", choices=FORMATS, help="default: from the file extension (csv unless .jsonl)")
+    imp.add_argument("--batch-size", type=int, default=5000, help="rows written per storage commit")
+
+    exp = sub.add_parser("export", help="write every student as CSV or JSONL")
+    exp.add_argument("path", help="output file, or - for stdout")
+    exp.add_argument("--format", choices=FORMATS)
+    exp.add_argument("--batch-size", type=int, default=5000)
+
+    enr = sub.add_parser("enrol", help="enrol a cohort of students in one more subject, in one write")
+    enr.add_argument("ids", nargs="*", help="student ids (default: every student)")
+    enr.add_argument("--subject", default=None, help="3-digit subject id (default: a free random one per student)")
+
+    qry = sub.add_parser("query", help="list the students matching a query (the admin menu's q)")
+    qry.add_argument("query", nargs="*", help="e.g. grade=HD mark=60-80 domain=university.com subjects=2 "
+                                              "sort=file|avg|-avg top=N bottom=N page=N size=N")
+
+    fnd = sub.add_parser("search", help="find students by name or email, allowing typos (the admin menu's f)")
+    fnd.add_argument("text", nargs="+", help="the start of a name, a name word or an email")
+    fnd.add_argument("--limit", type=int, default=SEARCH_LIMIT)
+
+    bat = sub.add_parser("batch", help="run the menus from a script of answers, one per line")
+    bat.add_argument("script", nargs="?", default="-", help="script file, or - for stdin (default)")
+    bat.add_argument("--colour", dest="colour", action="store_true", default=None, help="force colour codes")
+    bat.add_argument("--no-colour", dest="colour", action="store_false", help="never emit colour codes")
+
+    srv = sub.add_parser("serve", help="serve the enrolment API to GUI/CLI clients over a socket")
+    srv.add_argument("--listen", default=None, help="host:port or unix:/path (default: $UNI_SERVER or 127.0.0.1:8765)")
+    srv.add_argument("--commit-delay", type=float, default=2.0, help="ms a write batch stays open (group commit)")
+    return parser
+
+def run_batch(script: str, use_colour=None) -> None:
+    f = sys.stdin if script == "-" else open(script, "r", encoding="utf-8")
+    ui.start_batch(f, use_colour)
     try:
         university_menu()
+    except EOFError:
+        pass                                    # script ended without "x"
+    finally:
+        ui.flush()
+        if f is not sys.stdin:
+            f.close()
+
+def main(argv=None) -> None:
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        metrics.enable()
+    else:
+        metrics.enable_from_env()
+    metrics.run_profiled(lambda: run_command(args), args.cprofile)
+
+def run_command(args: argparse.Namespace) -> None:
+    if args.command == "import":
+        run_import(args.path, args.format, args.batch_size)
+    elif args.command == "export":
+        run_export(args.path, args.format, args.batch_size)
+    elif args.command == "enrol":
+        run_enrol(args.ids, args.subject and args.subject.zfill(3))
+    elif args.command == "query":
+        run_query(" ".join(args.query))
+    elif args.command == "search":
+        run_search(" ".join(args.text), args.limit)
+    elif args.command == "batch":
+        run_batch(args.script, args.colour)
+    elif args.command == "serve":
+        run_serve(args.listen or server_address(), args.commit_delay)
+    else:
+        university_menu()
+
+if __name__ == "__main__":
+    try:
+        main()
     except KeyboardInterrupt:
-        print(x)
-        say(0, "Thank You", C_YELLOW)
\ No newline at end of file
+        print()
+        say(0, "Thank You", C_YELLOW)
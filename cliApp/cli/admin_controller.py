@@ -1,84 +1,166 @@
-from .ui import ask, say, C_SKY, C_YELLOW, C_RED
-from ..core.db import Database
-from ..core.models import Student, grade_from_mark
+import os
+from contextlib import closing
+from itertools import chain
+from typing import Iterable, Iterator, Optional
+from .ui import ask, say, say_parts, C_SKY, C_YELLOW, C_RED
+from ..core.grade_view import Buckets, Row
+from ..core.repository import find_students, get_repository, report_buckets, search_students, student_listing
+from ..core.models import grade_from_mark
+from ..core.query import PAGE_SIZE, Hit, parse_query
+from ..core import metrics
+from ..net.protocol import SERVER_ENV
 
+@metrics.timed("cli.admin_clear")
 def admin_clear(depth: int) -> None:
     say(depth, "Clearing students database", C_YELLOW)
     ans = ask(depth, "Are you sure you want to clear the database (Y)ES/(N)O: ", C_RED)
     if ans.strip().upper() == "Y":
-        Database.clear()
+        get_repository().clear()
         say(depth, "Clearing students database", C_YELLOW)
 
-def admin_group_by_grade(depth: int) -> None:
-    students = Database.load_students()
-    # No data: print "<Nothing to Display>" with two extra indents
-    if not students:
-        say(depth + 2, "<Nothing to Display>")
-        return
+def _report_rows(by_grade: bool) -> Buckets:
+    # from the enrolment server when UNI_SERVER names one, otherwise from local data.
+    # Only the reports go through the server: the CLI's other reads and writes use
+    # the data file directly (the server follows them on the change feed)
+    if os.environ.get(SERVER_ENV):
+        from ..net.client import ServiceClient   # imported on demand: the client module brings asyncio with it
+        with ServiceClient.connect() as client:
+            return Buckets(client.grades_by_grade() if by_grade else client.grades_by_pass_fail())
+    return report_buckets(by_grade)
 
-    buckets = {"N/A": [], "Z": [], "P": [], "C": [], "D": [], "HD": []}
-    for s in students:
-        avg = Student.from_dict(s.to_dict()).average_mark()
-        if avg is None:
-            buckets["N/A"].append(f"{s.name} :: {s.id}")
-        else:
-            g = grade_from_mark(int(round(avg)))
-            buckets[g].append(f"{s.name} :: {s.id} --> GRADE: {g} - MARK: {avg:.2f}")
+def _bucket_line(head: str, rows: Iterable[Row]) -> Iterator[str]:
+    # "<head>[a, b, ...]" a piece at a time, so a bucket is never one string in memory
+    yield head + "["
+    for i, row in enumerate(rows):
+        yield (", " if i else "") + _report_line(*row)
+    yield "]"
 
-    # Spec for 'g': only print non-empty buckets
-    if buckets["N/A"]:
-        say(depth, f"N/A --> [{', '.join(buckets['N/A'])}]")
-    for k in ["Z", "P", "C", "D", "HD"]:
-        if buckets[k]:
-            say(depth, f"{k} --> [{', '.join(buckets[k])}]")
+@metrics.timed("cli.admin_group_by_grade")
+def admin_group_by_grade(depth: int) -> None:
+    with _report_rows(by_grade=True) as buckets:
+        # No data: print "<Nothing to Display>" with two extra indents
+        if not any(buckets.count(k) for k in ["N/A", "Z", "P", "C", "D", "HD"]):
+            say(depth + 2, "<Nothing to Display>")
+            return
 
-def admin_group_pass_fail(depth: int) -> None:
-    students = Database.load_students()
-    buckets = {"N/A": [], "FAIL": [], "PASS": []}
+        # Spec for 'g': only print non-empty buckets
+        for k in ["N/A", "Z", "P", "C", "D", "HD"]:
+            if buckets.count(k):
+                say_parts(depth, _bucket_line(f"{k} --> ", buckets.rows(k)))
 
-    for s in students:
-        avg = Student.from_dict(s.to_dict()).average_mark()
-        if avg is None:
-            buckets["N/A"].append(f"{s.name} :: {s.id}")
-        else:
-            g = "PASS" if avg >= 50.0 else "FAIL"
-            grade_letter = grade_from_mark(int(round(avg)))
-            buckets[g].append(f"{s.name} :: {s.id} --> GRADE: {grade_letter} - MARK: {avg:.2f}")
+@metrics.timed("cli.admin_group_pass_fail")
+def admin_group_pass_fail(depth: int) -> None:
+    with _report_rows(by_grade=False) as buckets:
+        # Spec for 'p': always show all three buckets (even if empty)
+        for k in ["N/A", "FAIL", "PASS"]:
+            say_parts(depth, _bucket_line(f"{k} -->", buckets.rows(k)))
 
-    # Spec for 'p': always show all three buckets (even if empty)
-    say(depth, f"N/A -->[{', '.join(buckets['N/A'])}]" if buckets["N/A"] else "N/A -->[]")
-    say(depth, f"FAIL -->[{', '.join(buckets['FAIL'])}]" if buckets["FAIL"] else "FAIL -->[]")
-    say(depth, f"PASS -->[{', '.join(buckets['PASS'])}]" if buckets["PASS"] else "PASS -->[]")
+def _report_line(sid: str, name: str, avg: Optional[float]) -> str:
+    if avg is None:
+        return f"{name} :: {sid}"
+    return f"{name} :: {sid} --> GRADE: {grade_from_mark(int(round(avg)))} - MARK: {avg:.2f}"
 
+@metrics.timed("cli.admin_remove_student")
 def admin_remove_student(depth: int) -> None:
     sid = ask(depth, "Remove by ID: ")
-    students = Database.load_students()
-    idx = next((i for i, s in enumerate(students) if s.id == sid), None)
-    if idx is None:
+    repo = get_repository()
+    if repo.get_by_id(sid) is None:
         say(depth, f"Student {sid} does not exist", C_RED)
         return
     say(depth, f"Removing Student {sid} Account", C_YELLOW)
-    del students[idx]
-    Database.save_students(students)
+    repo.remove(sid)
 
+@metrics.timed("cli.admin_show_students")
 def admin_show_students(depth: int) -> None:
     say(depth, "Student List", C_YELLOW)
-    students = Database.load_students()
-    if not students:
+    with closing(student_listing()) as students:
+        first = next(students, None)
+        if first is None:
+            say(depth + 2, "<Nothing to Display>")
+            return
+        for name, sid, email in chain([first], students):
+            say(depth, f"{name} :: {sid} --> Email: {email}")
+
+@metrics.timed("cli.admin_query")
+def admin_query(depth: int) -> None:
+    # filtered/sorted student list, a page at a time
+    text = ask(depth, "Query (e.g. grade=HD domain=university.com sort=-avg top=10; blank for all): ")
+    try:
+        q = parse_query(text)
+    except ValueError as e:
+        say(depth, str(e), C_RED)
+        return
+    if q.limit is None:
+        q.limit = PAGE_SIZE
+    while True:
+        hits, total = find_students(q)
+        if not total:
+            say(depth + 2, "<Nothing to Display>")
+            return
+        for hit in hits:
+            say(depth, _hit_line(hit))
+        shown = f"Showing {q.offset + 1}-{q.offset + len(hits)} of {total}"
+        if q.offset == 0 and len(hits) == total:
+            say(depth, shown, C_YELLOW)
+            return
+        cmd = ask(depth, f"{shown} - (n)ext, (p)revious or x: ", C_SKY).lower()
+        if cmd == "n" and q.offset + q.limit < total:
+            q.offset += q.limit
+        elif cmd == "p" and q.offset > 0:
+            q.offset = max(0, q.offset - q.limit)
+        elif cmd == "x":
+            return
+
+@metrics.timed("cli.run_query")
+def run_query(text: str) -> None:
+    # non-interactive: every match (or the page asked for) and a count
+    try:
+        q = parse_query(text)
+    except ValueError as e:
+        say(0, str(e), C_RED)
+        return
+    hits, total = find_students(q)
+    for hit in hits:
+        say(0, _hit_line(hit))
+    say(0, f"{len(hits)} of {total} matching students", C_YELLOW)
+
+@metrics.timed("cli.admin_search")
+def admin_search(depth: int) -> None:
+    # by the start of a name, a name word or an email, then near misses
+    text = ask(depth, "Find by name or email: ")
+    matches = search_students(text)
+    if not matches:
         say(depth + 2, "<Nothing to Display>")
         return
-    for s in students:
-        say(depth, f"{s.name} :: {s.id} --> Email: {s.email}")
+    for sid, name, email in matches:
+        say(depth, f"{name} :: {sid} --> Email: {email}")
+
+@metrics.timed("cli.run_search")
+def run_search(text: str, limit: int) -> None:
+    matches = search_students(text, limit)
+    for sid, name, email in matches:
+        say(0, f"{name} :: {sid} --> Email: {email}")
+    say(0, f"{len(matches)} matching students", C_YELLOW)
+
+def _hit_line(hit: Hit) -> str:
+    sid, name, email, avg, n = hit
+    if avg is None:
+        return f"{name} :: {sid} --> Email: {email}"
+    return f"{name} :: {sid} --> Email: {email} - GRADE: {grade_from_mark(int(round(avg)))} - MARK: {avg:.2f} - SUBJECTS: {n}"
 
 def admin_menu(depth: int) -> None:
     while True:
-        cmd = ask(depth, "Admin System (c/g/p/r/s/x): ", C_SKY).lower()
+        cmd = ask(depth, "Admin System (c/f/g/p/q/r/s/x): ", C_SKY).lower()
         if cmd == "c":
             admin_clear(depth)                 # same depth for actions
+        elif cmd == "f":
+            admin_search(depth)                # same depth
         elif cmd == "g":
             admin_group_by_grade(depth)        # same depth
         elif cmd == "p":
             admin_group_pass_fail(depth)       # same depth
+        elif cmd == "q":
+            admin_query(depth)                 # same depth
         elif cmd == "r":
             admin_remove_student(depth)        # same depth
         elif cmd == "s":
@@ -0,0 +1,26 @@
+from typing import List, Optional
+from .ui import say, C_YELLOW, C_RED, C_GREEN
+from ..core.bulk import enrol_cohort, import_students, export_students
+from ..core import metrics
+
+@metrics.timed("cli.run_import")
+def run_import(path: str, fmt: Optional[str] = None, batch_size: int = 5000) -> None:
+    say(0, f"Importing students from {path}", C_YELLOW)
+    res = import_students(path, fmt, batch_size)
+    say(0, f"Imported {res.imported} students in {res.batches} batches "
+           f"({res.seconds:.2f}s, {res.rows_per_second:,.0f} rows/s)", C_GREEN)
+    for reason, n in sorted(res.rejected.items()):
+        say(2, f"Rejected {n} rows: {reason}", C_RED)
+
+@metrics.timed("cli.run_export")
+def run_export(path: str, fmt: Optional[str] = None, batch_size: int = 5000) -> None:
+    n = export_students(path, fmt, batch_size)
+    if path != "-":
+        say(0, f"Exported {n} students to {path}", C_GREEN)
+
+@metrics.timed("cli.run_enrol")
+def run_enrol(ids: List[str], subject_id: Optional[str] = None) -> None:
+    enrolled, skipped = enrol_cohort(ids or None, subject_id)
+    say(0, f"Enrolled {enrolled} students in " + (f"Subject-{subject_id}" if subject_id else "a new subject"), C_GREEN)
+    for reason, n in sorted(skipped.items()):
+        say(2, f"Skipped {n} students: {reason}", C_RED)
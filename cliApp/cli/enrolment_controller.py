@@ -1,9 +1,11 @@
 import random
 from .ui import say, ask, C_YELLOW, C_RED
 from ..core.models import Student, Subject, grade_from_mark
-from ..core.db import Database
+from ..core.repository import get_repository
 from ..core.util import gen_subject_id
+from ..core import metrics
 
+@metrics.timed("cli.enrol_subject")
 def enrol_subject(depth: int, stu: Student) -> None:
     # first checking if the student can still enroll in subjects
     if not stu.can_enrol_more():
@@ -16,34 +18,29 @@ def enrol_subject(depth: int, stu: Student) -> None:
 
     say(depth, f"Enrolling in Subject-{sid}", C_YELLOW)
 
-    students = Database.load_students()
-    for s in students:
-        if s.id == stu.id:
-            s.subjects.append(Subject(sid, mark, grd))
-            Database.save_students(students)
-            stu.subjects.append(Subject(sid, mark, grd))  # mirror in-memory
-            break
+    repo = get_repository()
+    if repo.get_by_id(stu.id) is not None:
+        repo.add_subject(stu, Subject(sid, mark, grd))
 
     say(depth, f"You are now enrolled in {len(stu.subjects)} out of 4 subjects", C_YELLOW)
 
+@metrics.timed("cli.show_subjects")
 def show_subjects(depth: int, stu: Student) -> None:
     for sub in stu.subjects:
         say(depth, f"[Subject::{sub.id} -- mark = {sub.mark} -- grade = {sub.grade}]")
 
+@metrics.timed("cli.remove_subject")
 def remove_subject(depth: int, stu: Student) -> None:
     sid = ask(depth, "Remove Subject by ID: ")
     if not any(s.id == sid for s in stu.subjects):
         say(depth, "No subject found", C_RED)
         return
 
-    stu.subjects = [x for x in stu.subjects if x.id != sid]
-
-    students = Database.load_students()
-    for s in students:
-        if s.id == stu.id:
-            s.subjects = stu.subjects
-            break
-    Database.save_students(students)
+    repo = get_repository()
+    if repo.get_by_id(stu.id) is not None:
+        repo.remove_subject(stu, sid)
+    else:
+        stu.subjects = [x for x in stu.subjects if x.id != sid]
 
     say(depth, f"Droping Subject-{sid}", C_YELLOW)
     say(depth, f"You are now enrolled in {len(stu.subjects)} out of 4 subjects", C_YELLOW)
@@ -0,0 +1,14 @@
+from .ui import say, C_YELLOW, C_GREEN
+from ..core.db import Database
+
+def run_serve(address: str, commit_delay_ms: float = 2.0) -> None:
+    # imported here rather than at the top: every CLI start loads this module,
+    # and asyncio is a large part of the startup time
+    import asyncio
+    from ..net.server import serve
+    say(0, f"Loading students from {Database.store().path}", C_YELLOW)
+    ready = lambda where: say(0, f"Serving the enrolment API on {where} (Ctrl-C to stop)", C_GREEN)
+    try:
+        asyncio.run(serve(Database.store(), address, ready, commit_delay=commit_delay_ms / 1000))
+    except KeyboardInterrupt:
+        pass
@@ -2,10 +2,12 @@ from typing import Optional
 from .ui import ask, say, C_SKY, C_GREEN, C_YELLOW, C_RED, SUBMENU_STEP
 from ..core.validation import valid_email, valid_password, email_to_name
 from ..core.models import Student
-from ..core.db import Database
-from ..core.util import gen_student_id
+from ..core.repository import get_repository, new_student_id
+from ..core.store import StaleRecordError
+from ..core import metrics
 from . import enrolment_controller as enr
 
+@metrics.timed("cli.student_register")
 def student_register(depth: int) -> None:
     say(depth, "Student Sign Up", C_GREEN)
     while True:
@@ -17,8 +19,8 @@ def student_register(depth: int) -> None:
             continue
         say(depth, "email and password formats acceptable", C_YELLOW)
 
-        students = Database.load_students()
-        if any(s.email.lower() == email.lower() for s in students):
+        repo = get_repository()
+        if repo.email_exists(email):
             fullname = email_to_name(email)
             say(depth, f"Student {fullname} already exists", C_RED)
             return
@@ -27,12 +29,17 @@ def student_register(depth: int) -> None:
         fullname = email_to_name(email)
         say(depth, f"Enrolling student {fullname}", C_YELLOW)
 
-        new_id = gen_student_id([s.id for s in students])
-        new_student = Student(new_id, name, email, password, [])
-        students.append(new_student)
-        Database.save_students(students)
+        for _ in range(3):
+            new_student = Student(new_student_id(), name, email, password, [])
+            try:
+                repo.save(new_student)
+                return
+            except StaleRecordError:
+                repo = get_repository()      # the id was just taken by another session; draw again
+        say(depth, "Could not save the new student - please try again", C_RED)
         return
 
+@metrics.timed("cli.student_login")
 def student_login(depth: int) -> Optional[Student]:
     say(depth, "Student Sign In", C_GREEN)
     while True:
@@ -42,8 +49,7 @@ def student_login(depth: int) -> Optional[Student]:
             say(depth, "Incorrect email or password format", C_RED)
             continue
         say(depth, "email and password formats acceptable", C_YELLOW)
-        students = Database.load_students()
-        stu = next((s for s in students if s.email.lower() == email.lower()), None)
+        stu = get_repository().get_by_email(email)
         if stu is None:
             say(depth, "Student does not exist", C_RED)
             return None
@@ -52,6 +58,7 @@ def student_login(depth: int) -> Optional[Student]:
             return None
         return stu
 
+@metrics.timed("cli.student_change_password")
 def student_change_password(depth: int, stu: Student) -> None:
     say(depth, "Updating Password", C_YELLOW)
     while True:
@@ -65,13 +72,14 @@ def student_change_password(depth: int, stu: Student) -> None:
         if conf != new_pw:
             say(depth, "Password does not match - try again", C_RED)
             continue
-        students = Database.load_students()
-        for s in students:
-            if s.id == stu.id:
-                s.password = new_pw
-                Database.save_students(students)
-                stu.password = new_pw
-                return
+        repo = get_repository()
+        if repo.get_by_id(stu.id) is not None:
+            stu.password = new_pw
+            try:
+                repo.save(stu)
+            except StaleRecordError:
+                say(depth, "Your account was changed in another session - sign in again to update it", C_RED)
+        return
 
 def student_course_menu(depth: int, stu: Student) -> None:
     while True:
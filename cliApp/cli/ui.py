@@ -1,4 +1,8 @@
-from typing import Optional
+import sys
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional
+
+from ..core import metrics
 
 RESET   = "\033[0m" # normal text color
 C_SKY   = "\033[96m"  # bright cyan
@@ -10,19 +14,70 @@ C_GREEN = "\033[92m"
 # Each depth level is 2 spaces (see indent_str), so 4 levels = 8 spaces.
 SUBMENU_STEP = 4
 
+# Batch mode (see start_batch): answers come from a script instead of input(),
+# and output is collected and written in large chunks instead of line by line.
+FLUSH_CHARS = 64 * 1024
+_script: Optional[Iterator[str]] = None
+_pending: List[str] = []
+_pending_chars = 0
+_use_colour = True
+
+def start_batch(lines: Iterable[str], use_colour: Optional[bool] = None) -> None:
+    # use_colour=None: only colour the output when stdout is a terminal
+    global _script, _use_colour
+    _script = iter(lines)
+    _use_colour = sys.stdout.isatty() if use_colour is None else use_colour
+
+@metrics.timed("ui.flush")
+def flush() -> None:
+    global _pending_chars
+    if _pending:
+        sys.stdout.write("".join(_pending))
+        _pending.clear()
+        _pending_chars = 0
+    sys.stdout.flush()
+
+def _emit(text: str) -> None:
+    global _pending_chars
+    _pending.append(text)
+    _pending_chars += len(text)
+    if _pending_chars >= FLUSH_CHARS:
+        flush()
+
 def colour(text: str, c: str) -> str:
-    return f"{c}{text}{RESET}"
+    return f"{c}{text}{RESET}" if _use_colour else text
 
 # indentation, take integer as depth, return indentation, which is made of empty spaces
 def indent_str(depth: int) -> str:
     return "  " * depth  # two spaces per level
 
+@metrics.timed("ui.say")
 def say(depth: int, text: str, c: Optional[str] = None) -> None:
-    if c:
-        print(indent_str(depth) + colour(text, c))
+    line = indent_str(depth) + (colour(text, c) if c else text)
+    metrics.count("bytes_output", len(line) + 1)
+    if _script is None:
+        print(line)
     else:
-        print(indent_str(depth) + text)
+        _emit(line + "\n")
+
+@metrics.timed("ui.say")
+def say_parts(depth: int, parts: Iterable[str]) -> None:
+    # say() for a line produced a piece at a time (e.g. by a generator), each
+    # piece written as it comes instead of the whole line being built first
+    write = sys.stdout.write if _script is None else _emit
+    n = 0
+    for part in chain((indent_str(depth),), parts, ("\n",)):
+        write(part)
+        n += len(part)
+    metrics.count("bytes_output", n)
 
 def ask(depth: int, prompt_text: str, c: Optional[str] = None) -> str:
     prompt = indent_str(depth) + (colour(prompt_text, c) if c else prompt_text)
-    return input(prompt).strip()
+    if _script is None:
+        with metrics.span("ui.input"):         # time spent waiting for the user
+            return input(prompt).strip()
+    _emit(prompt)
+    try:
+        return next(_script).rstrip("\r\n").strip()
+    except StopIteration:
+        raise EOFError("end of batch script") from None
@@ -0,0 +1,53 @@
+from bisect import bisect_right
+from typing import Sequence
+
+# NumPy is optional: the admin report aggregates (see core.grade_view) are
+# vectorized when it is installed and fall back to the same computation in plain
+# Python otherwise. It is imported on first use rather than here, as it would
+# otherwise be most of the CLI's startup.
+_np = False   # not looked for yet
+
+def _numpy():
+    global _np
+    if _np is False:
+        try:
+            import numpy as _np
+        except ImportError:  # pragma: no cover - depends on the environment
+            _np = None
+    return _np
+
+GRADE_LABELS = ("Z", "P", "C", "D", "HD")
+GRADE_CUTOFFS = (50, 65, 75, 85)   # lower bound of P, C, D, HD (see models.grade_from_mark)
+PASS_MARK = 50.0
+NA = -1                            # grade code for students with no subjects
+
+def average_marks(marks: Sequence[int], counts: Sequence[int]):
+    # marks: every subject mark, student by student; counts: subjects per student.
+    # Returns one average per student, NaN where the student has no subjects.
+    np = _numpy()
+    if np is None:
+        out, pos = [], 0
+        for c in counts:
+            out.append(sum(marks[pos:pos + c]) / c if c else float("nan"))
+            pos += c
+        return out
+    m = np.asarray(marks, dtype=np.int64)
+    n = np.asarray(counts, dtype=np.int64)
+    avgs = np.full(len(n), np.nan)
+    has = n > 0
+    if m.size:
+        offsets = np.cumsum(n) - n
+        # reduceat over only non-empty students: each segment then ends exactly
+        # where the next non-empty student's marks begin
+        avgs[has] = np.add.reduceat(m, offsets[has]) / n[has]
+    return avgs
+
+def grade_codes(avgs):
+    # index into GRADE_LABELS of round(avg) (half to even, like round()), NA for NaN
+    np = _numpy()
+    if np is None:
+        return [NA if a != a else bisect_right(GRADE_CUTOFFS, round(a)) for a in avgs]
+    a = np.asarray(avgs, dtype=np.float64)
+    codes = np.digitize(np.rint(np.nan_to_num(a)), GRADE_CUTOFFS)
+    codes[np.isnan(a)] = NA
+    return codes
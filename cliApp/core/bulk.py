@@ -0,0 +1,198 @@
+import csv, io, json, random, sys, time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from .db import Database
+from .grade_view import GradeView, grade_view_for
+from .idalloc import IdAllocator
+from .models import Subject, grade_from_mark
+from .repository import get_repository
+from .sidecar import sidecar_for, tracked_write
+from .util import gen_subject_id
+from .validation import subjects_problem, valid_email, valid_password, email_to_name
+
+# Non-interactive import/export of students as CSV or JSON Lines.
+# CSV columns: id,name,email,password,subjects  (id, name and subjects optional;
+# subjects is "017:36;102:88", i.e. subject id and mark, grade is recomputed).
+# JSONL: one students.data record per line (id and subjects optional).
+# enrol_cohort adds a subject to many students at once, in one commit.
+
+CSV_FIELDS = ["id", "name", "email", "password", "subjects"]
+FORMATS = ("csv", "jsonl")
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.rejected: Dict[str, int] = {}   # reason -> count
+        self.batches = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.imported + sum(self.rejected.values())) / self.seconds if self.seconds else 0.0
+
+    def reject(self, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+# ----------------------------- reading -----------------------------
+
+def _open_in(path: str) -> TextIO:
+    return sys.stdin if path == "-" else open(path, "r", encoding="utf-8", newline="")
+
+def _open_out(path: str) -> TextIO:
+    return sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+
+def read_rows(f: TextIO, fmt: str) -> Iterator[Dict]:
+    if fmt == "jsonl":
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {}
+        return
+    for row in csv.DictReader(f):
+        rec = {k: (row.get(k) or "").strip() for k in CSV_FIELDS}
+        rec["subjects"] = _parse_subjects(rec["subjects"])
+        yield rec
+
+def _parse_subjects(text: str) -> List[Dict]:
+    subs = []
+    for part in filter(None, text.split(";")):
+        sid, _, mark = part.partition(":")
+        subs.append({"id": sid.strip(), "mark": mark.strip()})   # checked in _normalise
+    return subs
+
+def _normalise(row: Dict, res: ImportResult, emails: Set[str]) -> Optional[Dict]:
+    # validated record without an id yet, or None (reason recorded) if rejected
+    email = str(row.get("email") or "").strip()
+    password = str(row.get("password") or "").strip()
+    if not valid_email(email):
+        res.reject("bad email")
+        return None
+    if not valid_password(password):
+        res.reject("bad password")
+        return None
+    if email.lower() in emails:
+        res.reject("duplicate email")
+        return None
+    try:
+        subjects = [{"id": str(s["id"]).strip().zfill(3), "mark": int(s["mark"]),
+                     "grade": grade_from_mark(int(s["mark"]))} for s in row.get("subjects") or []]
+    except (KeyError, TypeError, ValueError):
+        res.reject("bad subjects")
+        return None
+    problem = subjects_problem(subjects)     # range, 3-digit ids, no repeats, at most 4
+    if problem:
+        res.reject(problem)
+        return None
+    emails.add(email.lower())
+    return {"id": str(row.get("id") or ""), "name": str(row.get("name") or "").strip() or email_to_name(email),
+            "email": email, "password": password, "subjects": subjects}
+
+# ----------------------------- import -----------------------------
+
+def import_students(path: str, fmt: Optional[str] = None, batch_size: int = 5000) -> ImportResult:
+    fmt = detect_format(path, fmt)
+    store = Database.store()
+    res = ImportResult()
+    start = time.perf_counter()
+    # one pass over what is already stored, then every check is a set or bitmap lookup
+    existing = store.load_all()
+    grade_view_for(store).ensure(store, existing)
+    alloc = sidecar_for(IdAllocator, store).ensure(store, existing)
+    emails = {str(r.get("email", "")).lower() for r in existing}
+    del existing
+
+    f = _open_in(path)
+    try:
+        rows = read_rows(f, fmt)
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batch = [rec for rec in (_normalise(r, res, emails) for r in chunk) if rec is not None]
+            need = []
+            for rec in batch:
+                if alloc.valid(rec["id"]) and not alloc.taken(rec["id"]):
+                    alloc.mark(rec["id"])
+                else:
+                    need.append(rec)
+            for rec, sid in zip(need, alloc.allocate_many(len(need))):   # reserved for the whole batch at once
+                rec["id"] = sid
+            if batch:
+                try:
+                    tracked_write(store, lambda: store.upsert_many(batch),    # one commit per batch
+                                  {GradeView: lambda v: [v.update(r["id"], r["name"], [s["mark"] for s in r["subjects"]])
+                                                         for r in batch]},
+                                  [{"op": "upsert", "student": r} for r in batch])
+                except BaseException:
+                    for rec in batch:                 # nothing was written: the ids are free again
+                        alloc.release(rec["id"])
+                    raise
+                res.imported += len(batch)
+                res.batches += 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    res.seconds = time.perf_counter() - start
+    return res
+
+# ----------------------------- export -----------------------------
+
+def export_students(path: str, fmt: Optional[str] = None, batch_size: int = 5000) -> int:
+    fmt = detect_format(path, fmt)
+    records = Database.store().load_all()
+    f = _open_out(path)
+    try:
+        if fmt == "csv":
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            w.writerow(CSV_FIELDS)
+            for i, r in enumerate(records, 1):
+                subs = ";".join(f"{s['id']}:{s['mark']}" for s in r.get("subjects", []))
+                w.writerow([r["id"], r["name"], r["email"], r["password"], subs])
+                if i % batch_size == 0:
+                    f.write(buf.getvalue()); buf.seek(0); buf.truncate()
+            f.write(buf.getvalue())
+        else:
+            for start in range(0, len(records), batch_size):
+                f.write("".join(json.dumps(r, separators=(",", ":")) + "\n"
+                                for r in records[start:start + batch_size]))
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return len(records)
+
+# ----------------------------- cohort enrolment -----------------------------
+
+def enrol_cohort(ids: Optional[Iterable[str]] = None, subject_id: Optional[str] = None) -> Tuple[int, Dict[str, int]]:
+    # Enrol each student in ids (everyone if None) in one more subject - subject_id,
+    # or a free random id per student - with a random mark, like the student menu
+    # does; the whole cohort is one transaction, so one write to the store.
+    # Returns (enrolled, {reason: students skipped}).
+    repo = get_repository()
+    students = repo.all() if ids is None else [repo.get_by_id(sid) for sid in ids]
+    enrolled, skipped = 0, {}
+    with repo.transaction():
+        for stu in students:
+            if stu is None:
+                reason = "no such student"
+            elif not stu.can_enrol_more():
+                reason = "already in 4 subjects"
+            elif subject_id is not None and stu.has_subject_id(subject_id):
+                reason = "already enrolled"
+            else:
+                mark = random.randint(25, 100)
+                sid = subject_id or gen_subject_id([s.id for s in stu.subjects])
+                repo.add_subject(stu, Subject(sid, mark, grade_from_mark(mark)))
+                enrolled += 1
+                continue
+            skipped[reason] = skipped.get(reason, 0) + 1
+    return enrolled, skipped
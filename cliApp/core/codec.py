@@ -0,0 +1,179 @@
+import gzip, json, os, struct, sys, zlib
+from array import array
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
+
+# On-disk encodings of the students.data list (the JSON store's file and the
+# journal's base snapshot). Writers use the codec named by UNI_CODEC; readers
+# tell the format from the first bytes of the file, so a file in any codec
+# can be read whatever UNI_CODEC says, and the next full write converts it.
+#
+#   json      the original pretty-printed JSON (indent=2), the default
+#   minified  the same JSON without the whitespace
+#   gzip      minified JSON, gzip-compressed (header 1f 8b)
+#   binary    MAGIC, then columns (see encode_binary): the text fields as
+#             length-prefixed UTF-8, revisions and subject counts packed,
+#             each subject as a u16 id, a u8 mark and a u8 grade code
+
+CODEC_ENV = "UNI_CODEC"
+CODECS = ("json", "minified", "gzip", "binary")
+MAGIC = b"UNIREC\x00\x01"             # name, format version
+GRADES = ("Z", "P", "C", "D", "HD")    # grade codes 0..4
+GZIP_LEVEL = 6
+
+TEXT = ("id", "name", "email", "password")
+KEYS = TEXT + ("subjects",)
+SUBJECT_KEYS = ("id", "mark", "grade")
+NO_REV = 0xFFFFFFFF                    # record without a "rev"
+SUBJECT_IDS = [f"{i:03d}" for i in range(1000)]
+
+def codec_from_env() -> str:
+    name = (os.environ.get(CODEC_ENV) or "json").lower()
+    if name not in CODECS:
+        raise ValueError(f"unknown storage codec: {name}")
+    return name
+
+def detect(data: bytes) -> str:
+    if data.startswith(MAGIC):
+        return "binary"
+    if data.startswith(b"\x1f\x8b"):
+        return "gzip"
+    return "json"                      # pretty and minified JSON read the same
+
+def encode(records: List[Dict], codec: str) -> bytes:
+    if codec == "json":
+        return json.dumps(records, indent=2).encode("utf-8")
+    if codec == "minified":
+        return json.dumps(records, separators=(",", ":")).encode("utf-8")
+    if codec == "gzip":
+        return gzip.compress(encode(records, "minified"), GZIP_LEVEL, mtime=0)
+    if codec == "binary":
+        return encode_binary(records)
+    raise ValueError(f"unknown storage codec: {codec}")
+
+def decode(data: bytes) -> List:
+    # the stored list, in whichever codec wrote it; ValueError if it is damaged
+    kind = detect(data)
+    if kind == "binary":
+        return decode_binary(data)
+    if kind == "gzip":
+        try:
+            data = gzip.decompress(data)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"damaged gzip data: {e}") from None
+    return json.loads(data) if data.strip() else []
+
+# ------------------------------- binary -----------------------------------
+# All integers little-endian. After MAGIC:
+#   u32 n                 records
+#   4 x text column       u32 lengths[n] (UTF-8 bytes), then the bytes back to back
+#   u32 revs[n]           NO_REV where the record has none
+#   u8 counts[n]          subjects per record
+#   u16 subject ids[m]    m = sum(counts), "017" stored as 17
+#   u8 marks[m], u8 grades[m]
+#   u32 size + JSON       {row: record} for records the columns cannot hold
+#                         exactly (other keys or types, ids not 3 digits, ...);
+#                         their row is left empty in the columns
+
+def plain_record(r: Dict, max_subjects: int = 255) -> bool:
+    # r has exactly the usual keys and types (see KEYS), so it fits fixed columns
+    if tuple(r) not in (KEYS, KEYS + ("rev",)):
+        return False
+    if not all(type(r[k]) is str for k in TEXT) or type(r.get("rev", 0)) is not int \
+            or not 0 <= r.get("rev", 0) < NO_REV or type(r["subjects"]) is not list or len(r["subjects"]) > max_subjects:
+        return False
+    return all(type(s) is dict and tuple(s) == SUBJECT_KEYS and type(s["id"]) is str and len(s["id"]) == 3
+               and s["id"].isdigit() and s["id"].isascii() and type(s["mark"]) is int and 0 <= s["mark"] <= 255
+               and s["grade"] in GRADES for s in r["subjects"])
+
+def _packed(code: str, values) -> bytes:
+    a = array(code, values)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+def _unpacked(code: str, data: bytes, at: int, n: int) -> Tuple[array, int]:
+    a = array(code)
+    end = at + n * a.itemsize
+    if end > len(data):
+        raise ValueError("truncated binary data")
+    a.frombytes(data[at:end])
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a, end
+
+def encode_binary(records: List[Dict]) -> bytes:
+    cols: List[List[bytes]] = [[] for _ in TEXT]
+    revs, counts, sub_ids, marks, grades = [], [], [], [], []
+    odd: Dict[int, Dict] = {}
+    grade_code = {g: i for i, g in enumerate(GRADES)}
+    for row, r in enumerate(records):
+        if not plain_record(r):
+            odd[row] = r
+            for col in cols:
+                col.append(b"")
+            revs.append(NO_REV)
+            counts.append(0)
+            continue
+        for col, k in zip(cols, TEXT):
+            col.append(r[k].encode("utf-8"))
+        revs.append(r.get("rev", NO_REV))
+        counts.append(len(r["subjects"]))
+        for s in r["subjects"]:
+            sub_ids.append(int(s["id"]))
+            marks.append(s["mark"])
+            grades.append(grade_code[s["grade"]])
+    out = [MAGIC, struct.pack("<I", len(records))]
+    for col in cols:
+        out += [_packed("I", map(len, col)), b"".join(col)]
+    out += [_packed("I", revs), bytes(counts), _packed("H", sub_ids), bytes(marks), bytes(grades)]
+    extra = json.dumps({str(row): r for row, r in odd.items()}, separators=(",", ":")).encode("utf-8")
+    out += [struct.pack("<I", len(extra)), extra]
+    return b"".join(out)
+
+def _text_column(data: bytes, at: int, n: int) -> Tuple[List[str], int]:
+    lengths, at = _unpacked("I", data, at, n)
+    ends = list(accumulate(lengths))
+    end = at + (ends[-1] if ends else 0)
+    if end > len(data):
+        raise ValueError("truncated binary data")
+    blob = data[at:end]
+    starts = [0] + ends[:-1]
+    if blob.isascii():
+        text = blob.decode("ascii")         # one decode; slicing the str is quicker than n decodes
+        return [text[a:b] for a, b in zip(starts, ends)], end
+    return [blob[a:b].decode("utf-8") for a, b in zip(starts, ends)], end
+
+def decode_binary(data: bytes) -> List[Dict]:
+    try:
+        (n,) = struct.unpack_from("<I", data, len(MAGIC))
+        at = len(MAGIC) + 4
+        cols = []
+        for _ in TEXT:
+            col, at = _text_column(data, at, n)
+            cols.append(col)
+        revs, at = _unpacked("I", data, at, n)
+        counts, at = _unpacked("B", data, at, n)
+        m = sum(counts)
+        sub_ids, at = _unpacked("H", data, at, m)
+        marks, at = _unpacked("B", data, at, m)
+        grades, at = _unpacked("B", data, at, m)
+        (size,) = struct.unpack_from("<I", data, at)
+        odd = {int(k): r for k, r in json.loads(data[at + 4:at + 4 + size]).items()}
+        # every subject dict in one pass, then handed out to the records in order
+        subjects = [{"id": SUBJECT_IDS[i], "mark": mark, "grade": GRADES[g]}
+                    for i, mark, g in zip(sub_ids, marks, grades)]
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"damaged binary data: {e}") from None
+    out: List[Optional[Dict]] = []
+    k = 0
+    for row, (sid, name, email, password, rev, c) in enumerate(zip(*cols, revs, counts)):
+        if row in odd:
+            out.append(odd[row])
+            continue
+        r = {"id": sid, "name": name, "email": email, "password": password, "subjects": subjects[k:k + c]}
+        if rev != NO_REV:
+            r["rev"] = rev
+        out.append(r)
+        k += c
+    return out
@@ -1,31 +1,70 @@
-import json, os
-from typing import List
-from .models import Student
+import atexit
+from typing import List, Optional
+from . import metrics
+from .models import Student, Subject
+from .store import Store, Signature, open_store
 
 DATA_FILE = "students.data"  # unchanged
 
 class Database:
+    # backend chosen by UNI_STORAGE (see core.store); swap with Database.use()
+    _store: Optional[Store] = None
+
+    @staticmethod
+    def store() -> Store:
+        if Database._store is None:
+            Database.use(open_store(DATA_FILE))
+        return Database._store
+
+    @staticmethod
+    def use(store: Store) -> None:
+        if Database._store is not None:
+            Database._store.close()
+        Database._store = store
+        atexit.register(store.close)
+
     @staticmethod
     def ensure_file() -> None:
-        if not os.path.exists(DATA_FILE):
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump([], f)
+        Database.store().ensure()
 
     @staticmethod
+    @metrics.timed("db.load_students")
     def load_students() -> List[Student]:
-        Database.ensure_file()
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            try:
-                raw = json.load(f)
-            except json.JSONDecodeError:
-                raw = []
-        return [Student.from_dict(r) for r in raw]
+        records = Database.store().load_all()
+        with metrics.span("db.hydrate"):
+            return [Student.from_dict(r) for r in records]
 
     @staticmethod
+    @metrics.timed("db.save_students")
     def save_students(students: List[Student]) -> None:
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump([s.to_dict() for s in students], f, indent=2)
+        with metrics.span("db.dehydrate"):
+            records = [s.to_dict() for s in students]
+        Database.store().save_all(records)
 
     @staticmethod
     def clear() -> None:
-        Database.save_students([])
+        Database.store().clear()
+
+    # ----- single-record mutations (appended, not rewritten, on incremental backends) -----
+    @staticmethod
+    def upsert_student(stu: Student) -> None:
+        # raises StaleRecordError if stu was read before the stored copy last changed
+        rec = stu.to_dict()
+        Database.store().upsert(rec)
+        stu.rev = rec["rev"]
+
+    @staticmethod
+    def delete_student(sid: str) -> bool:
+        return Database.store().delete(sid)
+
+    @staticmethod
+    def add_subject(sid: str, sub: Subject) -> None:
+        Database.store().add_subject(sid, sub.to_dict())
+
+    @staticmethod
+    def remove_subject(sid: str, subject_id: str) -> None:
+        Database.store().remove_subject(sid, subject_id)
+
+    @staticmethod
+    def signature() -> Signature:
+        return Database.store().signature()
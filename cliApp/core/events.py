@@ -0,0 +1,132 @@
+import json, os
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from . import metrics
+from .locking import atomic_write
+from .store import Op, Signature, Store, apply_op, op_id
+
+# Change feed for students.data. Every tracked_write (core.sidecar) appends one
+# line to "<data>.events": the ops it wrote, in the store's op vocabulary (see
+# core.store), with the store signature before and after. A process holding a
+# copy of the data at some signature can then bring it up to date by replaying
+# the ops logged since, instead of reading everything again; the signatures
+# chain the events together, so a gap (a write that was not logged, or a log
+# started afresh) is noticed and the copy is reloaded as before.
+#
+# Writes not described by ops (save_all, batches past EVENT_BYTES) are logged
+# without them, which also means "reload". The log is only appended to under
+# the store's exclusive lock, and is started afresh once past LOG_BYTES.
+
+SUFFIX = ".events"
+LOG_BYTES = 4 << 20       # size past which the next write starts a new log
+EVENT_BYTES = 1 << 20     # ops bigger than this are logged as a reload
+
+class Event(NamedTuple):
+    before: str                 # store signature (as a stamp) the write started from
+    after: str                  # and the one it left
+    ops: Optional[List[Op]]     # None: not known, reload
+
+def _stamp(sig: Signature) -> str:
+    return json.dumps(sig)
+
+def encode_ops(ops: Optional[List[Op]]) -> Optional[str]:
+    # the ops as they will be logged, taken before the write (which may move a
+    # record's "rev" on); None if there are none or they are too big to log
+    if ops is None:
+        return None
+    data = json.dumps(ops, separators=(",", ":"))
+    return data if len(data) <= EVENT_BYTES else None
+
+def publish(store: Store, before: Signature, ops: Optional[str]) -> None:
+    # log a write to `store` that started at `before`; call under its exclusive lock.
+    # ops: from encode_ops
+    after = store.signature()
+    if after == before:
+        return                                   # nothing was written
+    path = store.path + SUFFIX
+    line = ('{"before":%s,"after":%s,"ops":%s}\n'
+            % (json.dumps(_stamp(before)), json.dumps(_stamp(after)), ops or "null")).encode("utf-8")
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    if size + len(line) > LOG_BYTES:
+        atomic_write(path, line)
+    else:
+        with open(path, "ab") as f:
+            f.write(line)
+    metrics.count("events.published")
+
+def touched(ops: List[Op]) -> Optional[List[str]]:
+    # ids of the students the ops change, first touched first; None if they clear everything
+    ids: Dict[str, None] = {}
+    for op in ops:
+        sid = op_id(op)
+        if sid is None:
+            return None
+        ids[sid] = None
+    return list(ids)
+
+def replay(records: Dict[str, Dict], ops: List[Op]) -> None:
+    # apply logged ops to id -> record, as the store did; StaleRecordError if
+    # the records were not the ones the ops were written against
+    for op in ops:
+        apply_op(records, op)
+
+class ChangeFeed:
+    # Reads one store's event log for a copy of its data: since(sig) gives the
+    # ops that take data at store signature `sig` to the store as it is now.
+    # Remembers where the last answer ended so the next one reads only what was
+    # appended since.
+    def __init__(self, store: Store):
+        self.store = store
+        self.path = store.path + SUFFIX
+        self._offset = 0
+
+    def since(self, sig: Signature) -> Optional[Tuple[List[Op], Signature]]:
+        # (ops, signature now): no ops if nothing changed; None if the log does
+        # not cover it (the data has to be read again)
+        with self.store.lock.shared():           # no write between the signature and the log
+            now = self.store.signature()
+            if now == sig:
+                return [], now
+            if sig is None:
+                return None
+            found = self._chain(_stamp(sig), _stamp(now), self._offset)
+            if found is None and self._offset:
+                found = self._chain(_stamp(sig), _stamp(now), 0)
+        if found is None:
+            metrics.count("events.missed")
+            return None
+        ops, self._offset = found
+        return ops, now
+
+    def _chain(self, start: str, goal: str, offset: int) -> Optional[Tuple[List[Op], int]]:
+        # the ops of the events leading from stamp `start` to `goal`, read from
+        # `offset` on, and where the last of them ends
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return None
+        metrics.count("bytes_read", len(data))
+        ops: List[Op] = []
+        at, pos = start, offset
+        for line in data.splitlines(keepends=True):
+            pos += len(line)
+            try:
+                e = Event(**json.loads(line))
+            except (ValueError, TypeError):
+                return None                      # started mid-line: the log was started afresh
+            if e.before != at:
+                if at != start:
+                    return None                  # a write in between was not logged
+                continue                         # before our copy: already in it
+            if e.ops is None:
+                return None
+            ops.extend(e.ops)
+            at = e.after
+            if at == goal:
+                return ops, pos
+        return None
@@ -0,0 +1,232 @@
+import heapq, json, tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .analytics import GRADE_LABELS, NA, PASS_MARK, average_marks, grade_codes
+from .models import SubjectTable, grade_from_mark
+from .sidecar import Sidecar, sidecar_for
+from .store import Row as StoredRow, Store
+
+# Materialized view behind the admin g/p reports: per-student mark sum/count and
+# the bucket each student currently sits in, persisted next to the data as
+# "<path>.grades" (see core.sidecar for how it is kept in step with the store).
+
+GRADE_BUCKETS = ("N/A",) + GRADE_LABELS
+PASS_FAIL_BUCKETS = ("N/A", "FAIL", "PASS")
+
+Row = Tuple[str, str, Optional[float]]   # (id, name, average or None)
+
+SPILL_BYTES = 4 << 20   # characters of rows a streamed report keeps in memory per bucket
+
+class GradeView(Sidecar):
+    suffix = ".grades"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._students: Dict[str, list] = {}   # id -> [name, mark sum, subject count, seq]
+        self._grade: Dict[str, Dict[str, None]] = {k: {} for k in GRADE_BUCKETS}
+        self._pass_fail: Dict[str, Dict[str, None]] = {k: {} for k in PASS_FAIL_BUCKETS}
+        self._next_seq = 0
+
+    # ----------------------------- persistence ----------------------------
+
+    def _restore(self, data: bytes) -> str:
+        raw = json.loads(data)
+        self._next_seq = raw["next_seq"]
+        self._students = {r[0]: r[1:] for r in raw["students"]}
+        self._grade = {k: dict.fromkeys(raw["grade"].get(k, ())) for k in GRADE_BUCKETS}
+        self._pass_fail = {k: dict.fromkeys(raw["pass_fail"].get(k, ())) for k in PASS_FAIL_BUCKETS}
+        return raw["stamp"]
+
+    def _dump(self) -> bytes:
+        raw = {
+            "stamp": self._synced,
+            "next_seq": self._next_seq,
+            "students": [[sid] + e for sid, e in self._students.items()],
+            "grade": {k: list(v) for k, v in self._grade.items()},
+            "pass_fail": {k: list(v) for k, v in self._pass_fail.items()},
+        }
+        return json.dumps(raw, separators=(",", ":")).encode("utf-8")
+
+    # -------------------------- write-side hooks --------------------------
+
+    def update(self, sid: str, name: str, marks: Iterable[int]) -> None:
+        marks = list(marks)
+        entry = self._students.get(sid)
+        if entry is None:
+            entry = [name, 0, 0, self._next_seq]
+            self._next_seq += 1
+            self._students[sid] = entry
+        else:
+            self._unbucket(sid, entry)
+        entry[0], entry[1], entry[2] = name, sum(marks), len(marks)
+        self._bucket(sid, entry)
+
+    def remove(self, sid: str) -> None:
+        entry = self._students.pop(sid, None)
+        if entry is not None:
+            self._unbucket(sid, entry)
+
+    def clear(self) -> None:
+        self._students.clear()
+        for b in list(self._grade.values()) + list(self._pass_fail.values()):
+            b.clear()
+
+    # ---------------------------- read side -------------------------------
+
+    def __len__(self) -> int:
+        return len(self._students)
+
+    def by_grade(self) -> Dict[str, List[Row]]:
+        return {k: self._rows(b) for k, b in self._grade.items()}
+
+    def by_pass_fail(self) -> Dict[str, List[Row]]:
+        return {k: self._rows(b) for k, b in self._pass_fail.items()}
+
+    # --------------------------- consistency ------------------------------
+
+    def rebuild(self, records: List[Dict]) -> None:
+        self.clear()
+        try:
+            table = SubjectTable.from_records(records)
+            totals = [(table.mark_sum(i), table.counts[i]) for i in range(len(table))]
+            codes = grade_codes(average_marks(table.marks, table.counts))
+        except ValueError:
+            # marks or subject ids the packed columns cannot hold (imported data): per student
+            marks = [[int(s["mark"]) for s in r.get("subjects", [])] for r in records]
+            totals = [(sum(m), len(m)) for m in marks]
+            codes = grade_codes([t / n if n else float("nan") for t, n in totals])
+        for i, r in enumerate(records):
+            entry = [r["name"], totals[i][0], totals[i][1], i]
+            self._students[r["id"]] = entry
+            code = int(codes[i])
+            self._grade["N/A" if code == NA else GRADE_LABELS[code]][r["id"]] = None
+            self._pass_fail[_pass_fail(entry)][r["id"]] = None
+        self._next_seq = len(records)
+
+    def rebuild_from(self, store: Store) -> None:
+        if not store.partitioned:
+            return super().rebuild_from(store)
+        # each shard works out its students' sums and buckets; merged here in storage order
+        self.clear()
+        parts = store.scan(grade_partial)
+        for i, (_, sid, name, total, n) in enumerate(heapq.merge(*(p["students"] for p in parts),
+                                                                 key=lambda t: t[0])):
+            self._students[sid] = [name, total, n, i]
+        for p in parts:
+            for k, ids in p["grade"].items():
+                self._grade[k].update(dict.fromkeys(ids))
+            for k, ids in p["pass_fail"].items():
+                self._pass_fail[k].update(dict.fromkeys(ids))
+        self._next_seq = len(self._students)
+
+    def verify(self, records: List[Dict]) -> List[str]:
+        # ids whose aggregate or bucket disagrees with the data; empty when consistent
+        expected = GradeView(self.path)
+        expected.rebuild(records)
+        bad = set(self._students) ^ set(expected._students)
+        for sid, e in expected._students.items():
+            mine = self._students.get(sid)
+            if mine is None or mine[:3] != e[:3] \
+                    or sid not in self._grade[_grade(e)] or sid not in self._pass_fail[_pass_fail(e)]:
+                bad.add(sid)
+        return sorted(bad)
+
+    # ----------------------------- internals ------------------------------
+
+    def _bucket(self, sid: str, entry: list) -> None:
+        self._grade[_grade(entry)][sid] = None
+        self._pass_fail[_pass_fail(entry)][sid] = None
+
+    def _unbucket(self, sid: str, entry: list) -> None:
+        self._grade[_grade(entry)].pop(sid, None)
+        self._pass_fail[_pass_fail(entry)].pop(sid, None)
+
+    def _rows(self, bucket: Dict[str, None]) -> List[Row]:
+        # members come back in data-file order, like a full scan would list them
+        entries = sorted(((self._students[sid], sid) for sid in bucket), key=lambda t: t[0][3])
+        return [(sid, e[0], e[1] / e[2] if e[2] else None) for e, sid in entries]
+
+def _grade(entry: list) -> str:
+    if not entry[2]:
+        return "N/A"
+    return grade_from_mark(int(round(entry[1] / entry[2])))
+
+def _pass_fail(entry: list) -> str:
+    if not entry[2]:
+        return "N/A"
+    return "PASS" if entry[1] / entry[2] >= PASS_MARK else "FAIL"
+
+def grade_partial(rows: List[StoredRow]) -> Dict:
+    # one shard's share of a rebuild (runs in a worker process, see core.sharded)
+    students, grade, pass_fail = [], {k: [] for k in GRADE_BUCKETS}, {k: [] for k in PASS_FAIL_BUCKETS}
+    for seq, r in rows:
+        marks = [int(s["mark"]) for s in r.get("subjects", [])]
+        entry = [r["name"], sum(marks), len(marks)]
+        students.append((seq, r["id"], entry[0], entry[1], entry[2]))
+        grade[_grade(entry)].append(r["id"])
+        pass_fail[_pass_fail(entry)].append(r["id"])
+    return {"students": students, "grade": grade, "pass_fail": pass_fail}
+
+def grade_view_for(store: Store) -> GradeView:
+    return sidecar_for(GradeView, store)
+
+class Buckets:
+    # A report's rows by bucket, as the admin g/p reports print them: counted
+    # and handed out one at a time. This one wraps rows already in memory (the
+    # grade view's or the server's); SpillBuckets builds them in bounded memory.
+    def __init__(self, rows: Dict[str, List[Row]]):
+        self._rows = rows
+
+    def count(self, bucket: str) -> int:
+        return len(self._rows[bucket])
+
+    def rows(self, bucket: str) -> Iterator[Row]:
+        return iter(self._rows[bucket])
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Buckets":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class SpillBuckets(Buckets):
+    # rows added one at a time, one JSON row per line, kept in memory up to
+    # SPILL_BYTES per bucket and in a temporary file past that
+    def __init__(self, names: Iterable[str]):
+        super().__init__({})
+        self._files = {k: tempfile.SpooledTemporaryFile(SPILL_BYTES, mode="w+", encoding="utf-8") for k in names}
+        self._counts = dict.fromkeys(self._files, 0)
+
+    def add(self, bucket: str, row: Row) -> None:
+        self._files[bucket].write(json.dumps(row) + "\n")
+        self._counts[bucket] += 1
+
+    def count(self, bucket: str) -> int:
+        return self._counts[bucket]
+
+    def rows(self, bucket: str) -> Iterator[Row]:
+        f = self._files[bucket]
+        f.seek(0)
+        for line in f:
+            yield tuple(json.loads(line))
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+
+def stream_report(records: Iterable[Dict], by_grade: bool) -> SpillBuckets:
+    # the g (by_grade) or p report in one pass over the records, holding one at a time
+    buckets = SpillBuckets(GRADE_BUCKETS if by_grade else PASS_FAIL_BUCKETS)
+    bucket_of = _grade if by_grade else _pass_fail
+    try:
+        for r in records:
+            marks = [int(s["mark"]) for s in r.get("subjects", [])]
+            entry = [r["name"], sum(marks), len(marks)]
+            buckets.add(bucket_of(entry), (r["id"], r["name"], entry[1] / entry[2] if entry[2] else None))
+    except BaseException:
+        buckets.close()
+        raise
+    return buckets
@@ -0,0 +1,261 @@
+import json, os, random
+from typing import Dict, Iterable, List, Optional
+
+from .sidecar import Sidecar, sidecar_for
+from .store import Row, Store
+
+# Student id allocator, persisted next to the data as "<path>.ids": a bitmap of
+# the ids in use in the current id space plus a free list of released ids the
+# walk below has already gone past. The bitmap is the size of the whole space
+# (125 KB for 6-digit ids), so it is only written out once PERSIST_IDS ids are
+# in use; below that each process rebuilds it from the data.
+#
+# Ids are handed out by walking a keyed permutation of the space (a small
+# Feistel network, cycle-walked down to the space size), so consecutive ids
+# look random but each id is visited once: allocation is O(1) however full the
+# space is. Once the 6-digit space is used up, allocation moves on to 7-digit
+# ids (1000000..9999999) and so on, up to UNI_ID_MAX_WIDTH digits.
+
+ID_WIDTH = 6
+MAX_WIDTH_ENV = "UNI_ID_MAX_WIDTH"
+DEFAULT_MAX_WIDTH = 8      # the bitmap for an n-digit space is 10**n / 8 bytes
+ROUNDS = 4
+PERSIST_IDS = 10_000       # ids in use before the bitmap is worth writing to disk
+
+def _max_width() -> int:
+    try:
+        return max(ID_WIDTH, int(os.environ.get(MAX_WIDTH_ENV, DEFAULT_MAX_WIDTH)))
+    except ValueError:
+        return DEFAULT_MAX_WIDTH
+
+def _bounds(width: int):
+    # [low, high) of the numbers used for ids of this many digits; the base
+    # width is zero-padded ("000123"), wider ones never start with a zero
+    return (1 if width == ID_WIDTH else 10 ** (width - 1)), 10 ** width
+
+def _mix(r: int, key: int) -> int:
+    h = (r * 0x9E3779B1 + key) & 0xFFFFFFFF
+    h ^= h >> 15
+    h = (h * 0x85EBCA6B) & 0xFFFFFFFF
+    return h ^ (h >> 13)
+
+class IdAllocator(Sidecar):
+    suffix = ".ids"
+
+    def __init__(self, path: str, max_width: Optional[int] = None):
+        super().__init__(path)
+        self.max_width = max_width or _max_width()
+        self._free: List[str] = []               # released ids behind the cursor
+        self._free_at: Dict[str, int] = {}       # id -> position in _free
+        self._start(ID_WIDTH)
+
+    def _start(self, width: int) -> None:
+        self.width = width
+        self._low, high = _bounds(width)
+        self._space = high - self._low
+        self._bits = bytearray((self._space + 7) // 8)
+        self._used = 0
+        self._cursor = 0
+        self._keys = [random.getrandbits(32) for _ in range(ROUNDS)]
+        half = ((self._space - 1).bit_length() + 1) // 2
+        self._half, self._mask = half, (1 << half) - 1
+
+    # ----------------------------- persistence ----------------------------
+
+    def _restore(self, data: bytes) -> str:
+        head, _, bits = data.partition(b"\n")
+        raw = json.loads(head)
+        self._start(raw["width"])
+        if len(bits) != len(self._bits):
+            raise ValueError("id bitmap has the wrong size")
+        self._bits[:] = bits
+        self._used = sum(bin(b).count("1") for b in bits)
+        self._cursor = raw["cursor"]
+        self._keys = raw["keys"]
+        for sid in raw["free"]:
+            self._push_free(sid)
+        return raw["stamp"]
+
+    def _dump(self) -> bytes:
+        head = {"stamp": self._synced, "width": self.width, "cursor": self._cursor,
+                "keys": self._keys, "free": self._free}
+        return json.dumps(head, separators=(",", ":")).encode("utf-8") + b"\n" + bytes(self._bits)
+
+    def _worth_writing(self) -> bool:
+        return self.width > ID_WIDTH or self._used >= PERSIST_IDS
+
+    # ------------------------------ allocation ----------------------------
+
+    def allocate(self) -> str:
+        while True:
+            while self._cursor < self._space:
+                k = self._permute(self._cursor)
+                self._cursor += 1
+                if not self._test(k):
+                    self._set(k)
+                    return self._format(k)
+            if self._free:
+                # swap a random entry to the end so reuse does not go in release order
+                i = random.randrange(len(self._free))
+                self._free[i], self._free[-1] = self._free[-1], self._free[i]
+                self._free_at[self._free[i]] = i
+                sid = self._free.pop()
+                del self._free_at[sid]
+                self.mark(sid)
+                return sid
+            if self.width >= self.max_width:
+                raise ValueError("student id space exhausted")
+            self._start(self.width + 1)
+
+    def allocate_many(self, n: int) -> List[str]:
+        # for imports: the whole batch is reserved before any record is written
+        return [self.allocate() for _ in range(n)]
+
+    def mark(self, sid: str) -> None:
+        # an id taken explicitly (e.g. by an imported record)
+        self._drop_free(sid)
+        k = self._index(sid)
+        if k is not None:
+            self._set(k)
+
+    def release(self, sid: str) -> None:
+        k = self._index(sid)
+        if k is None:
+            if self.valid(sid):
+                self._push_free(sid)          # an id from an earlier, smaller space
+            return
+        if not self._test(k):
+            return
+        self._bits[k >> 3] &= ~(1 << (k & 7))
+        self._used -= 1
+        if self._unpermute(k) < self._cursor:
+            self._push_free(sid)              # the walk will not come back to it
+
+    def taken(self, sid: str) -> bool:
+        k = self._index(sid)
+        if k is not None:
+            return self._test(k)
+        return self.valid(sid) and sid not in self._free_at
+
+    def valid(self, sid: str) -> bool:
+        # ids this allocator could have handed out: the base width, or a wider
+        # space it has already moved on to
+        if not sid.isdigit() or not ID_WIDTH <= len(sid) <= self.width:
+            return False
+        low, high = _bounds(len(sid))
+        return low <= int(sid) < high
+
+    def reset(self) -> None:
+        self._free.clear()
+        self._free_at.clear()
+        self._start(ID_WIDTH)
+
+    # --------------------------- consistency ------------------------------
+
+    def rebuild(self, records: List[Dict]) -> None:
+        ids = [str(r["id"]) for r in records]
+        self.reset()
+        widest = max((len(s) for s in ids if s.isdigit() and ID_WIDTH <= len(s) <= self.max_width),
+                     default=ID_WIDTH)
+        self._start(widest)
+        # holes left in the smaller spaces stay allocatable through the free list
+        for width in range(ID_WIDTH, widest):
+            low, high = _bounds(width)
+            used = bytearray(high - low)
+            for s in ids:
+                if len(s) == width and s.isdigit() and low <= int(s) < high:
+                    used[int(s) - low] = 1
+            for k in (i for i, u in enumerate(used) if not u):
+                self._push_free(f"{k + low:0{width}d}")
+        for s in ids:
+            k = self._index(s)
+            if k is not None:
+                self._set(k)
+
+    def rebuild_from(self, store: Store) -> None:
+        if not store.partitioned:
+            return super().rebuild_from(store)
+        self.rebuild([{"id": sid} for part in store.scan(record_ids) for sid in part])
+
+    def __len__(self) -> int:
+        # ids in use in the current space
+        return self._used
+
+    # ----------------------------- internals ------------------------------
+
+    def _index(self, sid: str) -> Optional[int]:
+        if len(sid) != self.width or not sid.isdigit():
+            return None
+        k = int(sid) - self._low
+        return k if 0 <= k < self._space else None
+
+    def _format(self, k: int) -> str:
+        return f"{k + self._low:0{self.width}d}"
+
+    def _test(self, k: int) -> bool:
+        return bool(self._bits[k >> 3] & (1 << (k & 7)))
+
+    def _set(self, k: int) -> None:
+        if not self._test(k):
+            self._bits[k >> 3] |= 1 << (k & 7)
+            self._used += 1
+
+    def _push_free(self, sid: str) -> None:
+        if sid not in self._free_at:
+            self._free_at[sid] = len(self._free)
+            self._free.append(sid)
+
+    def _drop_free(self, sid: str) -> None:
+        i = self._free_at.pop(sid, None)
+        if i is not None:
+            last = self._free.pop()
+            if last != sid:
+                self._free[i] = last
+                self._free_at[last] = i
+
+    def _feistel(self, x: int, keys: List[int]) -> int:
+        left, right = x >> self._half, x & self._mask
+        for key in keys:
+            left, right = right, left ^ (_mix(right, key) & self._mask)
+        return (left << self._half) | right
+
+    def _permute(self, i: int) -> int:
+        # cycle-walk: a permutation of [0, 4**half) restricted to [0, space)
+        x = self._feistel(i, self._keys)
+        while x >= self._space:
+            x = self._feistel(x, self._keys)
+        return x
+
+    def _unpermute(self, k: int) -> int:
+        x = self._unfeistel(k)
+        while x >= self._space:
+            x = self._unfeistel(x)
+        return x
+
+    def _unfeistel(self, x: int) -> int:
+        left, right = x >> self._half, x & self._mask
+        for key in reversed(self._keys):
+            left, right = right ^ (_mix(left, key) & self._mask), left
+        return (left << self._half) | right
+
+def pick_unused(used: Iterable[int], low: int, high: int) -> int:
+    # uniform pick from [low, high] minus `used` with one random draw, O(k log k)
+    # in the number of used values instead of retrying until a free one comes up
+    taken = sorted({u for u in used if low <= u <= high})
+    free = high - low + 1 - len(taken)
+    if free <= 0:
+        raise ValueError("no unused id left")
+    n = low + random.randrange(free)
+    for u in taken:
+        if u > n:
+            break
+        n += 1
+    return n
+
+def id_allocator_for(store: Store) -> IdAllocator:
+    # the allocator for this store, rebuilt from the data if another writer got ahead of it
+    return sidecar_for(IdAllocator, store).ensure(store)
+
+def record_ids(rows: List[Row]) -> List[str]:
+    # one shard's ids for a rebuild (runs in a worker process, see core.sharded)
+    return [str(r["id"]) for _, r in rows]
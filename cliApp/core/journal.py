@@ -0,0 +1,293 @@
+import json, os, threading
+from typing import Dict, Iterable, List, Optional
+from . import metrics
+from .codec import codec_from_env, decode, encode
+from .locking import atomic_write
+from .store import Op, Store, Signature, apply_op, copy_record, file_signature, next_revision, op_id
+
+# Log-structured store: students.data stays a snapshot of the whole list (in
+# the UNI_CODEC codec, see core.codec), and every mutation is appended as one
+# JSON line to "<path>.journal". Loading replays the journal over the snapshot;
+# once the journal grows past a threshold it is folded back into a new snapshot
+# on a background thread.
+#
+# Every journal file starts with a {"op": "base", "at": N} line: N counts the
+# journal bytes already folded into the snapshot, so base + bytes after the
+# header is a logical position that only grows. That position is the store's
+# signature, which therefore does not change when compaction rewrites files.
+#
+# Across processes, readers hold the store's shared file lock while they look
+# at the snapshot/journal pair and writers (appends, compaction's swap) hold it
+# exclusively, so nobody sees a new snapshot with the old journal. Lock order is
+# always file lock first, then the in-process _lock.
+
+def _header(base: int) -> bytes:
+    return (json.dumps({"op": "base", "at": base}, separators=(",", ":")) + "\n").encode("utf-8")
+
+class JournalStore(Store):
+    incremental = True
+
+    def __init__(self, path: str,
+                 max_journal_bytes: int = 4 * 1024 * 1024,
+                 compact_ratio: float = 0.5,
+                 min_compact_bytes: int = 64 * 1024,
+                 fsync: bool = False,
+                 codec: Optional[str] = None):
+        super().__init__(path)
+        self.codec = codec or codec_from_env()        # of the snapshot; the journal is always JSON lines
+        self.journal_path = path + ".journal"
+        self.max_journal_bytes = max_journal_bytes   # compact once the journal is this large ...
+        self.compact_ratio = compact_ratio           # ... or this large relative to the snapshot
+        self.min_compact_bytes = min_compact_bytes
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._records: Dict[str, Dict] = {}
+        self._snapshot_sig: Signature = None
+        self._offset = 0          # journal bytes already applied to _records
+        self._base = 0            # "at" of the current journal's header
+        self._header_len = 0
+        self._compactor: Optional[threading.Thread] = None
+
+    # ----------------------------- Store API ------------------------------
+
+    def load_all(self) -> List[Dict]:
+        with self.lock.shared(), self._lock:
+            self._refresh()
+            return [copy_record(r) for r in self._records.values()]
+
+    def save_all(self, records: List[Dict]) -> None:
+        # a compaction still running aborts when it sees the new snapshot
+        with self.lock.exclusive(), self._lock:
+            base = self._position() + 1      # a full rewrite still moves the position forward
+            self._records = {r["id"]: copy_record(r) for r in records}
+            self._write_snapshot(list(self._records.values()))
+            self._write_journal(_header(base))
+            self._snapshot_sig = file_signature(self.path)
+            self._base, self._header_len = base, len(_header(base))
+            self._offset = self._header_len
+
+    def upsert(self, record: Dict) -> None:
+        self.upsert_many([record])
+
+    def upsert_many(self, records: Iterable[Dict]) -> None:
+        # checked against the revisions on disk; nothing is appended if any record is stale
+        records = list(records)
+        with self.lock.exclusive(), self._lock:
+            self._refresh()
+            revs: List[int] = []
+            written: Dict[str, Dict] = {}
+            for r in records:
+                revs.append(next_revision(written.get(r["id"], self._records.get(r["id"])), r))
+                written[r["id"]] = {"rev": revs[-1]}
+            self._append(*({"op": "upsert", "student": dict(r, rev=rev)} for r, rev in zip(records, revs)))
+        for r, rev in zip(records, revs):
+            r["rev"] = rev
+
+    def delete(self, sid: str) -> bool:
+        with self.lock.exclusive(), self._lock:
+            self._refresh()
+            if sid not in self._records:
+                return False
+            self._append({"op": "delete", "id": sid})
+            return True
+
+    def add_subject(self, sid: str, subject: Dict) -> None:
+        self._append({"op": "add_subject", "id": sid, "subject": subject})
+
+    def remove_subject(self, sid: str, subject_id: str) -> None:
+        self._append({"op": "remove_subject", "id": sid, "subject": subject_id})
+
+    def clear(self) -> None:
+        self._append({"op": "clear"})
+
+    def commit(self, ops: List[Op]) -> List[Optional[int]]:
+        # the whole batch is one append; revisions are checked on copies of the
+        # students it touches, so a stale upsert leaves the journal as it was
+        if not ops:
+            return []
+        with self.lock.exclusive(), self._lock:
+            self._refresh()
+            touched = {sid: copy_record(self._records[sid]) for sid in map(op_id, ops) if sid in self._records}
+            revs = [apply_op(touched, op) for op in ops]
+            self._append(*(op if rev is None else dict(op, student=dict(op["student"], rev=rev))
+                           for op, rev in zip(ops, revs)))
+        return revs
+
+    def get(self, sid: str) -> Optional[Dict]:
+        with self.lock.shared(), self._lock:
+            self._refresh()
+            rec = self._records.get(sid)
+            return copy_record(rec) if rec is not None else None
+
+    def signature(self) -> Signature:
+        return (self._position(),)
+
+    def files(self) -> List[str]:
+        return [self.path, self.journal_path]
+
+    def close(self) -> None:
+        self._wait_for_compactor()
+        super().close()
+
+    # ----------------------------- journal --------------------------------
+
+    def _append(self, *entries: Dict) -> None:
+        # all entries go out in one write (and one fsync when enabled)
+        lines = [(json.dumps(e, separators=(",", ":")) + "\n").encode("utf-8") for e in entries]
+        data = b"".join(lines)
+        with self.lock.exclusive(), self._lock:
+            self._refresh()
+            with open(self.journal_path, "ab") as f:
+                if f.tell() == 0:
+                    data = _header(self._base) + data
+                    self._header_len = len(_header(self._base))
+                elif f.tell() != self._offset:
+                    # drop a torn line left behind by a crashed writer
+                    f.truncate(self._offset)
+                    f.seek(self._offset)
+                f.write(data)
+                metrics.count("bytes_written", len(data))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            for e in entries:
+                self._apply(e)
+            self._offset += len(data)
+            self._maybe_compact()
+
+    def _refresh(self) -> None:
+        # Bring _records up to date with disk: full reload if the snapshot was
+        # replaced, otherwise replay only the journal bytes we have not seen yet.
+        if not os.path.exists(self.path):
+            self._write_snapshot([])
+        snap_sig = file_signature(self.path)
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            size = 0
+        if snap_sig != self._snapshot_sig or size < self._offset:
+            self._load_snapshot()
+            self._snapshot_sig = snap_sig
+            self._offset = 0
+            self._base = self._header_len = 0
+        if size > self._offset:
+            self._replay()
+
+    def _load_snapshot(self) -> None:
+        with open(self.path, "rb") as f:
+            with metrics.span("file.read"):
+                data = f.read()
+        metrics.count("bytes_read", len(data))
+        with metrics.span("codec.decode"):
+            try:
+                raw = decode(data)
+            except ValueError:
+                raw = []
+        self._records = {r["id"]: r for r in raw} if isinstance(raw, list) else {}
+
+    @metrics.timed("journal.replay")
+    def _replay(self) -> None:
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._offset)
+            metrics.count("bytes_read", os.fstat(f.fileno()).st_size - self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break                      # torn write; ignored until overwritten
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry["op"] == "base":
+                    self._base, self._header_len = entry["at"], len(line)
+                else:
+                    self._apply(entry)
+                self._offset += len(line)
+
+    def _position(self) -> int:
+        # logical journal position (see module comment), read from disk
+        try:
+            with open(self.journal_path, "rb") as f:
+                first = f.readline()
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return 0
+        try:
+            head = json.loads(first)
+        except ValueError:
+            head = None
+        if isinstance(head, dict) and head.get("op") == "base":
+            return head["at"] + size - len(first)
+        return size
+
+    def _apply(self, entry: Dict) -> None:
+        apply_op(self._records, entry, check=False)   # revisions were checked before the append
+
+    # ---------------------------- compaction ------------------------------
+
+    def _should_compact(self) -> bool:
+        pending = self._offset - self._header_len
+        if pending >= self.max_journal_bytes:
+            return True
+        if pending < self.min_compact_bytes:
+            return False
+        snap_size = (self._snapshot_sig or (0, 0, 0))[1]
+        return pending >= self.compact_ratio * snap_size
+
+    def _maybe_compact(self) -> None:
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        if self._should_compact():
+            self._compactor = threading.Thread(target=self.compact, name="journal-compactor", daemon=True)
+            self._compactor.start()
+
+    def compact(self) -> None:
+        # Serialize a point-in-time copy outside the locks, then swap it in and
+        # carry over whatever was appended to the journal in the meantime.
+        with self.lock.shared(), self._lock:
+            self._refresh()
+            records = [copy_record(r) for r in self._records.values()]
+            upto = self._offset
+            base_sig = self._snapshot_sig
+        tmp = self._write_snapshot(records, replace=False)
+        with self.lock.exclusive(), self._lock:
+            self._refresh()
+            if self._snapshot_sig != base_sig or self._offset < upto:
+                os.remove(tmp)    # snapshot was replaced while we worked; nothing to fold
+                return
+            with open(self.journal_path, "rb") as f:
+                f.seek(upto)
+                tail = f.read()
+            metrics.count("bytes_read", len(tail))
+            base = self._base + upto - self._header_len
+            head = _header(base)
+            os.replace(tmp, self.path)
+            self._write_journal(head + tail)
+            self._snapshot_sig = file_signature(self.path)
+            # keep what was already applied from the tail; replay the rest
+            self._offset = len(head) + self._offset - upto
+            self._base, self._header_len = base, len(head)
+            self._refresh()
+
+    def _wait_for_compactor(self) -> None:
+        t = self._compactor
+        if t is not None and t is not threading.current_thread():
+            t.join()
+
+    def _write_snapshot(self, records: List[Dict], replace: bool = True) -> Optional[str]:
+        with metrics.span("codec.encode"):
+            data = encode(records, self.codec)
+        if replace:
+            atomic_write(self.path, data, self.fsync)
+            return None
+        # compaction: written under a name of its own, renamed in later
+        tmp = f"{self.path}.{os.getpid()}.compact"
+        metrics.count("bytes_written", len(data))
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        return tmp
+
+    def _write_journal(self, data: bytes) -> None:
+        atomic_write(self.journal_path, data, self.fsync)
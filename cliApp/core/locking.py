@@ -0,0 +1,91 @@
+import os, threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+from . import metrics
+
+# fcntl is POSIX-only: elsewhere the lock below still serializes threads in this
+# process, but other processes are not kept out.
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - depends on the platform
+    fcntl = None
+
+_SH, _EX, _UN = (fcntl.LOCK_SH, fcntl.LOCK_EX, fcntl.LOCK_UN) if fcntl else (1, 2, 0)
+
+class FileLock:
+    # Reader/writer lock shared by every process using the same data file:
+    # shared() lets any number of readers in at once, exclusive() admits one
+    # writer and no readers. It is an flock() on a separate "<path>.lock" file,
+    # because the data files themselves are replaced on every atomic write.
+    #
+    # Holds are re-entrant within a process. Threads of one process take turns
+    # (the flock is per process, not per thread), and asking for exclusive()
+    # while holding shared() upgrades the hold until the outermost one ends.
+    def __init__(self, path: str):
+        self.path = path
+        self._mutex = threading.RLock()
+        self._fd: Optional[int] = None
+        self._mode = 0
+        self._depth = 0
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        with self._hold(_SH):
+            yield
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._hold(_EX):
+            yield
+
+    @contextmanager
+    def _hold(self, mode: int) -> Iterator[None]:
+        with self._mutex:
+            outer = self._depth == 0
+            if outer or (mode == _EX and self._mode == _SH):
+                self._flock(mode)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if outer:
+                    self._flock(_UN)
+
+    def close(self) -> None:
+        with self._mutex:
+            if self._fd is not None and self._depth == 0:
+                os.close(self._fd)
+                self._fd = None
+
+    def _flock(self, mode: int) -> None:
+        self._mode = mode
+        if fcntl is None:
+            return
+        if self._fd is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, mode)
+
+def atomic_write(path: str, data: Union[str, bytes], fsync: bool = False) -> None:
+    # write to a temp file next to `path`, then rename it over `path`: readers
+    # see either the old or the new contents, never a partial file. The temp
+    # name is unique per process and thread so concurrent writers never share it.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    mode = "wb" if isinstance(data, bytes) else "w"
+    metrics.count("bytes_written", len(data))
+    try:
+        with metrics.span("file.write"), \
+                open(tmp, mode, **({} if isinstance(data, bytes) else {"encoding": "utf-8"})) as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
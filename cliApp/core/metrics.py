@@ -0,0 +1,188 @@
+import atexit, functools, os, sys, threading, time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, TypeVar
+
+# Opt-in instrumentation shared by cliApp and guiApp: timing spans around the
+# storage, controller and output hot paths, plus counters (bytes read and
+# written, terminal output, cache hits...). Switched on with --profile on
+# either app or UNI_PROFILE=1; a report is printed to stderr at exit (or
+# written to UNI_PROFILE_OUT). While it is off, span() hands back a shared
+# no-op context and timed() functions make one flag check per call.
+
+PROFILE_ENV = "UNI_PROFILE"          # "1" to enable
+PROFILE_OUT_ENV = "UNI_PROFILE_OUT"  # report file instead of stderr
+CPROFILE_ENV = "UNI_CPROFILE"        # path: also run under cProfile, stats saved there
+
+# latency histogram buckets: powers of two in microseconds, 1us .. ~67s
+_BUCKETS = 27
+
+class _Histogram:
+    __slots__ = ("count", "total", "low", "high", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.low = float("inf")
+        self.high = 0.0
+        self.buckets = [0] * _BUCKETS
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.low = min(self.low, seconds)
+        self.high = max(self.high, seconds)
+        us = int(seconds * 1e6)
+        self.buckets[min(us.bit_length(), _BUCKETS - 1)] += 1
+
+    def quantile(self, q: float) -> float:
+        # upper edge of the bucket holding the q-th sample (never above the max seen)
+        want, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= want:
+                return min((1 << i) / 1e6, self.high)
+        return self.high
+
+_enabled = False
+_lock = threading.Lock()
+_spans: Dict[str, _Histogram] = {}
+_counters: Dict[str, int] = {}
+_NULL = nullcontext()
+
+def enabled() -> bool:
+    return _enabled
+
+def enable(report_to: Optional[str] = None) -> None:
+    # start collecting; the report is written when the process exits
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    atexit.register(_report_at_exit, report_to or os.environ.get(PROFILE_OUT_ENV))
+
+def enable_from_env() -> None:
+    if os.environ.get(PROFILE_ENV, "").strip().lower() not in ("", "0", "no", "false", "off"):
+        enable()
+
+def reset() -> None:
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+def record(name: str, seconds: float) -> None:
+    with _lock:
+        h = _spans.get(name)
+        if h is None:
+            h = _spans[name] = _Histogram()
+        h.add(seconds)
+
+def count(name: str, n: int = 1) -> None:
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+@contextmanager
+def _span(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def span(name: str):
+    # with metrics.span("json.parse"): ...
+    return _span(name) if _enabled else _NULL
+
+F = TypeVar("F", bound=Callable)
+
+def timed(name: str) -> Callable[[F], F]:
+    # decorator form of span()
+    def wrap(fn: F) -> F:
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return inner
+    return wrap
+
+# ------------------------------- reporting --------------------------------
+
+def snapshot() -> Dict:
+    # everything collected so far, as plain data
+    with _lock:
+        spans = {name: {"count": h.count, "total_s": round(h.total, 6),
+                        "min_s": round(h.low, 6), "max_s": round(h.high, 6),
+                        "p50_s": round(h.quantile(0.5), 6), "p90_s": round(h.quantile(0.9), 6),
+                        "p99_s": round(h.quantile(0.99), 6),
+                        "histogram_us": {str(1 << i): n for i, n in enumerate(h.buckets) if n}}
+                 for name, h in _spans.items()}
+        return {"spans": spans, "counters": dict(_counters)}
+
+def _fmt_seconds(s: float) -> str:
+    if s >= 1:
+        return f"{s:.2f}s"
+    if s >= 1e-3:
+        return f"{s * 1e3:.2f}ms"
+    return f"{s * 1e6:.0f}us"
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GiB"
+
+def format_report() -> str:
+    with _lock:
+        spans = sorted(_spans.items(), key=lambda kv: kv[1].total, reverse=True)
+        counters = sorted(_counters.items())
+    lines: List[str] = ["== profile: time per operation (sorted by total) =="]
+    lines.append(f"{'operation':<32}{'calls':>8}{'total':>10}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for name, h in spans:
+        lines.append(f"{name:<32}{h.count:>8}{_fmt_seconds(h.total):>10}{_fmt_seconds(h.total / h.count):>10}"
+                     f"{_fmt_seconds(h.quantile(0.5)):>10}{_fmt_seconds(h.quantile(0.9)):>10}"
+                     f"{_fmt_seconds(h.quantile(0.99)):>10}{_fmt_seconds(h.high):>10}")
+    for name, h in spans:
+        peak = max(h.buckets)
+        lines.append(f"-- {name} latency histogram --")
+        for i, n in enumerate(h.buckets):
+            if n:
+                lines.append(f"  <{_fmt_seconds((1 << i) / 1e6):>8} {n:>8} {'#' * max(1, round(40 * n / peak))}")
+    if counters:
+        lines.append("== counters ==")
+        for name, n in counters:
+            lines.append(f"{name:<32}{_fmt_bytes(n) if name.startswith('bytes') else n:>12}")
+    return "\n".join(lines) + "\n"
+
+def write_report(stream: TextIO) -> None:
+    stream.write(format_report())
+    stream.flush()
+
+def _report_at_exit(path: Optional[str]) -> None:
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            write_report(f)
+    else:
+        write_report(sys.stderr)
+
+# -------------------------------- cProfile --------------------------------
+
+def run_profiled(fn: Callable[[], object], stats_path: Optional[str] = None) -> object:
+    # run fn under cProfile when a stats path is given (or UNI_CPROFILE is set):
+    # the raw stats go to that file (open with pstats / snakeviz) and the top
+    # functions by cumulative time to stderr
+    stats_path = stats_path or os.environ.get(CPROFILE_ENV)
+    if not stats_path:
+        return fn()
+    import cProfile, pstats
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(fn)
+    finally:
+        prof.dump_stats(stats_path)
+        pstats.Stats(prof, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
@@ -1,4 +1,6 @@
-from typing import Dict, List, Optional
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional
 
 def grade_from_mark(mark: int) -> str:
     if mark < 50:    return "Z"
@@ -8,25 +10,41 @@ def grade_from_mark(mark: int) -> str:
     return "HD"
 
 class Subject:
-    def __init__(self, sid: str, mark: int, grade: str):
-        self.id = sid
+    # __slots__ and no stored grade: the grade is worked out from the mark, and
+    # only a grade that disagrees with it (hand-edited data) is kept explicitly.
+    __slots__ = ("id", "mark", "_grade")
+
+    def __init__(self, sid: str, mark: int, grade: Optional[str] = None):
+        self.id = sys.intern(sid)          # at most 1000 distinct subject ids
         self.mark = mark
         self.grade = grade
 
+    @property
+    def grade(self) -> str:
+        return self._grade or grade_from_mark(self.mark)
+
+    @grade.setter
+    def grade(self, grade: Optional[str]) -> None:
+        self._grade = None if grade is None or grade == grade_from_mark(self.mark) else sys.intern(grade)
+
     def to_dict(self) -> Dict:
         return {"id": self.id, "mark": self.mark, "grade": self.grade}
 
     @staticmethod
     def from_dict(d: Dict) -> "Subject":
-        return Subject(d["id"], int(d["mark"]), d["grade"])
+        return Subject(d["id"], int(d["mark"]), d.get("grade"))
 
 class Student:
-    def __init__(self, sid: str, name: str, email: str, password: str, subjects: Optional[List[Subject]] = None):
+    __slots__ = ("id", "name", "email", "password", "subjects", "rev")
+
+    def __init__(self, sid: str, name: str, email: str, password: str, subjects: Optional[List[Subject]] = None,
+                 rev: int = 0):
         self.id = sid
         self.name = name
         self.email = email
         self.password = password
         self.subjects: List[Subject] = subjects or []
+        self.rev = rev       # stored revision this object was read at (see core.store.next_revision)
 
     def to_dict(self) -> Dict:
         return {
@@ -35,12 +53,13 @@ class Student:
             "email": self.email,
             "password": self.password,
             "subjects": [s.to_dict() for s in self.subjects],
+            "rev": self.rev,
         }
 
     @staticmethod
     def from_dict(d: Dict) -> "Student":
         subs = [Subject.from_dict(s) for s in d.get("subjects", [])]
-        return Student(d["id"], d["name"], d["email"], d["password"], subs)
+        return Student(d["id"], d["name"], d["email"], d["password"], subs, int(d.get("rev", 0)))
 
     # Business rules
     def can_enrol_more(self) -> bool:
@@ -70,3 +89,58 @@ class Student:
         if avg is None:
             return None
         return grade_from_mark(int(round(avg)))
+
+class SubjectTable:
+    # Struct-of-arrays form of every student's subjects, for bulk work over the
+    # whole dataset: student i owns marks[offsets[i]:offsets[i] + counts[i]].
+    # Marks and subject ids fit in unsigned 16-bit slots, counts in a byte
+    # (can_enrol_more caps a student at 4 subjects). Data that does not fit
+    # (a negative mark, a non-numeric subject id) raises ValueError, before
+    # anything of that student is added; callers then work per student instead.
+    __slots__ = ("subject_ids", "marks", "counts", "offsets")
+
+    def __init__(self):
+        self.subject_ids = array("H")
+        self.marks = array("H")
+        self.counts = array("B")
+        self.offsets = array("L")
+
+    @staticmethod
+    def from_students(students: Iterable[Student]) -> "SubjectTable":
+        t = SubjectTable()
+        for s in students:
+            t._append(s.subjects, lambda sub: (int(sub.id), sub.mark))
+        return t
+
+    @staticmethod
+    def from_records(records: Iterable[Dict]) -> "SubjectTable":
+        t = SubjectTable()
+        for r in records:
+            t._append(r.get("subjects", []), lambda sub: (int(sub["id"]), int(sub["mark"])))
+        return t
+
+    def _append(self, subjects, fields) -> None:
+        rows = [fields(sub) for sub in subjects]      # ValueError for an id like "x17"
+        if len(rows) > 0xFF or any(not 0 <= v <= 0xFFFF for row in rows for v in row):
+            raise ValueError("subjects do not fit the packed columns")
+        self.offsets.append(len(self.marks))
+        self.counts.append(len(rows))
+        for sid, mark in rows:
+            self.subject_ids.append(sid)
+            self.marks.append(mark)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def subjects_of(self, i: int) -> List[Subject]:
+        start = self.offsets[i]
+        return [Subject(f"{self.subject_ids[j]:03d}", self.marks[j])
+                for j in range(start, start + self.counts[i])]
+
+    def mark_sum(self, i: int) -> int:
+        start = self.offsets[i]
+        return sum(self.marks[start:start + self.counts[i]])
+
+    def average_mark(self, i: int) -> Optional[float]:
+        n = self.counts[i]
+        return self.mark_sum(i) / n if n else None
@@ -0,0 +1,318 @@
+import heapq, json
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .analytics import GRADE_CUTOFFS, GRADE_LABELS
+from .models import grade_from_mark
+from .sidecar import Sidecar, sidecar_for
+from .store import Row as StoredRow, Store
+
+# Secondary indexes behind the admin student queries, persisted next to the
+# data as "<path>.index" and kept in step with it like the grade view (see
+# core.sidecar):
+#   - per student: name, email, mark sum, subject count, position in the data
+#   - every student with subjects, sorted by (average mark, position): mark
+#     and grade ranges are a bisect, top/bottom-N a slice from either end
+#   - students by email domain and by subject count
+# A query starts from whichever of these gives the fewest candidates and checks
+# its other conditions on each one, so it only scans everyone when it has no
+# condition at all.
+
+SORTS = ("file", "avg", "-avg")
+KEYS = ("grade", "mark", "domain", "subjects", "sort", "top", "bottom", "page", "size")
+PAGE_SIZE = 20
+
+Hit = Tuple[str, str, str, Optional[float], int]   # (id, name, email, average or None, subjects)
+
+class Query:
+    # grade: "N/A" or Z..HD; marks: (low, high) average, inclusive, either None;
+    # domain: what follows "@" in the email (case-insensitive); subjects: count;
+    # sort: "file" (data order), "avg" or "-avg" (students without subjects last);
+    # top: keep only the first N matches in that order; offset/limit: the page wanted.
+    def __init__(self, grade: Optional[str] = None, marks: Tuple[Optional[float], Optional[float]] = (None, None),
+                 domain: Optional[str] = None, subjects: Optional[int] = None, sort: str = "file",
+                 top: Optional[int] = None, offset: int = 0, limit: Optional[int] = None):
+        self.grade = grade
+        self.marks = marks
+        self.domain = domain.lower() if domain else None
+        self.subjects = subjects
+        self.sort = sort
+        self.top = top
+        self.offset = offset
+        self.limit = limit
+
+    def end(self) -> Optional[int]:
+        # index after the last match on the page
+        end = self.offset + self.limit if self.limit is not None else None
+        return self.top if end is None else end if self.top is None else min(end, self.top)
+
+def parse_query(text: str) -> Query:
+    # "grade=HD mark=60-80 domain=university.com subjects=2 sort=-avg top=10 page=2 size=20";
+    # raises ValueError naming the part it could not use
+    opts: Dict[str, str] = {}
+    for part in text.split():
+        key, eq, value = part.partition("=")
+        if not eq or key.lower() not in KEYS or not value:
+            raise ValueError(f"unknown query part: {part}")
+        opts[key.lower()] = value
+    q = Query(domain=opts.get("domain"))
+    if "grade" in opts:
+        q.grade = _parsed(opts, "grade", lambda v: _one_of(v.upper(), ("N/A",) + GRADE_LABELS))
+    if "mark" in opts:
+        q.marks = _parsed(opts, "mark", _mark_range)
+    if "subjects" in opts:
+        q.subjects = _parsed(opts, "subjects", int)
+    q.sort = _parsed(opts, "sort", lambda v: _one_of(v, SORTS)) if "sort" in opts else "file"
+    if "top" in opts or "bottom" in opts:
+        key = "top" if "top" in opts else "bottom"
+        q.sort, q.top = ("-avg" if key == "top" else "avg"), _parsed(opts, key, int)
+    if "page" in opts or "size" in opts:
+        size = _parsed(opts, "size", int) if "size" in opts else PAGE_SIZE
+        q.offset, q.limit = (_parsed(opts, "page", int) - 1 if "page" in opts else 0) * size, size
+    return q
+
+def _parsed(opts: Dict[str, str], key: str, parse):
+    try:
+        return parse(opts[key])
+    except ValueError:
+        raise ValueError(f"bad value for {key}: {opts[key]}") from None
+
+def _one_of(value: str, allowed: Tuple[str, ...]) -> str:
+    if value not in allowed:
+        raise ValueError(value)
+    return value
+
+def _mark_range(text: str) -> Tuple[Optional[float], Optional[float]]:
+    # "60-80", "60-" (at least), "-80" (at most) or "75" (exactly)
+    low, dash, high = text.partition("-")
+    if not dash:
+        return float(low), float(low)
+    return (float(low) if low else None), (float(high) if high else None)
+
+def _domain(email: str) -> str:
+    return email.rpartition("@")[2].lower()
+
+def _grade(entry: list) -> str:
+    # same rounding as grade_view / the reports
+    return grade_from_mark(int(round(entry[2] / entry[3]))) if entry[3] else "N/A"
+
+def _grade_range(grade: str) -> Tuple[float, float]:
+    # averages that can round into `grade`, half a mark wider on each side; exact check after
+    c = GRADE_LABELS.index(grade)
+    low = GRADE_CUTOFFS[c - 1] - 0.5 if c > 0 else float("-inf")
+    high = GRADE_CUTOFFS[c] + 0.5 if c < len(GRADE_CUTOFFS) else float("inf")
+    return low, high
+
+class StudentIndex(Sidecar):
+    suffix = ".index"
+    eager = False     # opened by queries only; writes while it is closed leave it to be rebuilt
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._students: Dict[str, list] = {}          # id -> [name, email, mark sum, subjects, seq]
+        self._by_avg: List[Tuple[float, int, str]] = []  # (average, seq, id), students with subjects
+        self._by_domain: Dict[str, Dict[str, None]] = {}
+        self._by_count: Dict[int, Dict[str, None]] = {}
+        self._next_seq = 0
+
+    # ----------------------------- persistence ----------------------------
+
+    def _restore(self, data: bytes) -> str:
+        # everything is saved ready-made (buckets, the average index in order),
+        # so loading does no per-student work beyond building the dicts
+        raw = json.loads(data)
+        self._next_seq = raw["next_seq"]
+        self._students = {r[0]: r[1:] for r in raw["students"]}
+        self._by_avg = list(zip(*raw["by_avg"]))
+        self._by_domain = {k: dict.fromkeys(v) for k, v in raw["by_domain"].items()}
+        self._by_count = {int(k): dict.fromkeys(v) for k, v in raw["by_count"].items()}
+        return raw["stamp"]
+
+    def _dump(self) -> bytes:
+        raw = {
+            "stamp": self._synced,
+            "next_seq": self._next_seq,
+            "students": [[sid] + e for sid, e in self._students.items()],
+            "by_avg": [list(col) for col in zip(*self._by_avg)] or [[], [], []],
+            "by_domain": {k: list(v) for k, v in self._by_domain.items()},
+            "by_count": {k: list(v) for k, v in self._by_count.items()},
+        }
+        return json.dumps(raw, separators=(",", ":")).encode("utf-8")
+
+    # -------------------------- write-side hooks --------------------------
+
+    def update(self, sid: str, name: str, email: str, marks: Iterable[int]) -> None:
+        marks = list(marks)
+        entry = self._students.get(sid)
+        if entry is None:
+            entry = self._students[sid] = [name, email, 0, 0, self._next_seq]
+            self._next_seq += 1
+        else:
+            self._unlink(sid, entry)
+        entry[:4] = [name, email, sum(marks), len(marks)]
+        self._link(sid, entry)
+
+    def remove(self, sid: str) -> None:
+        entry = self._students.pop(sid, None)
+        if entry is not None:
+            self._unlink(sid, entry)
+
+    def clear(self) -> None:
+        self._students.clear()
+        self._by_avg.clear()
+        self._by_domain.clear()
+        self._by_count.clear()
+
+    # ----------------------------- consistency ----------------------------
+
+    def rebuild(self, records: List[Dict]) -> None:
+        self._load(index_partial(list(enumerate(records))))
+
+    def rebuild_from(self, store: Store) -> None:
+        if not store.partitioned:
+            return super().rebuild_from(store)
+        self._load(heapq.merge(*store.scan(index_partial), key=lambda t: t[0]))
+
+    def _load(self, rows: Iterable[Tuple]) -> None:
+        # rows: (seq, id, name, email, mark sum, subjects) in data order; renumbered 0..n-1
+        self.clear()
+        for i, (_, sid, name, email, total, n) in enumerate(rows):
+            entry = self._students[sid] = [name, email, total, n, i]
+            self._link(sid, entry, sort=False)
+            if n:
+                self._by_avg.append((total / n, i, sid))
+        self._by_avg.sort()
+        self._next_seq = len(self._students)
+
+    # ------------------------------- queries ------------------------------
+
+    def __len__(self) -> int:
+        return len(self._students)
+
+    def select(self, q: Query) -> Tuple[List[Hit], int]:
+        # (the page of matches asked for, how many match in all)
+        source, ordered = self._plan(q)
+        checks = self._checks(q)
+        end = q.end()
+        if not checks and ordered:
+            total = len(source)                      # nothing to filter: page straight off the index
+            ids = list(islice(source, q.offset, end))
+        else:
+            matched = [sid for sid in source if all(ok(self._students[sid]) for ok in checks)]
+            total = len(matched)
+            if not ordered:
+                key = self._sort_key(q.sort)
+                matched = heapq.nsmallest(end, matched, key=key) if end is not None else sorted(matched, key=key)
+            ids = matched[q.offset:end]
+        return [self._hit(sid) for sid in ids], min(total, q.top) if q.top is not None else total
+
+    def _plan(self, q: Query):
+        # the smallest candidate set the indexes give for q, and whether it is
+        # already in q's order
+        # (domain and count buckets are not kept in data order: students move between them)
+        options = []
+        if q.domain is not None:
+            options.append((self._by_domain.get(q.domain, {}), False))
+        if q.subjects is not None:
+            options.append((self._by_count.get(q.subjects, {}), False))
+        if q.grade == "N/A":
+            options.append((self._by_count.get(0, {}), False))
+        low, high = q.marks
+        if q.grade not in (None, "N/A"):
+            g_low, g_high = _grade_range(q.grade)
+            low = g_low if low is None else max(low, g_low)
+            high = g_high if high is None else min(high, g_high)
+        if (low, high) != (None, None) and q.grade != "N/A":
+            i = bisect_left(self._by_avg, (low if low is not None else float("-inf"),))
+            j = max(i, bisect_right(self._by_avg, (high if high is not None else float("inf"), float("inf"))))
+            options.append((_AvgRange(self._by_avg, i, j, q.sort == "-avg"), q.sort != "file"))
+        if not options:
+            if q.sort == "file":
+                return self._students, True
+            return _AvgRange(self._by_avg, 0, len(self._by_avg), q.sort == "-avg",
+                             self._by_count.get(0, {}), self._sort_key("file")), True
+        return min(options, key=lambda o: len(o[0]))
+
+    def _checks(self, q: Query) -> list:
+        checks = []
+        if q.domain is not None:
+            checks.append(lambda e: _domain(e[1]) == q.domain)
+        if q.subjects is not None:
+            checks.append(lambda e: e[3] == q.subjects)
+        if q.grade is not None:
+            checks.append(lambda e: _grade(e) == q.grade)
+        low, high = q.marks
+        if low is not None:
+            checks.append(lambda e: e[3] > 0 and e[2] / e[3] >= low)
+        if high is not None:
+            checks.append(lambda e: e[3] > 0 and e[2] / e[3] <= high)
+        return checks
+
+    def _sort_key(self, sort: str):
+        students = self._students
+        if sort == "file":
+            return lambda sid: students[sid][4]
+        sign = -1 if sort == "-avg" else 1
+        # no subjects sorts last either way; ties in data order
+        return lambda sid: ((0, sign * students[sid][2] / students[sid][3], students[sid][4]) if students[sid][3]
+                            else (1, 0, students[sid][4]))
+
+    def _hit(self, sid: str) -> Hit:
+        name, email, total, n, _ = self._students[sid]
+        return sid, name, email, total / n if n else None, n
+
+    # ----------------------------- internals ------------------------------
+
+    def _link(self, sid: str, entry: list, sort: bool = True) -> None:
+        self._by_domain.setdefault(_domain(entry[1]), {})[sid] = None
+        self._by_count.setdefault(entry[3], {})[sid] = None
+        if sort and entry[3]:
+            insort(self._by_avg, (entry[2] / entry[3], entry[4], sid))
+
+    def _unlink(self, sid: str, entry: list) -> None:
+        self._by_domain.get(_domain(entry[1]), {}).pop(sid, None)
+        self._by_count.get(entry[3], {}).pop(sid, None)
+        if entry[3]:
+            key = (entry[2] / entry[3], entry[4], sid)
+            i = bisect_left(self._by_avg, key)
+            if i < len(self._by_avg) and self._by_avg[i] == key:
+                del self._by_avg[i]
+
+class _AvgRange:
+    # ids of _by_avg[i:j], lowest first (highest first if reverse), then `rest`
+    # (students without subjects) sorted by rest_key; sized so the planner can compare it
+    def __init__(self, by_avg: List[Tuple[float, int, str]], i: int, j: int, reverse: bool,
+                 rest: Optional[Dict[str, None]] = None, rest_key=None):
+        self.by_avg, self.i, self.j, self.reverse = by_avg, i, j, reverse
+        self.rest, self.rest_key = rest or {}, rest_key
+
+    def __len__(self) -> int:
+        return self.j - self.i + len(self.rest)
+
+    def __iter__(self) -> Iterator[str]:
+        by_avg = self.by_avg
+        if not self.reverse:
+            for t in range(self.i, self.j):
+                yield by_avg[t][2]
+        else:
+            # highest average first; students on the same average stay in data order
+            k = self.j
+            while k > self.i:
+                start = bisect_left(by_avg, (by_avg[k - 1][0],), self.i, k)
+                for t in range(start, k):
+                    yield by_avg[t][2]
+                k = start
+        if self.rest:
+            yield from sorted(self.rest, key=self.rest_key)
+
+def index_partial(rows: List[StoredRow]) -> List[Tuple]:
+    # (seq, id, name, email, mark sum, subjects) per student; runs in a worker process for sharded stores
+    out = []
+    for seq, r in rows:
+        marks = [int(s["mark"]) for s in r.get("subjects", [])]
+        out.append((seq, r["id"], r.get("name", ""), r.get("email", ""), sum(marks), len(marks)))
+    return out
+
+def student_index_for(store: Store) -> StudentIndex:
+    return sidecar_for(StudentIndex, store)
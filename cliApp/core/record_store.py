@@ -0,0 +1,592 @@
+import glob, json, mmap, os, random, struct, threading, zlib
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import metrics
+from .codec import GRADES, SUBJECT_IDS, plain_record
+from .locking import atomic_write
+from .store import JsonStore, Op, Signature, Store, apply_op, copy_record, op_id
+
+# Fixed-width backend: one 64-byte slot per student, memory-mapped, so signing
+# in, looking a student up or changing their subjects reads and writes that one
+# slot (and a few bytes of the index) instead of the whole dataset.
+#
+#   <path>                   HEADER, then the slots in registration order
+#   <path>.<epoch>.heap      name, email and password of each slot, back to back;
+#                            append-only, a student whose strings change gets new bytes
+#   <path>.idx               two open-addressing hash tables: id -> slot, crc32 of
+#                            the lowercased email -> slot (see SlotIndex)
+#
+# A slot holds flags, the subject count, rev, the heap offset, the id (UTF-8,
+# NUL-padded to 16 bytes), the email crc32, the three string lengths and up to 4
+# subjects (the most can_enrol_more allows) as u16 id, u8 mark, u8 grade code.
+# A record that does not fit (more subjects, other keys or types, a longer id)
+# is kept as JSON in the heap instead (VERBATIM). Deleting clears LIVE; dead
+# slots and replaced heap bytes are counted in the header, and once they
+# outweigh the live data everything is rewritten under a new epoch, as
+# save_all does.
+#
+# Every write moves the header's gen on and then stamps the index with
+# (epoch, gen); an index stamped otherwise (its writer died half way) is
+# rebuilt from the slots when next used. Other processes notice writes by the
+# files' inode and size (remapped) and by the header (its gen is signature()).
+
+MAGIC = b"UNIFIX01"
+HEADER = struct.Struct("<8sIIQQQQQQQ")
+HEADER_SIZE = 128
+FIELDS = ("magic", "slot_size", "spare", "epoch", "count", "dead", "gen", "heap_end", "garbage", "spare2")
+MAX_SUBJECTS = 4
+SLOT = struct.Struct("<BBxxIQ16sIIII" + "HBB" * MAX_SUBJECTS)
+SLOT_KEYS = struct.Struct("<B15x16sI28x")   # flags, id, email crc: what an index rebuild reads
+LIVE, HAS_REV, VERBATIM = 1, 2, 4
+MIN_SLOTS = 1024
+MIN_GARBAGE = 1 << 20                        # heap bytes before a rewrite is worth it
+STREAM_SLOTS = 4096                          # slots copied per lock hold by iter_records
+GRADE_CODE = {g: i for i, g in enumerate(GRADES)}
+
+IDX_MAGIC = b"UNIIDX01"
+IDX_HEADER = struct.Struct("<8sQQQQQ")       # magic, epoch, gen, capacity, used ids, used emails
+IDX_HEADER_SIZE = 64
+ID_ENTRY = struct.Struct("<16sI")            # id as in the slot, slot + 1
+EMAIL_ENTRY = struct.Struct("<II")           # email crc32, slot + 1
+EMPTY, TOMB = 0, 0xFFFFFFFF
+INVALID = 0xFFFFFFFFFFFFFFFF                 # index gen while a write is under way
+MAX_LOAD = 0.6
+MIN_BUCKETS = 1024
+
+def _email_crc(email) -> int:
+    return zlib.crc32(str(email).lower().encode("utf-8"))
+
+def _pack(r: Dict, off: int) -> Tuple[bytes, tuple]:
+    # (heap bytes, slot fields) for r, its bytes to be written at heap offset `off`
+    key = str(r.get("id")).encode("utf-8")
+    crc = _email_crc(r.get("email", ""))
+    slot_id = key[:16].ljust(16, b"\0")
+    if plain_record(r, MAX_SUBJECTS) and len(key) <= 16 and b"\0" not in key:
+        texts = [r["name"].encode("utf-8"), r["email"].encode("utf-8"), r["password"].encode("utf-8")]
+        subs: List[int] = []
+        for s in r["subjects"]:
+            subs += (int(s["id"]), s["mark"], GRADE_CODE[s["grade"]])
+        subs += (0, 0, 0) * (MAX_SUBJECTS - len(r["subjects"]))
+        flags = LIVE | (HAS_REV if "rev" in r else 0)
+        return b"".join(texts), (flags, len(r["subjects"]), r.get("rev", 0), off, slot_id, crc, *map(len, texts), *subs)
+    blob = json.dumps(r, separators=(",", ":")).encode("utf-8")
+    return blob, (LIVE | VERBATIM, 0, 0, off, slot_id, crc, len(blob), 0, 0) + (0,) * (3 * MAX_SUBJECTS)
+
+def _unpack(f: tuple, heap: bytes, text: Optional[str] = None, base: int = 0) -> Dict:
+    # the record in slot fields f; heap holds its bytes from offset `base`
+    # (text: the same heap decoded, when it is all ASCII)
+    flags, n, rev, at, sid, _, ln, le, lp = f[:9]
+    at -= base
+    if flags & VERBATIM:
+        return json.loads(heap[at:at + ln])
+    if text is not None:
+        name, email, pw = text[at:at + ln], text[at + ln:at + ln + le], text[at + ln + le:at + ln + le + lp]
+    else:
+        name, email, pw = (heap[at:at + ln].decode("utf-8"), heap[at + ln:at + ln + le].decode("utf-8"),
+                           heap[at + ln + le:at + ln + le + lp].decode("utf-8"))
+    r = {"id": sid.rstrip(b"\0").decode("utf-8"), "name": name, "email": email, "password": pw,
+         "subjects": [{"id": SUBJECT_IDS[f[9 + k]], "mark": f[10 + k], "grade": GRADES[f[11 + k]]}
+                      for k in range(0, 3 * n, 3)]}
+    if flags & HAS_REV:
+        r["rev"] = rev
+    return r
+
+class SlotIndex:
+    # "<path>.idx", memory-mapped: after the header, `capacity` ID_ENTRYs then
+    # `capacity` EMAIL_ENTRYs, linear probing from the key's crc32. Removed
+    # entries become TOMB (still probed past); the file is rebuilt, twice the
+    # size, once used entries pass MAX_LOAD.
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._ino: Optional[int] = None
+        self.capacity = 0
+
+    @staticmethod
+    def build(keys: Iterable[Optional[Tuple[bytes, int]]], epoch: int, gen: int) -> bytes:
+        # the file for keys[slot] = (id as in the slot, email crc), None for a dead slot
+        live = [(slot + 1, k) for slot, k in enumerate(keys) if k is not None]
+        cap = MIN_BUCKETS
+        while cap * MAX_LOAD < 2 * len(live):
+            cap *= 2
+        mask = cap - 1
+        ids: List[Optional[tuple]] = [None] * cap
+        emails: List[Optional[tuple]] = [None] * cap
+        for value, (key, crc) in live:
+            i = zlib.crc32(key) & mask
+            while ids[i] is not None:
+                i = (i + 1) & mask
+            ids[i] = (key, value)
+            i = crc & mask
+            while emails[i] is not None:
+                i = (i + 1) & mask
+            emails[i] = (crc, value)
+        empty_id, empty_email = ID_ENTRY.pack(b"", EMPTY), EMAIL_ENTRY.pack(0, EMPTY)
+        return b"".join([IDX_HEADER.pack(IDX_MAGIC, epoch, gen, cap, len(live), len(live)).ljust(IDX_HEADER_SIZE, b"\0"),
+                         b"".join(ID_ENTRY.pack(*e) if e else empty_id for e in ids),
+                         b"".join(EMAIL_ENTRY.pack(*e) if e else empty_email for e in emails)])
+
+    def follow(self) -> None:
+        # (re)open the file if it was replaced since it was mapped
+        try:
+            ino = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            self.close()
+            return
+        if self._mm is None or ino != self._ino:
+            self._open()
+
+    def _open(self) -> None:
+        self.close()
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            mm = mmap.mmap(fd, 0)
+        except (OSError, ValueError):          # empty or unmappable: treated as missing
+            os.close(fd)
+            return
+        magic, _, _, cap, _, _ = IDX_HEADER.unpack_from(mm, 0) if len(mm) >= IDX_HEADER_SIZE else (b"",) * 6
+        if magic != IDX_MAGIC or len(mm) != IDX_HEADER_SIZE + cap * (ID_ENTRY.size + EMAIL_ENTRY.size):
+            mm.close()
+            os.close(fd)
+            return
+        self._fd, self._mm, self._ino, self.capacity = fd, mm, os.fstat(fd).st_ino, cap
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            os.close(self._fd)
+        self._fd = self._mm = self._ino = None
+
+    def stamp(self) -> Optional[Tuple[int, int]]:
+        # (epoch, gen) of the data this index reflects; None if there is no usable index
+        return struct.unpack_from("<QQ", self._mm, 8) if self._mm is not None else None
+
+    def set_stamp(self, epoch: int, gen: int) -> None:
+        struct.pack_into("<QQ", self._mm, 8, epoch, gen)
+
+    def full(self) -> bool:
+        used = struct.unpack_from("<QQ", self._mm, 32)
+        return max(used) + 1 > self.capacity * MAX_LOAD
+
+    # ----- lookups: candidate slots, in probe order -----
+    def ids(self, key: bytes) -> Iterator[int]:
+        for _, (k, v) in self._probe(IDX_HEADER_SIZE, ID_ENTRY, zlib.crc32(key)):
+            if v != TOMB and k == key:
+                yield v - 1
+
+    def emails(self, crc: int) -> Iterator[int]:
+        for _, (c, v) in self._probe(self._emails_at(), EMAIL_ENTRY, crc):
+            if v != TOMB and c == crc:
+                yield v - 1
+
+    # ----- changes -----
+    def add(self, key: bytes, crc: int, slot: int) -> None:
+        self._insert(IDX_HEADER_SIZE, ID_ENTRY, zlib.crc32(key), 32, key, slot + 1)
+        self._insert(self._emails_at(), EMAIL_ENTRY, crc, 40, crc, slot + 1)
+
+    def drop(self, key: bytes, crc: int, slot: int) -> None:
+        self._remove(IDX_HEADER_SIZE, ID_ENTRY, zlib.crc32(key), (key, slot + 1))
+        self.drop_email(crc, slot)
+
+    def drop_email(self, crc: int, slot: int) -> None:
+        self._remove(self._emails_at(), EMAIL_ENTRY, crc, (crc, slot + 1))
+
+    def add_email(self, crc: int, slot: int) -> None:
+        self._insert(self._emails_at(), EMAIL_ENTRY, crc, 40, crc, slot + 1)
+
+    # ----- internals -----
+    def _emails_at(self) -> int:
+        return IDX_HEADER_SIZE + self.capacity * ID_ENTRY.size
+
+    def _probe(self, table: int, entry: struct.Struct, h: int) -> Iterator[Tuple[int, tuple]]:
+        # (offset, entry) from h's bucket up to the first empty one
+        mask = self.capacity - 1
+        i = h & mask
+        while True:
+            at = table + i * entry.size
+            e = entry.unpack_from(self._mm, at)
+            if e[1] == EMPTY:
+                return
+            yield at, e
+            i = (i + 1) & mask
+
+    def _insert(self, table: int, entry: struct.Struct, h: int, used_at: int, *values) -> None:
+        mask = self.capacity - 1
+        i = h & mask
+        while True:
+            at = table + i * entry.size
+            v = entry.unpack_from(self._mm, at)[1]
+            if v in (EMPTY, TOMB):
+                entry.pack_into(self._mm, at, *values)
+                if v == EMPTY:
+                    struct.pack_into("<Q", self._mm, used_at, struct.unpack_from("<Q", self._mm, used_at)[0] + 1)
+                return
+            i = (i + 1) & mask
+
+    def _remove(self, table: int, entry: struct.Struct, h: int, values: tuple) -> None:
+        for at, e in self._probe(table, entry, h):
+            if e == values:
+                entry.pack_into(self._mm, at, values[0], TOMB)
+                return
+
+class RecordStore(Store):
+    incremental = True
+    queryable = True
+
+    def __init__(self, path: str, migrate_from: Optional[str] = None):
+        super().__init__(path)
+        self.migrate_from = migrate_from
+        self._lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._ino: Optional[int] = None
+        self._heap = None                       # unbuffered file of the mapped epoch's heap
+        self._index = SlotIndex(path + ".idx")
+        self._changed = False                   # the write under way has changed something
+
+    def _heap_path(self, epoch: int) -> str:
+        return f"{self.path}.{epoch:016x}.heap"
+
+    # ------------------------------- files --------------------------------
+
+    def ensure(self) -> None:
+        if os.path.exists(self.path):
+            return
+        with self.lock.exclusive(), self._lock:
+            if not os.path.exists(self.path):
+                migrate = self.migrate_from and os.path.exists(self.migrate_from)
+                self._rewrite(JsonStore(self.migrate_from).load_all() if migrate else [])
+
+    def _check(self) -> None:
+        # with the file lock held: follow files another process replaced or
+        # grew, and rebuild the index if it does not reflect the data
+        self.ensure()
+        self._follow()
+        if self._index.stamp() != self._state():
+            with self.lock.exclusive():         # upgrades a reader's shared hold
+                self._follow()
+                if self._index.stamp() != self._state():
+                    self._rebuild_index()
+
+    def _follow(self) -> None:
+        st = os.stat(self.path)
+        if self._mm is None or st.st_ino != self._ino or st.st_size != len(self._mm):
+            self._map()
+        self._index.follow()
+
+    def _map(self) -> None:
+        self._unmap()
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            mm = mmap.mmap(fd, 0)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd, self._mm, self._ino = fd, mm, os.fstat(fd).st_ino
+        h = self._head()
+        if h["magic"] != MAGIC or h["slot_size"] != SLOT.size:
+            self._unmap()
+            raise ValueError(f"not a student record file: {self.path}")
+        self._heap = open(self._heap_path(h["epoch"]), "r+b", buffering=0)
+
+    def _unmap(self) -> None:
+        if self._heap is not None:
+            self._heap.close()
+        if self._mm is not None:
+            self._mm.close()
+            os.close(self._fd)
+        self._fd = self._mm = self._ino = self._heap = None
+
+    def _grow(self, slots: int) -> None:
+        # room for `slots` slots, doubling the file; the mapping is redone around the resize
+        size = HEADER_SIZE + slots * SLOT.size
+        if size <= len(self._mm):
+            return
+        size = max(size, 2 * len(self._mm) - HEADER_SIZE)
+        self._mm.close()
+        os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, 0)
+
+    def _head(self) -> Dict:
+        return dict(zip(FIELDS, HEADER.unpack_from(self._mm, 0)))
+
+    def _put_head(self, h: Dict) -> None:
+        HEADER.pack_into(self._mm, 0, *(h[k] for k in FIELDS))
+
+    def _state(self) -> Tuple[int, int]:
+        h = self._head()
+        return h["epoch"], h["gen"]
+
+    def _rewrite(self, records: List[Dict]) -> None:
+        # everything written afresh under a new epoch (new heap name, new index),
+        # the slot file last: until it replaces the old one, nothing names the new files
+        with metrics.span("records.rewrite"):
+            by_id: Dict[object, Dict] = {}
+            for r in records:
+                by_id[r.get("id")] = r          # one slot per id: first position, last values
+            epoch = random.getrandbits(63)
+            heap, slots, keys = bytearray(), [], []
+            for r in by_id.values():
+                blob, fields = _pack(r, len(heap))
+                heap += blob
+                slots.append(SLOT.pack(*fields))
+                keys.append((fields[4], fields[5]))
+            n = len(slots)
+            head = HEADER.pack(MAGIC, SLOT.size, 0, epoch, n, 0, 0, len(heap), 0, 0).ljust(HEADER_SIZE, b"\0")
+            data = b"".join([head, *slots, bytes((max(MIN_SLOTS, n + n // 4) - n) * SLOT.size)])
+            metrics.count("bytes_written", len(heap))
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self._heap_path(epoch), "wb") as f:
+                f.write(heap)
+            atomic_write(self._index.path, SlotIndex.build(keys, epoch, 0))
+            atomic_write(self.path, data)
+            self._map()
+            self._index.follow()
+        for old in glob.glob(glob.escape(self.path) + ".*.heap"):
+            if old != self._heap_path(epoch):
+                try:
+                    os.remove(old)
+                except OSError:                  # still open elsewhere (Windows); next rewrite
+                    pass
+
+    def _rebuild_index(self, gen: Optional[int] = None) -> None:
+        with metrics.span("records.index"):
+            h = self._head()
+            body = self._mm[HEADER_SIZE:HEADER_SIZE + h["count"] * SLOT.size]
+            keys = [(k, crc) if flags & LIVE else None for flags, k, crc in SLOT_KEYS.iter_unpack(body)]
+            atomic_write(self._index.path, SlotIndex.build(keys, h["epoch"], h["gen"] if gen is None else gen))
+            self._index.follow()
+
+    # ------------------------------- slots --------------------------------
+
+    def _fields(self, slot: int) -> tuple:
+        return SLOT.unpack_from(self._mm, HEADER_SIZE + slot * SLOT.size)
+
+    def _read_heap(self, off: int, n: int) -> bytes:
+        self._heap.seek(off)
+        return self._heap.read(n) if n else b""
+
+    def _record(self, slot: int) -> Dict:
+        f = self._fields(slot)
+        return _unpack(f, self._read_heap(f[3], f[6] + f[7] + f[8]), base=f[3])
+
+    def _find(self, sid: str) -> Optional[int]:
+        # ids of 16 bytes and over share the slot's prefix: the record decides
+        key = str(sid).encode("utf-8")
+        for slot in self._index.ids(key[:16].ljust(16, b"\0")):
+            f = self._fields(slot)
+            if f[0] & VERBATIM:
+                if self._record(slot).get("id") == sid:
+                    return slot
+            elif f[4].rstrip(b"\0") == key:
+                return slot
+        return None
+
+    def _load(self) -> List[Dict]:
+        h = self._head()
+        heap = self._read_heap(0, h["heap_end"])
+        body = self._mm[HEADER_SIZE:HEADER_SIZE + h["count"] * SLOT.size]
+        metrics.count("bytes_read", len(heap) + len(body))
+        text = heap.decode("ascii") if heap.isascii() else None   # one decode, then str slices
+        return [_unpack(f, heap, text) for f in SLOT.iter_unpack(body) if f[0] & LIVE]
+
+    # ------------------------------- writes -------------------------------
+
+    @contextmanager
+    def _write(self) -> Iterator[Dict]:
+        # The header, for the body to change (see _put/_drop, which write it
+        # through). If anything changed, gen moves on and, unless the body
+        # failed part way, the index is stamped to match; a lot of garbage
+        # then gets the whole store rewritten.
+        with self.lock.exclusive(), self._lock, metrics.span("records.write"):
+            self._check()
+            h = self._head()
+            self._changed = ok = False
+            try:
+                yield h
+                ok = True
+            finally:
+                if self._changed:
+                    h["gen"] += 1
+                    self._put_head(h)
+                    if ok:
+                        self._index.set_stamp(h["epoch"], h["gen"])
+            live = h["count"] - h["dead"]
+            if self._changed and (h["dead"] > max(MIN_SLOTS, live)
+                                  or h["garbage"] > max(MIN_GARBAGE, h["heap_end"] - h["garbage"])):
+                self._rewrite(self._load())
+
+    def _touch(self, h: Dict) -> None:
+        # first change of a write: the index is marked in progress until it ends
+        if not self._changed:
+            self._changed = True
+            self._index.set_stamp(h["epoch"], INVALID)
+
+    def _put(self, h: Dict, slot: Optional[int], old: Optional[Dict], new: Dict) -> None:
+        # new into slot (None: a new slot at the end); old is what slot holds now
+        self._touch(h)
+        blob, fields = _pack(new, h["heap_end"])
+        if slot is not None:
+            of = self._fields(slot)
+            if not (of[0] | fields[0]) & VERBATIM and \
+                    (old["name"], old["email"], old["password"]) == (new["name"], new["email"], new["password"]):
+                blob, fields = b"", fields[:3] + (of[3],) + fields[4:]   # same strings: slot only
+            else:
+                h["garbage"] += of[6] + of[7] + of[8]
+        if blob:
+            self._heap.seek(h["heap_end"])
+            self._heap.write(blob)
+            h["heap_end"] += len(blob)
+            metrics.count("bytes_written", len(blob))
+        if slot is None:
+            slot = h["count"]
+            self._grow(slot + 1)
+            SLOT.pack_into(self._mm, HEADER_SIZE + slot * SLOT.size, *fields)
+            h["count"] += 1
+            self._put_head(h)
+            if self._index.full():
+                self._rebuild_index(INVALID)
+            else:
+                self._index.add(fields[4], fields[5], slot)
+            return
+        SLOT.pack_into(self._mm, HEADER_SIZE + slot * SLOT.size, *fields)
+        self._put_head(h)
+        if of[5] != fields[5]:
+            self._index.drop_email(of[5], slot)
+            self._index.add_email(fields[5], slot)
+
+    def _drop(self, h: Dict, slot: int) -> None:
+        self._touch(h)
+        f = self._fields(slot)
+        self._mm[HEADER_SIZE + slot * SLOT.size] = f[0] & ~LIVE
+        h["dead"] += 1
+        h["garbage"] += f[6] + f[7] + f[8]
+        self._put_head(h)
+        self._index.drop(f[4], f[5], slot)
+
+    def _apply(self, h: Dict, ops: List[Op]) -> List[Optional[int]]:
+        # ops run on copies of the students they touch, so a stale upsert stops
+        # the batch before anything is written; then each changed student is written once
+        slots: Dict[str, Optional[int]] = {}
+        before: Dict[str, Optional[Dict]] = {}
+        for op in ops:
+            sid = op_id(op)
+            if sid not in slots:
+                slots[sid] = self._find(sid)
+                before[sid] = self._record(slots[sid]) if slots[sid] is not None else None
+        after = {sid: copy_record(r) for sid, r in before.items() if r is not None}
+        revs = [apply_op(after, op) for op in ops]
+        for sid, slot in slots.items():
+            new = after.get(sid)
+            if new is None:
+                if slot is not None:
+                    self._drop(h, slot)
+            elif new != before[sid]:
+                self._put(h, slot, before[sid], new)
+        return revs
+
+    # ----------------------------- Store API ------------------------------
+
+    @metrics.timed("records.load_all")
+    def load_all(self) -> List[Dict]:
+        with self.lock.shared(), self._lock:
+            self._check()
+            return self._load()
+
+    def iter_records(self) -> Iterator[Dict]:
+        # From a mapping and heap file of its own, opened under the lock: a
+        # rewrite meanwhile replaces both files and leaves these whole, and the
+        # heap is only appended to. Slots are changed in place, so they are
+        # copied out a chunk at a time under the lock. Both are opened at the
+        # first record and closed when the records run out or the iterator is closed.
+        with ExitStack() as files:
+            with self.lock.shared(), self._lock:
+                self._check()
+                h = self._head()
+                mm = files.enter_context(mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ))
+                heap = files.enter_context(open(self._heap_path(h["epoch"]), "rb"))
+            count = h["count"]
+            for start in range(0, count, STREAM_SLOTS):
+                with self.lock.shared():
+                    body = mm[HEADER_SIZE + start * SLOT.size:HEADER_SIZE + min(count, start + STREAM_SLOTS) * SLOT.size]
+                for f in SLOT.iter_unpack(body):
+                    if f[0] & LIVE:
+                        heap.seek(f[3])
+                        yield _unpack(f, heap.read(f[6] + f[7] + f[8]), base=f[3])
+
+    def save_all(self, records: List[Dict]) -> None:
+        with self.lock.exclusive(), self._lock:
+            self._rewrite(records)
+
+    def upsert_many(self, records: Iterable[Dict]) -> None:
+        records = list(records)
+        revs = self.commit([{"op": "upsert", "student": r} for r in records])
+        for r, rev in zip(records, revs):
+            r["rev"] = rev
+
+    def delete(self, sid: str) -> bool:
+        with self._write() as h:
+            slot = self._find(sid)
+            if slot is None:
+                return False
+            self._drop(h, slot)
+            return True
+
+    def add_subject(self, sid: str, subject: Dict) -> None:
+        self.commit([{"op": "add_subject", "id": sid, "subject": subject}])
+
+    def remove_subject(self, sid: str, subject_id: str) -> None:
+        self.commit([{"op": "remove_subject", "id": sid, "subject": subject_id}])
+
+    def clear(self) -> None:
+        self.save_all([])
+
+    def commit(self, ops: List[Op]) -> List[Optional[int]]:
+        if not ops:
+            return []
+        if any(op["op"] == "clear" for op in ops):
+            return super().commit(ops)          # a rewrite of everything anyway
+        with self._write() as h:
+            return self._apply(h, ops)
+
+    # ------------------------------ queries -------------------------------
+
+    def get(self, sid: str) -> Optional[Dict]:
+        with self.lock.shared(), self._lock:
+            self._check()
+            slot = self._find(sid)
+            return self._record(slot) if slot is not None else None
+
+    def find_by_email(self, email: str) -> Optional[Dict]:
+        # the first registered of the students whose email hashes the same and matches
+        with self.lock.shared(), self._lock:
+            self._check()
+            for slot in sorted(self._index.emails(_email_crc(email))):
+                r = self._record(slot)
+                if str(r.get("email", "")).lower() == email.lower():
+                    return r
+            return None
+
+    def count(self) -> int:
+        with self.lock.shared(), self._lock:
+            self._check()
+            h = self._head()
+            return h["count"] - h["dead"]
+
+    def signature(self) -> Signature:
+        # (epoch, gen): a new epoch per rewrite, gen moved on by every write in between
+        with self.lock.shared(), self._lock:
+            if not os.path.exists(self.path):
+                return None
+            self._check()
+            return self._state()
+
+    def close(self) -> None:
+        with self._lock:
+            self._unmap()
+            self._index.close()
+        super().close()
@@ -0,0 +1,352 @@
+import heapq, os
+from contextlib import closing, contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from . import snapshot
+from .db import Database
+from .events import ChangeFeed, replay, touched
+from .grade_view import Buckets, GradeView, grade_view_for, stream_report
+from .idalloc import IdAllocator, id_allocator_for
+from .models import Student, Subject
+from .query import Hit, Query, StudentIndex, student_index_for
+from .search import SEARCH_LIMIT, Match, SearchIndex, search_index_for
+from .sidecar import tracked_write
+from .store import Op, Row, StaleRecordError, Store
+from .transaction import Transaction
+
+Changes = Dict[type, Callable]   # sidecar kind -> how a write changes it
+
+# data size past which the admin g/p reports are worked out in one streamed pass
+# over the data instead of from the grade view, which holds every student
+STREAM_ENV = "UNI_STREAM_BYTES"
+STREAM_BYTES = 256 << 20
+
+def _marks(stu: Student) -> List[int]:
+    return [x.mark for x in stu.subjects]
+
+def _updated(stu: Student) -> Changes:
+    return {GradeView: lambda v: v.update(stu.id, stu.name, _marks(stu)),
+            StudentIndex: lambda x: x.update(stu.id, stu.name, stu.email, _marks(stu)),
+            SearchIndex: lambda x: x.update(stu.id, stu.name, stu.email)}
+
+def _removed(sid: str) -> Changes:
+    return {GradeView: lambda v: v.remove(sid), IdAllocator: lambda a: a.release(sid),
+            StudentIndex: lambda x: x.remove(sid), SearchIndex: lambda x: x.remove(sid)}
+
+def _cleared() -> Changes:
+    return {GradeView: lambda v: v.clear(), IdAllocator: lambda a: a.reset(), StudentIndex: lambda x: x.clear(),
+            SearchIndex: lambda x: x.clear()}
+
+def _tracked(write: Callable[[], object], changes: Changes, ops: Optional[List[Op]] = None):
+    # run a store write and keep the persisted sidecars (grade view, id bitmap) in
+    # step with it; ops (the same write as store ops) go out on the change feed
+    return tracked_write(Database.store(), write, changes, ops)
+
+def _merged(changes: List[Changes]) -> Changes:
+    # the sidecar changes of several writes, applied in order, for one combined write
+    fns: Dict[type, List[Callable]] = {}
+    for c in changes:
+        for kind, fn in c.items():
+            fns.setdefault(kind, []).append(fn)
+    return {kind: (lambda sc, fs=fs: [f(sc) for f in fs]) for kind, fs in fns.items()}
+
+class StudentRepository:
+    # In-memory view over Database with hash indexes on id and lower-cased email.
+    # dicts keep insertion order, so all() still lists students in file order.
+    _tx: Optional[Transaction] = None      # open transaction(), if any
+    _tx_changes: List[Changes]             # its sidecar changes, in order
+
+    def __init__(self, students: Iterable[Student] = ()):
+        self._by_id: Dict[str, Student] = {}
+        self._by_email: Dict[str, Student] = {}
+        for s in students:
+            self._index(s)
+        self._signature = Database.signature()
+
+    @staticmethod
+    def load() -> "StudentRepository":
+        store = Database.store()
+        if snapshot.enabled(store):
+            return StudentRepository.from_image(*snapshot.image_for(store))
+        return StudentRepository(Database.load_students())
+
+    @staticmethod
+    def from_image(image: snapshot.Image, signature) -> "StudentRepository":
+        # indexes over a startup snapshot: a student is built on its first lookup
+        repo = StudentRepository()
+        rows = snapshot.Built(image.student)
+        repo._by_id = snapshot.LazyIndex(image.ids, image.find_id, rows)
+        repo._by_email = snapshot.LazyIndex(image.emails, image.find_email, rows, fold=str.lower)
+        repo._signature = signature
+        return repo
+
+    # ----- lookups (O(1)) -----
+    def get_by_id(self, sid: str) -> Optional[Student]:
+        return self._by_id.get(sid)
+
+    def get_by_email(self, email: str) -> Optional[Student]:
+        return self._by_email.get(email.lower())
+
+    def email_exists(self, email: str) -> bool:
+        return email.lower() in self._by_email
+
+    def all(self) -> List[Student]:
+        return list(self._by_id.values())
+
+    def averages(self) -> List[Tuple[str, str, Optional[float]]]:
+        # (id, name, average mark or None) per student, in file order
+        return [(s.id, s.name, s.average_mark()) for s in self._by_id.values()]
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    # ----- mutations (index update is O(1), then persisted) -----
+    def save(self, stu: Student) -> None:
+        # upsert by id; raises StaleRecordError if stu is older than the stored copy
+        self._replace(stu)
+        try:
+            self._persist(lambda: Database.upsert_student(stu), _updated(stu),
+                          lambda tx: tx.upsert(stu.to_dict()))
+        except StaleRecordError:
+            self._signature = None      # reload on next get_repository()
+            raise
+        if self._tx is not None:
+            stu.rev += 1                # the revision the queued upsert will store
+
+    def remove(self, sid: str) -> bool:
+        stu = self._by_id.get(sid)
+        if stu is None:
+            return False
+        self._unindex(stu)
+        self._persist(lambda: Database.delete_student(sid), _removed(sid), lambda tx: tx.delete(sid))
+        return True
+
+    def add_subject(self, stu: Student, sub: Subject) -> None:
+        stu.subjects.append(sub)
+        self._replace(stu)
+        self._persist(lambda: Database.add_subject(stu.id, sub), _updated(stu),
+                      lambda tx: tx.add_subject(stu.id, sub.to_dict()))
+        stu.rev += 1
+
+    def remove_subject(self, stu: Student, subject_id: str) -> None:
+        stu.subjects = [x for x in stu.subjects if x.id != subject_id]
+        self._replace(stu)
+        self._persist(lambda: Database.remove_subject(stu.id, subject_id), _updated(stu),
+                      lambda tx: tx.remove_subject(stu.id, subject_id))
+        stu.rev += 1
+
+    @contextmanager
+    def transaction(self) -> Iterator["StudentRepository"]:
+        # Unit of work: save/remove/add_subject/remove_subject inside the block
+        # update memory at once but are written to the store (and the sidecars)
+        # in one commit when it ends - nothing is written if it raises, or if a
+        # queued save turns out to be stale. Nested blocks join the outer one.
+        if self._tx is not None:
+            yield self
+            return
+        self._tx, self._tx_changes = Database.store().transaction(), []
+        try:
+            yield self
+            tx, changes = self._tx, self._tx_changes
+            self._tx = None
+            _tracked(tx.commit, _merged(changes), tx.ops)
+        except BaseException:
+            self._signature = None      # memory is ahead of the store: reload on next get_repository()
+            raise
+        finally:
+            self._tx = None
+        self._synced()
+
+    def clear(self) -> None:
+        self._by_id.clear()
+        self._by_email.clear()
+        self._persist(Database.clear, _cleared(), lambda tx: tx.clear())
+
+    def is_stale(self) -> bool:
+        return self._signature != Database.signature()
+
+    def catch_up(self, feed: ChangeFeed) -> bool:
+        # apply the writes other processes logged since our load (core.events) to
+        # the students they touched; False if the feed cannot tell (reload instead)
+        found = feed.since(self._signature)
+        if found is None:
+            return False
+        ops, sig = found
+        ids = touched(ops)
+        if ids is None:
+            return False
+        records = {sid: self._by_id[sid].to_dict() for sid in ids if sid in self._by_id}
+        try:
+            replay(records, ops)
+        except StaleRecordError:
+            return False
+        for sid in ids:
+            if sid in records:
+                self._replace(Student.from_dict(records[sid]))
+            elif sid in self._by_id:
+                self._unindex(self._by_id[sid])
+        self._signature = sig
+        return True
+
+    # ----- internals -----
+    def _index(self, stu: Student) -> None:
+        self._by_id[stu.id] = stu
+        self._by_email[stu.email.lower()] = stu
+
+    def _unindex(self, stu: Student) -> None:
+        self._by_id.pop(stu.id, None)
+        if self._by_email.get(stu.email.lower()) is stu:
+            del self._by_email[stu.email.lower()]
+
+    def _replace(self, stu: Student) -> None:
+        # callers may hold a Student loaded before the last reload; re-assigning
+        # an existing key keeps its position, so file order is preserved
+        old = self._by_id.get(stu.id)
+        if old is not None and old is not stu and self._by_email.get(old.email.lower()) is old:
+            del self._by_email[old.email.lower()]
+        self._index(stu)
+
+    def _persist(self, write: Callable[[], object], changes: Changes,
+                 queue: Callable[[Transaction], None]) -> None:
+        # Always the single-record write: the store re-reads under its exclusive
+        # lock, so changes other processes made since our load are kept (writing
+        # back our in-memory copy of everything would undo them). Inside
+        # transaction() the same change is queued instead.
+        if self._tx is not None:
+            queue(self._tx)
+            self._tx_changes.append(changes)
+            return
+        logged = Transaction(Database.store())    # only records the ops, for the change feed
+        queue(logged)
+        _tracked(write, changes, logged.ops)
+        self._synced()
+
+    def _synced(self) -> None:
+        # after our own write: what is stored is what this repository holds
+        self._signature = Database.signature()
+
+class QueryRepository(StudentRepository):
+    # Same interface, but nothing is preloaded: every call is answered by an
+    # indexed query on the store, so login/enrol touch only one student's rows.
+    def __init__(self, store: Store):
+        self._store = store
+
+    @staticmethod
+    def load() -> "QueryRepository":
+        return QueryRepository(Database.store())
+
+    def get_by_id(self, sid: str) -> Optional[Student]:
+        r = self._store.get(sid)
+        return Student.from_dict(r) if r is not None else None
+
+    def get_by_email(self, email: str) -> Optional[Student]:
+        r = self._store.find_by_email(email)
+        return Student.from_dict(r) if r is not None else None
+
+    def email_exists(self, email: str) -> bool:
+        return self._store.find_by_email(email) is not None
+
+    def all(self) -> List[Student]:
+        return [Student.from_dict(r) for r in self._store.load_all()]
+
+    def averages(self) -> List[Tuple[str, str, Optional[float]]]:
+        return self._store.averages()
+
+    def __len__(self) -> int:
+        return self._store.count()
+
+    def save(self, stu: Student) -> None:
+        rec = stu.to_dict()
+        self._persist(lambda: self._store.upsert(rec), _updated(stu), lambda tx: tx.upsert(rec))
+        stu.rev += 1
+
+    def remove(self, sid: str) -> bool:
+        if self._tx is not None:
+            if self._store.get(sid) is None:
+                return False
+            self._persist(None, _removed(sid), lambda tx: tx.delete(sid))
+            return True
+        return _tracked(lambda: self._store.delete(sid), _removed(sid), [{"op": "delete", "id": sid}])
+
+    def add_subject(self, stu: Student, sub: Subject) -> None:
+        stu.subjects.append(sub)
+        self._persist(lambda: self._store.add_subject(stu.id, sub.to_dict()), _updated(stu),
+                      lambda tx: tx.add_subject(stu.id, sub.to_dict()))
+        stu.rev += 1
+
+    def remove_subject(self, stu: Student, subject_id: str) -> None:
+        stu.subjects = [x for x in stu.subjects if x.id != subject_id]
+        self._persist(lambda: self._store.remove_subject(stu.id, subject_id), _updated(stu),
+                      lambda tx: tx.remove_subject(stu.id, subject_id))
+        stu.rev += 1
+
+    def clear(self) -> None:
+        self._persist(self._store.clear, _cleared(), lambda tx: tx.clear())
+
+    def is_stale(self) -> bool:
+        return self._store is not Database.store()
+
+    def catch_up(self, feed: ChangeFeed) -> bool:
+        return False
+
+    def _synced(self) -> None:
+        pass                            # nothing is held in memory
+
+_repo: Optional[StudentRepository] = None
+_feed: Optional[ChangeFeed] = None
+
+def get_repository() -> StudentRepository:
+    # shared per-process repository; when the data changed on disk it catches up
+    # from the change feed if it can, and is reloaded otherwise
+    global _repo, _feed
+    store = Database.store()
+    if _feed is None or _feed.store is not store:
+        _feed = ChangeFeed(store)
+    if _repo is None or _repo.is_stale() and not _repo.catch_up(_feed):
+        _repo = QueryRepository.load() if store.queryable else StudentRepository.load()
+    return _repo
+
+def student_listing() -> Iterator[Tuple[str, str, str]]:
+    # (name, id, email) of every student in registration order, for the admin list,
+    # read as it is printed; a partitioned store builds it shard by shard in parallel.
+    # Closing it early closes the store's file too.
+    store = Database.store()
+    if store.partitioned:
+        yield from (t[1:] for t in heapq.merge(*store.scan(_listing), key=lambda t: t[0]))
+        return
+    with closing(store.iter_records()) as records:
+        for r in records:
+            yield r["name"], r["id"], r["email"]
+
+def _listing(rows: List[Row]) -> List[Tuple[int, str, str, str]]:
+    return [(seq, r["name"], r["id"], r["email"]) for seq, r in rows]
+
+def report_buckets(by_grade: bool) -> Buckets:
+    # rows of the g (by_grade) or p report: from the grade view, or for data
+    # past UNI_STREAM_BYTES from one streamed pass that spills to disk
+    store = Database.store()
+    if _data_bytes(store) < int(os.environ.get(STREAM_ENV) or STREAM_BYTES):
+        view = get_grade_view()
+        return Buckets(view.by_grade() if by_grade else view.by_pass_fail())
+    return stream_report(store.iter_records(), by_grade)
+
+def _data_bytes(store: Store) -> int:
+    return sum(os.path.getsize(p) for p in store.files() or [store.path] if os.path.isfile(p))
+
+def get_grade_view() -> GradeView:
+    # the persisted g/p aggregate, rebuilt first if another writer got ahead of it
+    store = Database.store()
+    return grade_view_for(store).ensure(store)
+
+def find_students(q: Query) -> Tuple[List[Hit], int]:
+    # admin query over the persisted secondary indexes (core.query), rebuilt first if stale
+    store = Database.store()
+    return student_index_for(store).ensure(store).select(q)
+
+def search_students(text: str, limit: int = SEARCH_LIMIT) -> List[Match]:
+    # name/email lookup (core.search), rebuilt first if stale
+    store = Database.store()
+    return search_index_for(store).ensure(store).search(text, limit)
+
+def new_student_id() -> str:
+    # next free id from the persisted allocator; it becomes permanent once saved
+    return id_allocator_for(Database.store()).allocate()
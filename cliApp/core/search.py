@@ -0,0 +1,262 @@
+import heapq, json
+from bisect import bisect_left, bisect_right, insort
+from math import ceil
+from typing import Dict, Iterable, List, Tuple
+
+from .sidecar import Sidecar, sidecar_for
+from .store import Row as StoredRow, Store
+
+# Name/email lookup for the admin search and the GUI lookup box, persisted next
+# to the data as "<path>.search" and kept in step with it like the other
+# sidecars (see core.sidecar).
+#
+# Every student is filed under a few lowercase terms: each word of the name
+# and the whole name, plus the email, which is kept apart in a sorted column
+# of its own (nearly every email is a term with one student). Both are sorted,
+# so the terms starting with what was typed are one bisect away and the first
+# `limit` students under them are the answer, however many students there are.
+#
+# When that finds too few, each typed word is also matched loosely against the
+# distinct name words by their letter pairs (bigrams, with "$" marking either
+# end; "jhon" shares "$j" and "n$" with "john"): a word is close enough if
+# 2 * shared / (its pairs + the typed word's pairs) reaches MIN_SCORE. Only
+# words found under the rarest pairs of the typed word are scored, which is
+# all that can reach MIN_SCORE.
+
+SEARCH_LIMIT = 20
+GRAM = 2
+MIN_SCORE = 0.4
+
+Match = Tuple[str, str, str]   # (id, name, email)
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def _terms(name: str) -> List[str]:
+    full = _norm(name)
+    return list(dict.fromkeys(full.split() + [full])) if full else []
+
+def _grams(word: str) -> set:
+    padded = f"${word}$"
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+class SearchIndex(Sidecar):
+    suffix = ".search"
+    eager = False     # opened by searches only; writes while it is closed leave it to be rebuilt
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._students: Dict[str, Tuple[str, str]] = {}   # id -> (name, email)
+        self._postings: Dict[str, List[str]] = {}         # name term -> ids, in the order filed
+        self._sorted: List[str] = []                      # the distinct name terms, sorted
+        self._words: List[str] = []                       # the distinct name words, sorted
+        self._by_gram: Dict[str, Dict[str, None]] = {}    # letter pair -> name words containing it
+        self._emails: List[str] = []                      # every lowercase email, sorted
+        self._email_ids: List[str] = []                   # the student of each of _emails
+
+    # ----------------------------- persistence ----------------------------
+
+    def _restore(self, data: bytes) -> str:
+        # columns and lists as they are used, so loading builds only the two dicts
+        raw = json.loads(data)
+        self._students = dict(zip(raw["ids"], zip(raw["names"], raw["emails"])))
+        self._postings = raw["postings"]
+        self._sorted = sorted(self._postings)
+        self._words = [t for t in self._sorted if " " not in t]
+        self._by_gram = {k: dict.fromkeys(v) for k, v in raw["grams"].items()}
+        self._emails, self._email_ids = raw["email_keys"], raw["email_ids"]
+        return raw["stamp"]
+
+    def _dump(self) -> bytes:
+        raw = {
+            "stamp": self._synced,
+            "ids": list(self._students),
+            "names": [e[0] for e in self._students.values()],
+            "emails": [e[1] for e in self._students.values()],
+            "postings": self._postings,
+            "grams": {k: list(v) for k, v in self._by_gram.items()},
+            "email_keys": self._emails,
+            "email_ids": self._email_ids,
+        }
+        return json.dumps(raw, separators=(",", ":")).encode("utf-8")
+
+    # -------------------------- write-side hooks --------------------------
+
+    def update(self, sid: str, name: str, email: str) -> None:
+        entry = self._students.get(sid)
+        if entry == (name, email):
+            return                            # subject changes: nothing searchable moved
+        if entry is not None:
+            self._unfile(sid, entry)
+        self._students[sid] = (name, email)
+        for term in _terms(name):
+            self._link(term, sid)
+        key = email.strip().lower()
+        i = bisect_right(self._emails, key)
+        self._emails.insert(i, key)
+        self._email_ids.insert(i, sid)
+
+    def remove(self, sid: str) -> None:
+        entry = self._students.pop(sid, None)
+        if entry is not None:
+            self._unfile(sid, entry)
+
+    def clear(self) -> None:
+        self._students.clear()
+        self._postings.clear()
+        self._sorted.clear()
+        self._words.clear()
+        self._by_gram.clear()
+        self._emails.clear()
+        self._email_ids.clear()
+
+    # ----------------------------- consistency ----------------------------
+
+    def rebuild(self, records: List[Dict]) -> None:
+        self._load(search_partial(list(enumerate(records))))
+
+    def rebuild_from(self, store: Store) -> None:
+        if not store.partitioned:
+            return super().rebuild_from(store)
+        self._load(heapq.merge(*store.scan(search_partial), key=lambda t: t[0]))
+
+    def _load(self, rows: Iterable[Tuple]) -> None:
+        # rows: (seq, id, name, email) in data order
+        self.clear()
+        postings = self._postings
+        for _, sid, name, email in rows:
+            self._students[sid] = (name, email)
+            for term in _terms(name):
+                ids = postings.get(term)
+                if ids is None:
+                    ids = postings[term] = []
+                ids.append(sid)
+        self._sorted = sorted(postings)
+        self._words = [t for t in self._sorted if " " not in t]
+        for word in self._words:
+            for g in _grams(word):
+                self._by_gram.setdefault(g, {})[word] = None
+        keys = [e.strip().lower() for _, e in self._students.values()]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        ids = list(self._students)
+        self._emails = [keys[i] for i in order]
+        self._email_ids = [ids[i] for i in order]
+
+    # ------------------------------- queries ------------------------------
+
+    def __len__(self) -> int:
+        return len(self._students)
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> List[Match]:
+        # students whose name or a name word starts with `text` (terms in
+        # alphabetical order), then whose email does, then close misspellings
+        # of the words typed
+        text = _norm(text)
+        found: Dict[str, None] = {}
+        if not text or limit <= 0:
+            return []
+        i = bisect_left(self._sorted, text)
+        while i < len(self._sorted) and self._sorted[i].startswith(text) and len(found) < limit:
+            for sid in self._postings[self._sorted[i]]:
+                found[sid] = None
+                if len(found) >= limit:
+                    break
+            i += 1
+        i = bisect_left(self._emails, text)
+        while i < len(self._emails) and self._emails[i].startswith(text) and len(found) < limit:
+            found[self._email_ids[i]] = None
+            i += 1
+        if len(found) < limit and "@" not in text:
+            self._fuzzy(text.split(), found, limit)
+        return [(sid, *self._students[sid]) for sid in found]
+
+    def _fuzzy(self, words: List[str], found: Dict[str, None], limit: int) -> None:
+        # every typed word must match a word of the name, closely or (the last
+        # one, still being typed) as a prefix; ranked by the rarest typed word's matches
+        options = []
+        for k, word in enumerate(words):
+            close = self._similar(word, prefix=k == len(words) - 1)
+            if not close:
+                return
+            options.append(close)
+        lead = min(range(len(options)), key=lambda k: sum(len(self._postings[w]) for _, w in options[k]))
+        others = [{w for _, w in options[k]} for k in range(len(options)) if k != lead]
+        fits: Dict[str, bool] = {}            # name -> matches the other words; names repeat a lot
+        for _, term in options[lead]:
+            for sid in self._postings[term]:
+                if sid in found:
+                    continue
+                name = self._students[sid][0]
+                ok = fits.get(name)
+                if ok is None:
+                    own = set(_norm(name).split())
+                    ok = fits[name] = all(own & other for other in others)
+                if ok:
+                    found[sid] = None
+                    if len(found) >= limit:
+                        return
+
+    def _similar(self, word: str, prefix: bool = False) -> List[Tuple[float, str]]:
+        # (score, name word) for the words close to `word`, best first
+        grams = _grams(word)
+        out: Dict[str, float] = {}
+        if prefix:
+            i = bisect_left(self._words, word)
+            while i < len(self._words) and self._words[i].startswith(word):
+                out[self._words[i]] = 1.0
+                i += 1
+        # a word scoring MIN_SCORE shares at least `need` pairs, so it is under
+        # one of any len(grams) - need + 1 of them: take the rarest
+        need = ceil(len(grams) * MIN_SCORE / (2 - MIN_SCORE))
+        lists = sorted((self._by_gram.get(g, {}) for g in grams), key=len)
+        for candidates in lists[:len(grams) - need + 1]:
+            for term in candidates:
+                if term in out:
+                    continue
+                shared = sum(1 for g in grams if term in self._by_gram.get(g, ()))
+                score = 2 * shared / (len(grams) + len(_grams(term)))
+                if score >= MIN_SCORE:
+                    out[term] = score
+        return sorted(((s, w) for w, s in out.items()), key=lambda t: (-t[0], t[1]))
+
+    # ----------------------------- internals ------------------------------
+
+    def _unfile(self, sid: str, entry: Tuple[str, str]) -> None:
+        for term in _terms(entry[0]):
+            self._unlink(term, sid)
+        key = entry[1].strip().lower()
+        i, j = bisect_left(self._emails, key), bisect_right(self._emails, key)
+        at = self._email_ids.index(sid, i, j)
+        del self._emails[at], self._email_ids[at]
+
+    def _link(self, term: str, sid: str) -> None:
+        ids = self._postings.get(term)
+        if ids is None:
+            ids = self._postings[term] = []
+            insort(self._sorted, term)
+            if " " not in term:
+                insort(self._words, term)
+                for g in _grams(term):
+                    self._by_gram.setdefault(g, {})[term] = None
+        ids.append(sid)
+
+    def _unlink(self, term: str, sid: str) -> None:
+        ids = self._postings.get(term)
+        if ids is None or sid not in ids:
+            return
+        ids.remove(sid)
+        if ids:
+            return
+        del self._postings[term]
+        del self._sorted[bisect_left(self._sorted, term)]
+        if " " not in term:
+            del self._words[bisect_left(self._words, term)]
+            for g in _grams(term):
+                self._by_gram.get(g, {}).pop(term, None)
+
+def search_partial(rows: List[StoredRow]) -> List[Tuple]:
+    # (seq, id, name, email) per student; runs in a worker process for sharded stores
+    return [(seq, r["id"], r.get("name", ""), r.get("email", "")) for seq, r in rows]
+
+def search_index_for(store: Store) -> SearchIndex:
+    return sidecar_for(SearchIndex, store)
@@ -0,0 +1,276 @@
+import atexit, heapq, json, os, time, zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from . import metrics
+from .locking import atomic_write
+from .store import JsonStore, Op, Row, Signature, Store, apply_op, file_signature, next_revision, op_id
+
+# Sharded backend: the students are spread over N JSON files in a folder
+# ("students.shards/shard-000.json" ...), each owning the ids whose crc32 falls
+# in it. A point operation (get, upsert, add/remove subject, delete) reads and
+# rewrites only the owning shard. Whole-dataset work - load_all and the scans
+# behind the admin listing and grade reports - parses the shards in parallel
+# in a process pool, each shard reducing to a partial result that is merged
+# here.
+#
+# Every record is stored as [seq, record]: seq orders the students across
+# shards (registration order, like the single file). save_all numbers them
+# 0..n-1; a student added later gets the clock in nanoseconds, which sorts
+# after all of those. Each shard keeps its rows sorted by seq, so the merge
+# is a k-way merge.
+#
+# The number of shards is fixed when the folder is created (UNI_SHARDS, default
+# 8) and recorded in manifest.json. One lock covers the whole store (see
+# core.locking); a batch touching several shards is checked in full before any
+# of them is rewritten.
+
+SHARDS_ENV = "UNI_SHARDS"
+DEFAULT_SHARDS = 8
+MANIFEST = "manifest.json"
+PARALLEL_MIN_BYTES = 4 << 20    # below this, a process pool costs more than it saves
+
+T = TypeVar("T")
+
+def shard_of(sid: str, shards: int) -> int:
+    # stable across processes and Python versions (unlike hash())
+    return zlib.crc32(str(sid).encode("utf-8")) % shards
+
+def read_rows(path: str) -> List[Row]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return []
+    metrics.count("bytes_read", len(text))
+    with metrics.span("json.parse"):
+        raw = json.loads(text) if text.strip() else []
+    return [(int(seq), rec) for seq, rec in raw]
+
+def write_rows(path: str, rows: List[Row]) -> None:
+    with metrics.span("json.serialize"):
+        text = json.dumps([[seq, rec] for seq, rec in rows], separators=(",", ":"))
+    atomic_write(path, text)
+
+def scan_file(path: str, fn: Callable[[List[Row]], T]) -> T:
+    # runs in a worker process: parse one shard and reduce it there
+    return fn(read_rows(path))
+
+def merge_rows(parts: Iterable[List[Tuple]]) -> List[Tuple]:
+    # k-way merge of per-shard lists that are each sorted by their first item (seq)
+    return list(heapq.merge(*parts, key=lambda t: t[0]))
+
+# ---- per-shard reducers (module level, so worker processes can import them) ----
+
+def _rows(rows: List[Row]) -> List[Row]:
+    return rows
+
+def _count(rows: List[Row]) -> int:
+    return len(rows)
+
+def _first_email(email: str, rows: List[Row]) -> Optional[Row]:
+    return next(((seq, r) for seq, r in rows if str(r.get("email", "")).lower() == email), None)
+
+def _averages(rows: List[Row]) -> List[Tuple]:
+    out = []
+    for seq, r in rows:
+        marks = [int(s["mark"]) for s in r.get("subjects", [])]
+        out.append((seq, r["id"], r["name"], sum(marks) / len(marks) if marks else None))
+    return out
+
+def usable_cpus() -> int:
+    # CPUs this process may run on (a container or taskset can allow fewer than the machine has)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not on every platform
+        return os.cpu_count() or 1
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=usable_cpus())
+        atexit.register(_pool.shutdown)
+    return _pool
+
+class ShardedStore(Store):
+    incremental = True
+    partitioned = True
+
+    def __init__(self, path: str, shards: Optional[int] = None, migrate_from: Optional[str] = None):
+        super().__init__(path)
+        self.migrate_from = migrate_from
+        self._wanted = shards
+        self._shards: Optional[int] = None
+
+    # ------------------------------ layout --------------------------------
+
+    @property
+    def shards(self) -> int:
+        if self._shards is None:
+            self.ensure()
+        return self._shards
+
+    def shard_path(self, i: int) -> str:
+        return os.path.join(self.path, f"shard-{i:03d}.json")
+
+    def owner(self, sid: str) -> str:
+        return self.shard_path(shard_of(sid, self.shards))
+
+    def ensure(self) -> None:
+        if self._shards is not None:
+            return
+        with self.lock.exclusive():
+            manifest = os.path.join(self.path, MANIFEST)
+            try:
+                with open(manifest, "r", encoding="utf-8") as f:
+                    self._shards = int(json.load(f)["shards"])
+                return
+            except FileNotFoundError:
+                pass
+            n = self._wanted or int(os.environ.get(SHARDS_ENV) or DEFAULT_SHARDS)
+            os.makedirs(self.path, exist_ok=True)
+            for i in range(n):
+                atomic_write(self.shard_path(i), "[]")
+            atomic_write(manifest, json.dumps({"shards": n}))   # written last: the layout is complete
+            self._shards = n
+            if self.migrate_from and os.path.exists(self.migrate_from):
+                # one-shot import of an existing students.data; the JSON file is left untouched
+                self.save_all(JsonStore(self.migrate_from).load_all())
+
+    # ------------------------------ fan-out -------------------------------
+
+    def scan(self, fn: Callable[[List[Row]], T]) -> List[T]:
+        # one result per shard, in shard order; parsed in worker processes once
+        # the data is big enough for that to pay off
+        paths = [self.shard_path(i) for i in range(self.shards)]
+        with self.lock.shared(), metrics.span("sharded.scan"):
+            size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+            if len(paths) > 1 and size >= PARALLEL_MIN_BYTES and usable_cpus() > 1:
+                return list(_executor().map(scan_file, paths, [fn] * len(paths)))
+            return [scan_file(p, fn) for p in paths]
+
+    # ----------------------------- Store API ------------------------------
+
+    def load_all(self) -> List[Dict]:
+        return [r for _, r in merge_rows(self.scan(_rows))]
+
+    def save_all(self, records: List[Dict]) -> None:
+        parts: List[List[Row]] = [[] for _ in range(self.shards)]
+        for seq, r in enumerate(records):
+            parts[shard_of(r["id"], self.shards)].append((seq, r))
+        with self.lock.exclusive():
+            for i, rows in enumerate(parts):
+                write_rows(self.shard_path(i), rows)
+
+    def upsert_many(self, records: Iterable[Dict]) -> None:
+        records = list(records)
+        with self.lock.exclusive():
+            touched: Dict[str, Tuple[List[Row], Dict[str, int]]] = {}   # shard -> (rows, id -> index)
+            revs = []
+            for r in records:
+                path = self.owner(r["id"])
+                if path not in touched:
+                    rows = read_rows(path)
+                    touched[path] = (rows, {cur.get("id"): k for k, (_, cur) in enumerate(rows)})
+                rows, at = touched[path]
+                k = at.get(r["id"])
+                revs.append(next_revision(rows[k][1] if k is not None else None, r))
+                if k is not None:
+                    rows[k] = (rows[k][0], dict(r, rev=revs[-1]))
+                else:
+                    at[r["id"]] = len(rows)
+                    rows.append((self._next_seq(rows), dict(r, rev=revs[-1])))
+            # every record checked: now write (a stale one above raised before any shard changed)
+            for path, (rows, _) in touched.items():
+                write_rows(path, rows)
+        for r, rev in zip(records, revs):
+            r["rev"] = rev
+
+    def commit(self, ops: List[Op]) -> List[Optional[int]]:
+        # only the shards owning the students in the batch are read and rewritten,
+        # and none of them before every op has been applied
+        if any(op["op"] == "clear" for op in ops):
+            return super().commit(ops)
+        with self.lock.exclusive():
+            touched: Dict[str, Tuple[Dict[str, Dict], Dict[str, int]]] = {}   # shard -> (id -> record, id -> seq)
+            revs = []
+            for op in ops:
+                path = self.owner(op_id(op))
+                if path not in touched:
+                    rows = read_rows(path)
+                    touched[path] = ({r.get("id"): r for _, r in rows}, {r.get("id"): seq for seq, r in rows})
+                records, seqs = touched[path]
+                if op["op"] == "delete":
+                    seqs.pop(op["id"], None)     # re-added later in the batch: a new student, placed last
+                revs.append(apply_op(records, op))
+            for path, (records, seqs) in touched.items():
+                rows: List[Row] = []
+                for sid, r in records.items():
+                    rows.append((seqs[sid] if sid in seqs else self._next_seq(rows), r))
+                write_rows(path, rows)
+        return revs
+
+    def delete(self, sid: str) -> bool:
+        path = self.owner(sid)
+        with self.lock.exclusive():
+            rows = read_rows(path)
+            kept = [(seq, r) for seq, r in rows if r.get("id") != sid]
+            if len(kept) == len(rows):
+                return False
+            write_rows(path, kept)
+            return True
+
+    def add_subject(self, sid: str, subject: Dict) -> None:
+        self._change(sid, lambda r: r.setdefault("subjects", []).append(subject))
+
+    def remove_subject(self, sid: str, subject_id: str) -> None:
+        def drop(r: Dict) -> None:
+            r["subjects"] = [s for s in r.get("subjects", []) if str(s.get("id")) != subject_id]
+        self._change(sid, drop)
+
+    def clear(self) -> None:
+        self.save_all([])
+
+    # ------------------------------ queries -------------------------------
+
+    def get(self, sid: str) -> Optional[Dict]:
+        path = self.owner(sid)
+        with self.lock.shared():
+            return next((r for _, r in read_rows(path) if r.get("id") == sid), None)
+
+    def find_by_email(self, email: str) -> Optional[Dict]:
+        hits = [h for h in self.scan(partial(_first_email, email.lower())) if h is not None]
+        return min(hits, key=lambda h: h[0])[1] if hits else None
+
+    def count(self) -> int:
+        return sum(self.scan(_count))
+
+    def averages(self) -> List[Tuple[str, str, Optional[float]]]:
+        return [row[1:] for row in merge_rows(self.scan(_averages))]
+
+    def signature(self) -> Signature:
+        return tuple(file_signature(self.shard_path(i)) for i in range(self.shards))
+
+    def files(self) -> List[str]:
+        return [self.shard_path(i) for i in range(self.shards)]
+
+    # ----------------------------- internals ------------------------------
+
+    def _change(self, sid: str, fn: Callable[[Dict], None]) -> None:
+        path = self.owner(sid)
+        with self.lock.exclusive():
+            rows = read_rows(path)
+            for _, r in rows:
+                if r.get("id") == sid:
+                    fn(r)
+                    r["rev"] = int(r.get("rev", 0)) + 1
+                    write_rows(path, rows)
+                    return
+
+    @staticmethod
+    def _next_seq(rows: List[Row]) -> int:
+        # after everything numbered by save_all, and after this shard's last row
+        return max(time.time_ns(), rows[-1][0] + 1 if rows else 0)
@@ -0,0 +1,130 @@
+import atexit, json
+from typing import Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+from . import events, metrics
+from .locking import atomic_write
+from .store import Op, Signature, Store
+
+# A sidecar is derived data persisted next to the store ("<path><suffix>"), e.g.
+# the grade view or the id allocator's bitmap. It is stamped with the store
+# signature it reflects: writers that were in sync before a write apply their
+# change and move the stamp forward; anything else leaves the sidecar stale and
+# the next reader rebuilds it from the data.
+
+def _stamp(sig: Signature) -> str:
+    return json.dumps(sig)
+
+class Sidecar:
+    suffix = ""
+    eager = True      # opened by every tracked_write that changes it; if False, only kept up
+                      # while something else has it open, and rebuilt when next read otherwise
+
+    def __init__(self, path: str):
+        self.path = path
+        self._synced: Optional[str] = None   # stamp of the store state this sidecar reflects
+        self._dirty = False
+
+    # ----- subclass hooks -----
+    def rebuild(self, records: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def rebuild_from(self, store: Store) -> None:
+        # rebuild straight from the store; kinds that can be computed shard by
+        # shard override this to use store.scan() on partitioned stores
+        self.rebuild(store.load_all())
+
+    def _dump(self) -> bytes:
+        raise NotImplementedError
+
+    def _worth_writing(self) -> bool:
+        # False: keep it in memory only and rebuild it in each process, for
+        # kinds that are cheaper to rebuild than to write out while small
+        return True
+
+    def _restore(self, data: bytes) -> str:
+        # load state from _dump()'s output and return the stamp saved with it
+        raise NotImplementedError
+
+    # ----- persistence -----
+    @classmethod
+    def load(cls, path: str):
+        sc = cls(path)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return sc
+        metrics.count("bytes_read", len(data))
+        try:
+            sc._synced = sc._restore(data)
+        except (ValueError, KeyError, IndexError, TypeError):
+            sc.__init__(path)                 # unreadable: start empty and stale
+        return sc
+
+    def flush(self) -> None:
+        if not self._dirty or self._synced is None or not self._worth_writing():
+            return
+        atomic_write(self.path, self._dump())
+        self._dirty = False
+
+    # ----- sync protocol -----
+    def in_sync(self, sig: Signature) -> bool:
+        return self._synced is not None and self._synced == _stamp(sig)
+
+    def apply(self, store: Store, before: Signature, change: Optional[Callable] = None) -> None:
+        # Call after a write to `store`, passing the signature taken just before it.
+        if self.in_sync(before):
+            if change is not None:
+                change(self)
+            self._synced = _stamp(store.signature())
+            self._dirty = True
+        else:
+            self._synced = None
+
+    def ensure(self, store: Store, records: Optional[List[Dict]] = None):
+        # records: the store's current contents, if the caller already loaded them
+        with store.lock.shared():          # signature and contents from the same state
+            sig = store.signature()
+            if not self.in_sync(sig):
+                if records is not None:
+                    self.rebuild(records)
+                else:
+                    self.rebuild_from(store)
+                self._synced = _stamp(sig)
+                self._dirty = True
+                self.flush()
+        return self
+
+S = TypeVar("S", bound=Sidecar)
+_open: Dict[Tuple[type, str], Sidecar] = {}
+
+def sidecar_for(cls: Type[S], store: Store) -> S:
+    # one instance per (kind, data file) per process, flushed at exit
+    key = (cls, store.path + cls.suffix)
+    sc = _open.get(key)
+    if sc is None:
+        sc = _open[key] = cls.load(key[1])
+        atexit.register(sc.flush)
+    return sc
+
+def tracked_write(store: Store, write: Callable[[], object],
+                  changes: Optional[Dict[type, Callable]] = None, ops: Optional[List[Op]] = None):
+    # run a store write and keep every sidecar open on that store in step with it.
+    # The (eager) kinds named in `changes` are opened first so they get the
+    # change applied; any other open sidecar is taken to be unaffected by the write.
+    # ops: the write in the store's op vocabulary, published on the change feed
+    # (core.events) for other processes; without them they reload everything.
+    changes = changes or {}
+    logged = events.encode_ops(ops)
+    for cls in changes:
+        if cls.eager:
+            sidecar_for(cls, store)
+    prefix = store.path
+    with store.lock.exclusive():           # no other process writes between the two signatures
+        before = store.signature()
+        result = write()
+        for (cls, path), sc in list(_open.items()):
+            if path == prefix + cls.suffix:
+                sc.apply(store, before, changes.get(cls))
+        events.publish(store, before, logged)
+    return result
@@ -0,0 +1,387 @@
+import copy, marshal, mmap, os, struct, sys, time
+from array import array
+from collections.abc import MutableMapping, Sequence
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from . import metrics
+from .locking import atomic_write
+from .models import Student, Subject, grade_from_mark
+from .store import Signature, Store, file_signature
+
+# Startup snapshot: the parsed dataset kept next to the data as "<path>.snap",
+# laid out so that opening it costs about the same however many students there
+# are. The file is memory-mapped and every column is used in place: the text
+# fields as UTF-8 runs with offset tables, revisions, marks and subject ids as
+# packed arrays, plus the rows sorted by id and by lower-cased email so that a
+# lookup is a binary search. A student (or, for the GUI, a record dict) is only
+# built when a lookup first asks for it (see LazyIndex).
+#
+# The image is keyed by the stat() signatures of the files holding the data and
+# a SHA-1 of their contents. Matching signatures are trusted; different ones
+# (the files were touched, copied, restored...) fall back to the hash, and only
+# a different hash rebuilds the image. An image written while the data was
+# less than RACY_NS old is checked by hash on every read until that has passed:
+# a second write within the same timestamp tick could leave the signature as it was.
+
+SNAPSHOT_ENV = "UNI_SNAPSHOT"    # "0" to always parse the data instead
+SUFFIX = ".snap"
+MAGIC = b"UNISNAP1"
+RACY_NS = 2_000_000_000
+# marshal's format may change between Python versions; the arrays are in native byte order
+PLATFORM = (tuple(sys.version_info[:2]), sys.byteorder)
+
+TEXT = ("ids", "names", "emails", "passwords")
+KEYS = ("id", "name", "email", "password", "subjects")
+SUBJECT_KEYS = ("id", "mark", "grade")
+
+Stats = Tuple[Optional[Tuple[int, int, int]], ...]
+Buffer = Union[bytes, mmap.mmap]
+
+def _plain(r: Dict) -> bool:
+    # a record the columns reproduce exactly; anything else is kept verbatim
+    if tuple(r) not in (KEYS, KEYS + ("rev",)):
+        return False
+    if not all(type(r[k]) is str for k in KEYS[:4]) or type(r.get("rev", 0)) is not int or r.get("rev", 0) < 0:
+        return False
+    subs = r["subjects"]
+    return type(subs) is list and all(
+        type(s) is dict and tuple(s) == SUBJECT_KEYS and type(s["id"]) is str and type(s["mark"]) is int
+        and 0 <= s["mark"] < 65536 and s["grade"] == grade_from_mark(s["mark"]) for s in subs)
+
+def _align(n: int) -> int:
+    return n + -n % 8
+
+def _framed(head: Dict, sections: List[bytes]) -> bytes:
+    # u32 size + marshal header, then each section starting 8-byte aligned
+    encoded = marshal.dumps(head)
+    out = bytearray(struct.pack("<I", len(encoded)) + encoded)
+    for data in sections:
+        out += b"\0" * (-len(out) % 8)
+        out += data
+    return bytes(out)
+
+def _unframed(view: memoryview) -> Tuple[Dict, int]:
+    # the header and where the first section starts
+    (size,) = struct.unpack_from("<I", view, 0)
+    return marshal.loads(view[4:4 + size]), _align(4 + size)
+
+class Text(Sequence):
+    # one text column: the UTF-8 bytes of every value back to back from `start`
+    # in the buffer, and where each value begins relative to that
+    def __init__(self, buf: Buffer, start: int, at: memoryview):
+        self._buf = buf          # bytes or mmap: slicing either gives bytes, quicker to decode than a memoryview
+        self._start = start
+        self._at = at
+
+    def __getitem__(self, i: int) -> str:
+        return self._buf[self._start + self._at[i]:self._start + self._at[i + 1]].decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self._at) - 1
+
+def _search(order: memoryview, key: Callable[[int], str], value: str) -> int:
+    # first position in `order` (rows sorted by key) whose key is not below value
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key(order[mid]) < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+class Image:
+    # Column-oriented copy of every record, in storage order, over a buffer in
+    # the layout written by encode(). Row i's subjects are positions
+    # offsets[i]..offsets[i + 1] of subject_refs (index into subject_names) and
+    # marks; revs is -1 where the record has no "rev". Records the columns cannot
+    # reproduce are kept whole in `verbatim` (their text fields still indexed).
+    def __init__(self, buf: Buffer, start: int = 0):
+        # buf[start:] holds the image; the mapping stays open while the image is in use
+        view = memoryview(buf)
+        head, pos = _unframed(view[start:])
+        self.subject_names: List[str] = head["subject_names"]
+        self.verbatim: Dict[int, Dict] = head["verbatim"]
+        at: Dict[str, int] = {}
+        for name, size in head["sections"]:
+            pos = _align(pos)
+            at[name] = start + pos
+            pos += size
+        size = dict(head["sections"])
+        array_at = lambda name, code: view[at[name]:at[name] + size[name]].cast(code)
+        for name in TEXT:
+            setattr(self, name, Text(buf, at[name], array_at(name + ".at", "I")))
+        self.revs = array_at("revs", "q")
+        self.offsets = array_at("offsets", "I")
+        self.subject_refs = array_at("subject_refs", "H")
+        self.marks = array_at("marks", "H")
+        self.by_id = array_at("by_id", "I")
+        self.by_email = array_at("by_email", "I")
+        self.n = len(self.revs)
+        if not all(len(getattr(self, name)) == self.n for name in TEXT) \
+                or len(self.offsets) != self.n + 1 or self.offsets[-1] != len(self.marks):
+            raise ValueError("inconsistent snapshot columns")
+
+    def __len__(self) -> int:
+        return self.n
+
+    @staticmethod
+    def encode(records: List[Dict]) -> bytes:
+        cols: Dict[str, List[str]] = {name: [] for name in TEXT}
+        revs, offsets, refs, marks = array("q"), array("I", [0]), array("H"), array("H")
+        subject_names: Dict[str, int] = {}
+        verbatim: Dict[int, Dict] = {}
+        for row, r in enumerate(records):
+            for name, k in zip(TEXT, KEYS):
+                v = r.get(k)
+                cols[name].append(v if type(v) is str else "")
+            if _plain(r) and len(subject_names) + len(r["subjects"]) <= 65536:
+                revs.append(r.get("rev", -1))
+                for s in r["subjects"]:
+                    refs.append(subject_names.setdefault(s["id"], len(subject_names)))
+                    marks.append(s["mark"])
+            else:
+                revs.append(-1)
+                verbatim[row] = r
+            offsets.append(len(marks))
+        raw: Dict[str, bytes] = {}
+        for name, values in cols.items():
+            data = [v.encode("utf-8") for v in values]
+            at, end = array("I", [0]), 0
+            for d in data:
+                end += len(d)
+                at.append(end)
+            raw[name], raw[name + ".at"] = b"".join(data), at.tobytes()
+        ids, emails = cols["ids"], [e.lower() for e in cols["emails"]]
+        # sorted() is stable: rows with the same key stay in file order
+        raw["by_id"] = array("I", sorted(range(len(ids)), key=ids.__getitem__)).tobytes()
+        raw["by_email"] = array("I", sorted(range(len(emails)), key=emails.__getitem__)).tobytes()
+        for name, col in (("revs", revs), ("offsets", offsets), ("subject_refs", refs), ("marks", marks)):
+            raw[name] = col.tobytes()
+        head = {"subject_names": list(subject_names), "verbatim": verbatim,
+                "sections": [(name, len(data)) for name, data in raw.items()]}
+        return _framed(head, list(raw.values()))
+
+    # ----------------------------- lookups --------------------------------
+
+    def find_id(self, sid: str) -> Optional[int]:
+        # the last row with this id, as a dict filled in file order would keep
+        i, row = _search(self.by_id, self.ids.__getitem__, sid), None
+        while i < self.n and self.ids[self.by_id[i]] == sid:
+            row, i = self.by_id[i], i + 1
+        return row
+
+    def find_email(self, email: str, exact: bool = False) -> Optional[int]:
+        # case-insensitive, last row wins; exact=True: case-sensitive, first row wins
+        folded, key = email.lower(), (lambda r: self.emails[r].lower())
+        i, row = _search(self.by_email, key, folded), None
+        while i < self.n and key(self.by_email[i]) == folded:
+            r, i = self.by_email[i], i + 1
+            if not exact:
+                row = r
+            elif self.emails[r] == email:
+                return r
+        return row
+
+    # ------------------------------ rows ----------------------------------
+
+    def record(self, row: int) -> Dict:
+        # a fresh dict equal to the stored record
+        if row in self.verbatim:
+            return copy.deepcopy(self.verbatim[row])
+        names, lo, hi = self.subject_names, self.offsets[row], self.offsets[row + 1]
+        out = {"id": self.ids[row], "name": self.names[row], "email": self.emails[row],
+               "password": self.passwords[row],
+               "subjects": [{"id": names[self.subject_refs[k]], "mark": self.marks[k],
+                             "grade": grade_from_mark(self.marks[k])} for k in range(lo, hi)]}
+        if self.revs[row] >= 0:
+            out["rev"] = self.revs[row]
+        return out
+
+    def student(self, row: int) -> Student:
+        if row in self.verbatim:
+            return Student.from_dict(self.verbatim[row])
+        names, lo, hi = self.subject_names, self.offsets[row], self.offsets[row + 1]
+        subs = [Subject(names[self.subject_refs[k]], self.marks[k]) for k in range(lo, hi)]
+        return Student(self.ids[row], self.names[row], self.emails[row], self.passwords[row], subs,
+                       max(self.revs[row], 0))
+
+# ------------------------------ lazy rows ---------------------------------
+
+class Built:
+    # image rows turned into objects on first use; indexes over the same image
+    # share one, so both hand out the same object for a row
+    def __init__(self, build: Callable[[int], object]):
+        self._build = build
+        self._done: Dict[int, object] = {}
+
+    def __getitem__(self, row: int):
+        obj = self._done.get(row)
+        if obj is None:
+            obj = self._done[row] = self._build(row)
+        return obj
+
+_GONE = object()
+
+class LazyIndex(MutableMapping):
+    # Stands in for a {key: object} dict over an image: `find` gives the row for
+    # a key, and the object is built the first time it is returned. Behaves
+    # like that dict would: image keys in row order (where each first appears),
+    # keys added later at the end, assigning to a key keeps its place. With a
+    # key on several rows the last row wins, or the first with first_wins.
+    def __init__(self, keys: Sequence, find: Callable[[str], Optional[int]], rows: Built,
+                 fold: Optional[Callable[[str], str]] = None, first_wins: bool = False):
+        self._keys = keys        # key of each image row, before folding
+        self._find = find
+        self._rows = rows
+        self._fold = fold
+        self._first_wins = first_wins
+        self._table: Optional[Dict] = None   # key -> row, once everything was asked for
+        self._over: Dict = {}    # image keys assigned (or deleted: _GONE) since
+        self._extra: Dict = {}   # keys that are not in the image, in insertion order
+
+    def _row(self, key) -> Optional[int]:
+        return self._table.get(key) if self._table is not None else self._find(key)
+
+    def _all(self) -> Dict:
+        # iterating or counting needs every key: one pass over the column, kept for lookups too
+        if self._table is None:
+            keys = map(self._fold, self._keys) if self._fold else self._keys
+            if self._first_wins:
+                self._table = {}
+                for row, key in enumerate(keys):
+                    self._table.setdefault(key, row)
+            else:
+                self._table = {key: row for row, key in enumerate(keys)}
+        return self._table
+
+    def __getitem__(self, key):
+        if key in self._extra:
+            return self._extra[key]
+        obj = self._over.get(key)
+        if obj is _GONE:
+            raise KeyError(key)
+        if obj is not None:
+            return obj
+        row = self._row(key)
+        if row is None:
+            raise KeyError(key)
+        return self._rows[row]
+
+    def __contains__(self, key) -> bool:
+        return key in self._extra or self._in_image(key)
+
+    def _in_image(self, key) -> bool:
+        if key in self._over:
+            return self._over[key] is not _GONE
+        return self._row(key) is not None
+
+    def __setitem__(self, key, obj) -> None:
+        if key not in self._extra and self._in_image(key):
+            self._over[key] = obj
+        else:
+            self._extra[key] = obj
+
+    def __delitem__(self, key) -> None:
+        if key in self._extra:
+            del self._extra[key]
+        elif self._in_image(key):
+            self._over[key] = _GONE
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator:
+        over = self._over
+        for key in self._all():
+            if over.get(key) is not _GONE:
+                yield key
+        yield from self._extra
+
+    def __len__(self) -> int:
+        gone = sum(1 for obj in self._over.values() if obj is _GONE)
+        return len(self._all()) - gone + len(self._extra)
+
+    def clear(self) -> None:
+        self._table, self._over, self._extra = {}, {}, {}
+
+# ------------------------------ persistence -------------------------------
+
+def enabled(store: Store) -> bool:
+    return bool(store.files()) and os.environ.get(SNAPSHOT_ENV, "1") != "0"
+
+def image_for(store: Store) -> Tuple[Image, Signature]:
+    # the store's contents as an image, with the store signature they go with:
+    # from the snapshot when it still matches the data, else loaded and snapshotted
+    store.ensure()
+    path = store.path + SUFFIX
+    with store.lock.shared():            # no writer between the stats, the image and the signature
+        sig = store.signature()
+        files = store.files()
+        stats = tuple(file_signature(f) for f in files)
+        image = _read(path, files, stats)
+        if image is None:
+            metrics.count("snapshot.misses")
+            with metrics.span("snapshot.rebuild"):
+                body = Image.encode(store.load_all())
+                image = Image(body)
+                _write(path, body, files, stats)
+        else:
+            metrics.count("snapshot.hits")
+    return image, sig
+
+def _digest(files: List[str]) -> str:
+    import hashlib      # only needed off the fast path; loading OpenSSL costs startup time
+    h = hashlib.sha1()
+    for f in files:
+        try:
+            with open(f, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    h.update(chunk)
+        except FileNotFoundError:
+            pass
+        h.update(b"\0")
+    return h.hexdigest()
+
+def _racy(stats: Stats) -> bool:
+    now = time.time_ns()
+    return any(st is not None and now - st[0] < RACY_NS for st in stats)
+
+def _read(path: str, files: List[str], stats: Stats) -> Optional[Image]:
+    # file: MAGIC, then a frame holding the key and the image itself
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):   # ValueError: the file is empty
+        return None
+    image = None
+    try:
+        if mm[:len(MAGIC)] != MAGIC:
+            return None
+        key, body = _unframed(memoryview(mm)[len(MAGIC):])
+        body += len(MAGIC)
+        if key["platform"] != PLATFORM:
+            return None
+        digest = None
+        if key["stats"] != stats or key["racy"]:
+            with metrics.span("snapshot.hash"):
+                digest = _digest(files)
+            if digest != key["digest"]:
+                return None
+        with metrics.span("snapshot.open"):
+            image = Image(mm, body)
+    except (EOFError, ValueError, TypeError, KeyError, IndexError, struct.error):
+        return None                      # unreadable: rebuilt like a stale one
+    finally:
+        if image is None:
+            mm.close()                   # rejected: only a returned image keeps the mapping
+    if digest is not None and (key["stats"] != stats or not _racy(stats)):
+        # same contents: re-key it so that the next read can skip the hash
+        _write(path, mm[body:], files, stats, digest)
+    return image
+
+def _write(path: str, body: bytes, files: List[str], stats: Stats, digest: Optional[str] = None) -> None:
+    key = {"platform": PLATFORM, "stats": stats, "digest": digest or _digest(files), "racy": _racy(stats)}
+    try:
+        atomic_write(path, MAGIC + _framed(key, [body]))
+    except OSError:
+        pass                             # only a cache: a read-only folder just means no snapshot
@@ -0,0 +1,284 @@
+import os, sqlite3, threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from . import metrics
+from .store import JsonStore, Op, Signature, Store, next_revision
+
+# Relational backend: one row per student, one row per enrolled subject.
+# seq keeps registration order so listings match the JSON file order; subjects
+# are keyed by rowid, in enrolment order, so a repeated subject id is kept as
+# its own row like the other backends keep it.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    id       TEXT NOT NULL UNIQUE,
+    name     TEXT NOT NULL,
+    email    TEXT NOT NULL,
+    password TEXT NOT NULL,
+    rev      INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS students_email ON students (email COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS subjects (
+    student_id TEXT NOT NULL REFERENCES students (id) ON DELETE CASCADE,
+    id         TEXT NOT NULL,
+    mark       INTEGER NOT NULL,
+    grade      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS subjects_student ON subjects (student_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', abs(random())), ('version', 0);
+"""
+
+# Statements are kept as constants so sqlite3's statement cache reuses the
+# compiled form on every call (the "prepared statement" path in the stdlib driver).
+SQL_UPSERT_STUDENT = ("INSERT INTO students (id, name, email, password, rev) VALUES (?, ?, ?, ?, ?) "
+                      "ON CONFLICT (id) DO UPDATE SET name = excluded.name, "
+                      "email = excluded.email, password = excluded.password, rev = excluded.rev")
+SQL_BUMP_STUDENT = "UPDATE students SET rev = rev + 1 WHERE id = ?"
+SQL_DELETE_STUDENT = "DELETE FROM students WHERE id = ?"
+SQL_DELETE_SUBJECTS = "DELETE FROM subjects WHERE student_id = ?"
+SQL_INSERT_SUBJECT = "INSERT INTO subjects (student_id, id, mark, grade) VALUES (?, ?, ?, ?)"
+SQL_DELETE_SUBJECT = "DELETE FROM subjects WHERE student_id = ? AND id = ?"
+SQL_STUDENT_REV = "SELECT rev FROM students WHERE id = ?"
+SQL_GET_BY_ID = "SELECT id, name, email, password, rev FROM students WHERE id = ?"
+SQL_GET_BY_EMAIL = "SELECT id, name, email, password, rev FROM students WHERE email = ? COLLATE NOCASE LIMIT 1"
+SQL_SUBJECTS_OF = "SELECT id, mark, grade FROM subjects WHERE student_id = ? ORDER BY rowid"
+SQL_ALL_STUDENTS = "SELECT id, name, email, password, rev FROM students ORDER BY seq"
+SQL_ALL_SUBJECTS = "SELECT student_id, id, mark, grade FROM subjects ORDER BY rowid"
+SQL_ALL_WITH_SUBJECTS = ("SELECT st.id, st.name, st.email, st.password, st.rev, su.id, su.mark, su.grade "
+                         "FROM students st LEFT JOIN subjects su ON su.student_id = st.id ORDER BY st.seq, su.rowid")
+SQL_COUNT = "SELECT COUNT(*) FROM students"
+SQL_BUMP_VERSION = "UPDATE meta SET value = value + 1 WHERE key = 'version'"
+SQL_VERSION = "SELECT value FROM meta WHERE key IN ('epoch', 'version') ORDER BY key"
+SQL_AVERAGES = ("SELECT st.id, st.name, AVG(su.mark) FROM students st "
+                "LEFT JOIN subjects su ON su.student_id = st.id "
+                "GROUP BY st.seq ORDER BY st.seq")
+
+STREAM_ROWS = 1000   # rows fetched per lock hold by iter_records
+
+class SqliteStore(Store):
+    incremental = True
+    queryable = True
+
+    def __init__(self, path: str, migrate_from: Optional[str] = None):
+        super().__init__(path)
+        self.migrate_from = migrate_from
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # ----------------------------- connection -----------------------------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            fresh = not os.path.exists(self.path)
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.executescript(SCHEMA)
+            if "rev" not in {row[1] for row in conn.execute("PRAGMA table_info(students)")}:
+                conn.execute("ALTER TABLE students ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+                conn.commit()
+            self._conn = conn
+            if fresh and self.migrate_from and os.path.exists(self.migrate_from):
+                migrate_json(self.migrate_from, self)
+        return self._conn
+
+    def ensure(self) -> None:
+        with self._lock:
+            self._db()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def signature(self) -> Signature:
+        # (epoch, version) from the meta table: every write commits a version
+        # bump, while checkpoints and closing the database (which rewrite or
+        # remove the -wal file) leave it alone
+        with self._lock:
+            return tuple(v for (v,) in self._db().execute(SQL_VERSION))
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        # One transaction per write, committed together with the version bump.
+        # BEGIN IMMEDIATE takes SQLite's write lock up front, so revision checks
+        # read inside the transaction cannot be overtaken by another process;
+        # the store's file lock is held too, for callers that pair a write with
+        # signature() (see core.sidecar).
+        with self.lock.exclusive(), self._lock, metrics.span("sqlite.write"):
+            db = self._db()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                yield db
+                db.execute(SQL_BUMP_VERSION)
+
+    # ----------------------------- Store API ------------------------------
+
+    @metrics.timed("sqlite.load_all")
+    def load_all(self) -> List[Dict]:
+        with self._lock:
+            db = self._db()
+            by_id: Dict[str, Dict] = {}
+            for sid, name, email, pw, rev in db.execute(SQL_ALL_STUDENTS):
+                by_id[sid] = {"id": sid, "name": name, "email": email, "password": pw, "subjects": [], "rev": rev}
+            for owner, subid, mark, grade in db.execute(SQL_ALL_SUBJECTS):
+                rec = by_id.get(owner)
+                if rec is not None:
+                    rec["subjects"].append({"id": subid, "mark": mark, "grade": grade})
+            return list(by_id.values())
+
+    def save_all(self, records: List[Dict]) -> None:
+        with self._write() as db:
+            db.execute("DELETE FROM subjects")
+            db.execute("DELETE FROM students")
+            self._insert_many(db, records, [int(r.get("rev", 0)) for r in records])
+
+    def upsert(self, record: Dict) -> None:
+        self.upsert_many([record])
+
+    def upsert_many(self, records: Iterable[Dict]) -> None:
+        # a stale record rolls back the whole batch
+        records = list(records)
+        with self._write() as db:
+            revs, written = [], {}
+            for r in records:
+                row = written.get(r["id"]) or db.execute(SQL_STUDENT_REV, (r["id"],)).fetchone()
+                revs.append(next_revision({"rev": row[0]} if row else None, r))
+                written[r["id"]] = (revs[-1],)
+            self._insert_many(db, records, revs)
+        for r, rev in zip(records, revs):
+            r["rev"] = rev
+
+    def delete(self, sid: str) -> bool:
+        with self._write() as db:
+            return db.execute(SQL_DELETE_STUDENT, (sid,)).rowcount > 0
+
+    def add_subject(self, sid: str, subject: Dict) -> None:
+        with self._write() as db:
+            self._add_subject(db, sid, subject)
+
+    def remove_subject(self, sid: str, subject_id: str) -> None:
+        with self._write() as db:
+            self._remove_subject(db, sid, subject_id)
+
+    def clear(self) -> None:
+        self.save_all([])
+
+    def commit(self, ops: List[Op]) -> List[Optional[int]]:
+        # one SQLite transaction for the batch; a stale upsert rolls all of it back
+        if not ops:
+            return []
+        revs: List[Optional[int]] = []
+        with self._write() as db:
+            for op in ops:
+                revs.append(self._apply(db, op))
+        return revs
+
+    # ------------------------------ queries -------------------------------
+
+    def iter_records(self) -> Iterator[Dict]:
+        # one cursor over students joined with their subjects, fetched a batch
+        # at a time; each student's subject rows follow it
+        with self._lock:
+            cur = self._db().execute(SQL_ALL_WITH_SUBJECTS)
+        return self._stream(cur)
+
+    def _stream(self, cur: sqlite3.Cursor) -> Iterator[Dict]:
+        rec: Optional[Dict] = None
+        try:
+            while True:
+                with self._lock:
+                    rows = cur.fetchmany(STREAM_ROWS)
+                if not rows:
+                    break
+                for sid, name, email, pw, rev, subid, mark, grade in rows:
+                    if rec is None or rec["id"] != sid:
+                        if rec is not None:
+                            yield rec
+                        rec = {"id": sid, "name": name, "email": email, "password": pw, "subjects": [], "rev": rev}
+                    if subid is not None:
+                        rec["subjects"].append({"id": subid, "mark": mark, "grade": grade})
+        finally:
+            with self._lock:
+                cur.close()               # stopped early or not, the read ends here
+        if rec is not None:
+            yield rec
+
+    def get(self, sid: str) -> Optional[Dict]:
+        with self._lock:
+            return self._hydrate(self._db().execute(SQL_GET_BY_ID, (sid,)).fetchone())
+
+    def find_by_email(self, email: str) -> Optional[Dict]:
+        with self._lock:
+            return self._hydrate(self._db().execute(SQL_GET_BY_EMAIL, (email,)).fetchone())
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db().execute(SQL_COUNT).fetchone()[0]
+
+    def averages(self) -> List[Tuple[str, str, Optional[float]]]:
+        with self._lock:
+            return [tuple(row) for row in self._db().execute(SQL_AVERAGES)]
+
+    # ----------------------------- internals ------------------------------
+
+    def _hydrate(self, row) -> Optional[Dict]:
+        if row is None:
+            return None
+        sid, name, email, pw, rev = row
+        subjects = [{"id": i, "mark": m, "grade": g} for i, m, g in self._db().execute(SQL_SUBJECTS_OF, (sid,))]
+        return {"id": sid, "name": name, "email": email, "password": pw, "subjects": subjects, "rev": rev}
+
+    @staticmethod
+    def _add_subject(db: sqlite3.Connection, sid: str, subject: Dict) -> None:
+        if db.execute(SQL_BUMP_STUDENT, (sid,)).rowcount:
+            db.execute(SQL_INSERT_SUBJECT, (sid, str(subject["id"]), int(subject["mark"]), subject["grade"]))
+
+    @staticmethod
+    def _remove_subject(db: sqlite3.Connection, sid: str, subject_id: str) -> None:
+        # bumped even if no subject went, as JsonStore and apply_op do
+        db.execute(SQL_DELETE_SUBJECT, (sid, subject_id))
+        db.execute(SQL_BUMP_STUDENT, (sid,))
+
+    def _apply(self, db: sqlite3.Connection, op: Op) -> Optional[int]:
+        # one op inside an open write transaction (see core.store.apply_op)
+        kind = op["op"]
+        if kind == "upsert":
+            r = op["student"]
+            row = db.execute(SQL_STUDENT_REV, (r["id"],)).fetchone()
+            rev = next_revision({"rev": row[0]} if row else None, r)
+            self._insert_many(db, [r], [rev])
+            return rev
+        if kind == "delete":
+            db.execute(SQL_DELETE_STUDENT, (op["id"],))
+        elif kind == "add_subject":
+            self._add_subject(db, op["id"], op["subject"])
+        elif kind == "remove_subject":
+            self._remove_subject(db, op["id"], op["subject"])
+        elif kind == "clear":
+            db.execute("DELETE FROM subjects")
+            db.execute("DELETE FROM students")
+        return None
+
+    @staticmethod
+    def _insert_many(db: sqlite3.Connection, records: Iterable[Dict], revs: Iterable[int]) -> None:
+        for r, rev in zip(records, revs):
+            db.execute(SQL_UPSERT_STUDENT, (r["id"], r["name"], r["email"], r["password"], rev))
+            db.execute(SQL_DELETE_SUBJECTS, (r["id"],))
+            db.executemany(SQL_INSERT_SUBJECT, [(r["id"], str(s["id"]), int(s["mark"]), s["grade"])
+                                                for s in r.get("subjects", [])])
+
+def migrate_json(json_path: str, store: SqliteStore) -> int:
+    # one-shot import of an existing students.data; the JSON file is left untouched
+    records = JsonStore(json_path).load_all()
+    store.save_all(records)
+    return len(records)
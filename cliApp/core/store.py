@@ -0,0 +1,288 @@
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from . import metrics
+from .codec import codec_from_env, decode, encode
+from .locking import FileLock, atomic_write
+from .stream import iter_records
+
+# environment switch shared by cliApp and guiApp: "json" (default), "journal", "sqlite", "sharded" or "records"
+STORAGE_ENV = "UNI_STORAGE"
+BACKENDS = ("json", "journal", "sqlite", "sharded", "records")
+
+Signature = Optional[Tuple]
+Row = Tuple[int, Dict]   # (position in storage order, record), as handed to Store.scan functions
+T = TypeVar("T")
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    # stat() fingerprint, used to notice writes made by another process
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+class StaleRecordError(Exception):
+    # an upsert was based on an older revision of the student than the stored one
+    def __init__(self, sid: str, expected: int, found: int):
+        super().__init__(f"student {sid} was changed elsewhere (revision {found}, expected {expected})")
+        self.sid = sid
+        self.expected = expected
+        self.found = found
+
+def next_revision(current: Optional[Dict], record: Dict) -> int:
+    # Optimistic concurrency check for an upsert. Every stored record carries
+    # "rev", bumped by each write to it (missing means 0); a record is written
+    # back with the revision it was read at, and only if that is still current.
+    expected = int(record.get("rev", 0))
+    found = int(current.get("rev", 0)) if current is not None else 0
+    if found != expected:
+        raise StaleRecordError(str(record.get("id")), expected, found)
+    return found + 1
+
+def copy_record(r: Dict) -> Dict:
+    # students.data records are one level of nesting deep; avoids copy.deepcopy overhead
+    out = dict(r)
+    out["subjects"] = [dict(s) for s in r.get("subjects", [])]
+    return out
+
+# One mutation, in the journal's vocabulary: {"op": "upsert", "student": record},
+# {"op": "delete", "id": sid}, {"op": "add_subject", "id": sid, "subject": {...}},
+# {"op": "remove_subject", "id": sid, "subject": subject_id} or {"op": "clear"}.
+Op = Dict
+
+def op_id(op: Op) -> Optional[str]:
+    # the student an op changes (None for "clear")
+    return op["student"]["id"] if op["op"] == "upsert" else op.get("id")
+
+def apply_op(records: Dict[str, Dict], op: Op, check: bool = True) -> Optional[int]:
+    # Apply one op to records (id -> record, changed in place). With check, an
+    # upsert goes through next_revision; returns the revision it stored.
+    kind = op["op"]
+    if kind == "upsert":
+        rec = copy_record(op["student"])
+        if check:
+            rec["rev"] = next_revision(records.get(rec["id"]), rec)
+        records[rec["id"]] = rec
+        return int(rec.get("rev", 0))
+    if kind == "delete":
+        records.pop(op["id"], None)
+    elif kind in ("add_subject", "remove_subject"):
+        rec = records.get(op["id"])
+        if rec is not None:
+            if kind == "add_subject":
+                rec.setdefault("subjects", []).append(dict(op["subject"]))
+            else:
+                rec["subjects"] = [s for s in rec.get("subjects", []) if str(s.get("id")) != op["subject"]]
+            rec["rev"] = int(rec.get("rev", 0)) + 1
+    elif kind == "clear":
+        records.clear()
+    return None
+
+class Store:
+    # Record-level persistence for the students.data layout (list of student dicts).
+    # Subclasses must implement load_all/save_all; the fine-grained mutations
+    # default to a read-modify-write of the whole dataset and the queries to a scan.
+    #
+    # Several processes (CLI and GUI) may share one data file: `lock` is a
+    # reader/writer lock across all of them, writes hold it exclusively for the
+    # whole read-modify-write, and upsert() rejects a record read at an older
+    # revision (see next_revision) instead of overwriting the newer one.
+    incremental = False  # True when single-record mutations avoid rewriting everything
+    queryable = False    # True when get/find_by_email/averages read only the rows they need
+    partitioned = False  # True when the data is split into parts that scan() visits in parallel
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = FileLock(path + ".lock")
+
+    def ensure(self) -> None:
+        if os.path.exists(self.path):
+            return
+        with self.lock.exclusive():
+            if not os.path.exists(self.path):
+                self.save_all([])
+
+    def load_all(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def save_all(self, records: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def upsert(self, record: Dict) -> None:
+        # on success record["rev"] is set to the revision now stored
+        self.upsert_many([record])
+
+    def upsert_many(self, records: Iterable[Dict]) -> None:
+        # one write for the whole batch; nothing is written if any record is stale
+        with self.lock.exclusive():
+            current = {r.get("id"): r for r in self.load_all()}
+            records = list(records)
+            revs = []
+            for r in records:
+                revs.append(next_revision(current.get(r.get("id")), r))
+                current[r.get("id")] = dict(r, rev=revs[-1])
+            self.save_all(list(current.values()))
+        for r, rev in zip(records, revs):
+            r["rev"] = rev
+
+    def delete(self, sid: str) -> bool:
+        with self.lock.exclusive():
+            records = self.load_all()
+            kept = [r for r in records if r.get("id") != sid]
+            if len(kept) == len(records):
+                return False
+            self.save_all(kept)
+            return True
+
+    def add_subject(self, sid: str, subject: Dict) -> None:
+        with self.lock.exclusive():
+            records = self.load_all()
+            for r in records:
+                if r.get("id") == sid:
+                    r.setdefault("subjects", []).append(subject)
+                    r["rev"] = int(r.get("rev", 0)) + 1
+                    self.save_all(records)
+                    return
+
+    def remove_subject(self, sid: str, subject_id: str) -> None:
+        with self.lock.exclusive():
+            records = self.load_all()
+            for r in records:
+                if r.get("id") == sid:
+                    r["subjects"] = [s for s in r.get("subjects", []) if str(s.get("id")) != subject_id]
+                    r["rev"] = int(r.get("rev", 0)) + 1
+                    self.save_all(records)
+                    return
+
+    def clear(self) -> None:
+        self.save_all([])
+
+    def commit(self, ops: List[Op]) -> List[Optional[int]]:
+        # Write a batch of ops (applied in order, see apply_op) as one write; if
+        # any upsert is stale nothing is written. Returns the revision each
+        # upsert stored (None for the other ops).
+        if not ops:
+            return []
+        with self.lock.exclusive():
+            records = {r.get("id"): r for r in self.load_all()}
+            revs = [apply_op(records, op) for op in ops]
+            self.save_all(list(records.values()))
+        return revs
+
+    def transaction(self) -> "Transaction":
+        # unit of work: `with store.transaction() as tx:` queues tx.upsert(...) etc.
+        # and commits them together when the block ends (see core.transaction)
+        from .transaction import Transaction
+        return Transaction(self)
+
+    # ----- queries -----
+    def scan(self, fn: Callable[[List[Row]], T]) -> List[T]:
+        # fn applied to each partition's rows (here: one partition, everything);
+        # results come back in partition order for the caller to merge. A
+        # partitioned store may run fn in worker processes, so it has to be a
+        # module-level function (or a functools.partial of one).
+        return [fn(list(enumerate(self.load_all())))]
+
+    def iter_records(self) -> Iterator[Dict]:
+        # every record in storage order; stores that can read incrementally
+        # override this so that a full pass holds one record at a time. Always
+        # a generator, so callers that stop early can close() it
+        yield from self.load_all()
+
+    def get(self, sid: str) -> Optional[Dict]:
+        return next((r for r in self.load_all() if r.get("id") == sid), None)
+
+    def find_by_email(self, email: str) -> Optional[Dict]:
+        # case-insensitive, like the CLI's sign-up/sign-in checks
+        email = email.lower()
+        return next((r for r in self.load_all() if str(r.get("email", "")).lower() == email), None)
+
+    def count(self) -> int:
+        return len(self.load_all())
+
+    def averages(self) -> List[Tuple[str, str, Optional[float]]]:
+        # (id, name, average mark or None) per student, in storage order
+        out = []
+        for r in self.load_all():
+            marks = [int(s["mark"]) for s in r.get("subjects", [])]
+            out.append((r["id"], r["name"], sum(marks) / len(marks) if marks else None))
+        return out
+
+    def signature(self) -> Signature:
+        return file_signature(self.path)
+
+    def files(self) -> List[str]:
+        # the files holding the data, for caches keyed by their contents (core.snapshot);
+        # empty when there are none to key on
+        return []
+
+    def close(self) -> None:
+        self.lock.close()
+
+class JsonStore(Store):
+    # The original format: one list, rewritten on every change. Written in the
+    # codec UNI_CODEC names (pretty-printed JSON by default, see core.codec) and
+    # read in whichever codec the file was written in.
+    def __init__(self, path: str, codec: Optional[str] = None):
+        super().__init__(path)
+        self.codec = codec or codec_from_env()
+
+    def load_all(self) -> List[Dict]:
+        self.ensure()
+        with self.lock.shared(), open(self.path, "rb") as f:
+            with metrics.span("file.read"):
+                data = f.read()
+        metrics.count("bytes_read", len(data))
+        with metrics.span("codec.decode"):
+            try:
+                raw = decode(data)
+            except ValueError:
+                raw = []
+        return raw if isinstance(raw, list) else []
+
+    def iter_records(self) -> Iterator[Dict]:
+        # parsed as the file is read (see core.stream). The file opened under the
+        # lock stays whole even if a writer replaces it meanwhile (see atomic_write),
+        # so the lock is not held while the caller works through the records.
+        # It is opened at the first record and closed when they run out or the
+        # iterator is closed; callers that may stop early close it.
+        self.ensure()
+        return self._iter_file()
+
+    def _iter_file(self) -> Iterator[Dict]:
+        with self.lock.shared():
+            f = open(self.path, "rb")
+        try:
+            yield from iter_records(f)
+        except ValueError:
+            return       # a damaged file ends the records where it breaks, as load_all reads it as empty
+        finally:
+            f.close()
+
+    def save_all(self, records: List[Dict]) -> None:
+        with metrics.span("codec.encode"):
+            data = encode(records, self.codec)
+        with self.lock.exclusive():
+            atomic_write(self.path, data)
+
+    def files(self) -> List[str]:
+        return [self.path]
+
+def open_store(path: str, kind: Optional[str] = None) -> Store:
+    kind = (kind or os.environ.get(STORAGE_ENV) or "json").lower()
+    if kind == "json":
+        return JsonStore(path)
+    if kind == "journal":
+        from .journal import JournalStore
+        return JournalStore(path)
+    if kind == "sqlite":
+        from .sqlite_store import SqliteStore
+        return SqliteStore(os.path.splitext(path)[0] + ".db", migrate_from=path)
+    if kind == "sharded":
+        from .sharded import ShardedStore
+        return ShardedStore(os.path.splitext(path)[0] + ".shards", migrate_from=path)
+    if kind == "records":
+        from .record_store import RecordStore
+        return RecordStore(os.path.splitext(path)[0] + ".rec", migrate_from=path)
+    raise ValueError(f"unknown storage backend: {kind}")
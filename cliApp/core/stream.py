@@ -0,0 +1,79 @@
+import codecs, gzip, json, zlib
+from typing import BinaryIO, Dict, Iterator
+
+from . import metrics
+from .codec import MAGIC, decode, detect
+
+# Incremental reading of students.data: the records come out one at a time as
+# the file is read, so a listing can print the first student straight away and
+# a pass over every student holds one of them (plus a read buffer) at a time,
+# however large the file is.
+
+CHUNK = 1 << 20   # characters read per refill
+_WS = " \t\r\n"
+
+# parser states: before "[", after "[", after ",", after an element
+_START, _FIRST, _ITEM, _AFTER = range(4)
+
+def iter_array(f: BinaryIO, chunk_size: int = CHUNK) -> Iterator:
+    # the elements of the JSON array in f, each parsed once enough of it has
+    # been read; ValueError if f does not hold a JSON array (a blank file is empty)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    raw_decode = json.JSONDecoder().raw_decode
+    buf, pos, eof, state = "", 0, False, _START
+    while True:
+        while pos < len(buf) and buf[pos] in _WS:
+            pos += 1
+        if pos >= len(buf):
+            if not eof:
+                buf, pos, eof = _refill(f, decoder, buf, pos, chunk_size)
+                continue
+            if state == _START:
+                return
+            raise ValueError("unexpected end of JSON array")
+        c = buf[pos]
+        if state == _START:
+            if c != "[":
+                raise ValueError("not a JSON array")
+            pos, state = pos + 1, _FIRST
+        elif c == "]" and state in (_FIRST, _AFTER):
+            return
+        elif state == _AFTER:
+            if c != ",":
+                raise ValueError(f"expected ',' or ']' at character {pos}")
+            pos, state = pos + 1, _ITEM
+        else:
+            try:
+                value, end = raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                value, end = None, len(buf)         # incomplete so far: read on and try again
+            if not eof and (end >= len(buf) or buf[end] not in _WS + ",]"):   # "12" of "12.5e3"
+                buf, pos, eof = _refill(f, decoder, buf, pos, chunk_size)
+                continue
+            yield value
+            pos, state = end, _AFTER
+
+def _refill(f: BinaryIO, decoder, buf: str, pos: int, chunk_size: int):
+    # (buffer, position, eof) with what was consumed dropped and the next chunk added
+    data = f.read(chunk_size)
+    metrics.count("bytes_read", len(data))
+    return buf[pos:] + decoder.decode(data, final=not data), 0, not data
+
+def iter_records(f: BinaryIO) -> Iterator[Dict]:
+    # the records in an open students.data file (closed when done), in whichever
+    # codec wrote it: JSON and gzip are parsed as they are read, binary (columns,
+    # see core.codec) is read whole
+    with f:
+        kind = detect(f.read(len(MAGIC)))
+        f.seek(0)
+        if kind == "binary":
+            data = f.read()
+            metrics.count("bytes_read", len(data))
+            yield from decode(data)
+            return
+        try:
+            yield from iter_array(gzip.GzipFile(fileobj=f) if kind == "gzip" else f)
+        except (EOFError, zlib.error, gzip.BadGzipFile) as e:
+            raise ValueError(f"damaged gzip data: {e}") from None
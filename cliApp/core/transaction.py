@@ -0,0 +1,141 @@
+import threading, time
+from typing import Dict, List, Optional, Tuple
+
+from .store import Op, StaleRecordError, Store, copy_record, op_id
+
+# Unit of work over a Store. Mutations made through a Transaction are only
+# queued; commit() (or leaving the `with` block without an exception) writes
+# them all with one Store.commit - one rewrite, journal append or SQLite
+# transaction, whatever the backend - and nothing at all if one of them fails
+# its revision check. Ops apply in the order they were made, so a student can
+# be upserted and then enrolled in the same transaction.
+#
+# GroupCommit goes one step further for threads of one process: transactions
+# committed through it at about the same time share a single Store.commit.
+
+class Transaction:
+    def __init__(self, store: Store, committer=None):
+        self.store = store
+        self.ops: List[Op] = []
+        self._committer = committer or store     # anything with commit(ops) -> revisions
+        self._upserted: List[Tuple[int, Dict]] = []   # (op index, caller's record) to get its new "rev"
+
+    def __enter__(self) -> "Transaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    @property
+    def dirty(self) -> List[str]:
+        # ids of the students this transaction changes, in the order first touched
+        return list(dict.fromkeys(sid for sid in map(op_id, self.ops) if sid is not None))
+
+    def upsert(self, record: Dict) -> None:
+        # written as it is now; record["rev"] is moved on when the commit succeeds
+        self._upserted.append((len(self.ops), record))
+        self.ops.append({"op": "upsert", "student": copy_record(record)})
+
+    def delete(self, sid: str) -> None:
+        self.ops.append({"op": "delete", "id": sid})
+
+    def add_subject(self, sid: str, subject: Dict) -> None:
+        self.ops.append({"op": "add_subject", "id": sid, "subject": dict(subject)})
+
+    def remove_subject(self, sid: str, subject_id: str) -> None:
+        self.ops.append({"op": "remove_subject", "id": sid, "subject": subject_id})
+
+    def clear(self) -> None:
+        self.ops.append({"op": "clear"})
+
+    def commit(self) -> None:
+        if self.ops:
+            revs = self._committer.commit(self.ops)
+            for i, record in self._upserted:
+                record["rev"] = revs[i]
+        self.rollback()
+
+    def rollback(self) -> None:
+        self.ops = []
+        self._upserted = []
+
+class _Pending:
+    def __init__(self, ops: List[Op]):
+        self.ops = ops
+        self.revs: Optional[List[Optional[int]]] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def done(self) -> bool:
+        return self.revs is not None or self.error is not None
+
+    def result(self) -> List[Optional[int]]:
+        if self.error is not None:
+            raise self.error
+        return self.revs
+
+class GroupCommit:
+    # Group commit for the threads of one process. The first commit to arrive
+    # while nothing is being written leads: it waits `delay` seconds for others
+    # to queue up, then writes every queued transaction's ops in one
+    # Store.commit and hands each its revisions. If that write is refused
+    # because a record is stale, the transactions are written one by one, so
+    # only the stale ones fail.
+    def __init__(self, store: Store, delay: float = 0.002, max_batch: int = 1000):
+        self.store = store
+        self.delay = delay
+        self.max_batch = max_batch            # transactions per write
+        self.batches = 0                      # Store.commit calls made, for benchmarks
+        self._cond = threading.Condition()
+        self._queue: List[_Pending] = []
+        self._leading = False
+
+    def transaction(self) -> Transaction:
+        return Transaction(self.store, self)
+
+    def commit(self, ops: List[Op]) -> List[Optional[int]]:
+        mine = _Pending(ops)
+        with self._cond:
+            self._queue.append(mine)
+            while self._leading and not mine.done:
+                self._cond.wait()
+            if mine.done:
+                return mine.result()
+            self._leading = True
+        try:
+            if self.delay:
+                time.sleep(self.delay)        # let the batch fill up
+            while not mine.done:
+                with self._cond:
+                    batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                self._write(batch)
+                with self._cond:
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._leading = False
+                self._cond.notify_all()
+        return mine.result()
+
+    def _write(self, batch: List[_Pending]) -> None:
+        try:
+            revs = self.store.commit([op for p in batch for op in p.ops])
+        except StaleRecordError as e:
+            if len(batch) == 1:
+                batch[0].error = e
+            else:
+                for p in batch:
+                    self._write([p])
+            return
+        except Exception as e:
+            for p in batch:
+                p.error = e
+            return
+        self.batches += 1
+        at = 0
+        for p in batch:
+            p.revs = revs[at:at + len(p.ops)]
+            at += len(p.ops)
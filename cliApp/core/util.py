@@ -1,14 +1,7 @@
-import random
-from typing import List
+from typing import Collection
 
-def gen_student_id(existing_ids: List[str]) -> str:
-    while True:
-        sid = f"{random.randint(1, 999999):06d}"
-        if sid not in existing_ids:
-            return sid
+from .idalloc import pick_unused
 
-def gen_subject_id(existing_ids_for_student: List[str]) -> str:
-    while True:
-        sid = f"{random.randint(1, 999):03d}"
-        if sid not in existing_ids_for_student:
-            return sid
+def gen_subject_id(existing_ids_for_student: Collection[str]) -> str:
+    used = (int(s) for s in existing_ids_for_student if s.isdigit())
+    return f"{pick_unused(used, 1, 999):03d}"
@@ -2,6 +2,8 @@ import re
 
 EMAIL_RE    = re.compile(r"^[A-Za-z]+[.][A-Za-z]+@university\.com$")
 PASSWORD_RE = re.compile(r"^[A-Z][A-Za-z]{4,}\d{3,}$")
+SUBJECT_ID_RE = re.compile(r"^[0-9]{3}$")
+MAX_SUBJECTS = 4
 
 def valid_email(email: str) -> bool:
     return EMAIL_RE.match(email) is not None
@@ -9,6 +11,28 @@ def valid_email(email: str) -> bool:
 def valid_password(pw: str) -> bool:
     return PASSWORD_RE.match(pw) is not None
 
+def valid_subject_id(sid: str) -> bool:
+    return SUBJECT_ID_RE.match(sid) is not None
+
+def valid_mark(mark: int) -> bool:
+    return 0 <= mark <= 100
+
+def subjects_problem(subjects) -> str:
+    # why a student's subjects ({"id", "mark"} dicts, mark an int) could not have
+    # come from the CLI, or "" if they could
+    if len(subjects) > MAX_SUBJECTS:
+        return f"more than {MAX_SUBJECTS} subjects"
+    seen = set()
+    for s in subjects:
+        if not valid_subject_id(s["id"]):
+            return "bad subject id"
+        if not valid_mark(s["mark"]):
+            return "bad mark"
+        if s["id"] in seen:
+            return "duplicate subject"
+        seen.add(s["id"])
+    return ""
+
 def email_to_name(email: str) -> str:
     local = email.split("@")[0]
     if "." in local:
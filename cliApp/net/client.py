@@ -0,0 +1,233 @@
+import asyncio, itertools, socket, threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .protocol import MAX_LINE, ServiceError, decode, encode, parse_address, server_address
+
+# Client side of the enrolment server (see net.server). ServiceClient is a
+# blocking drop-in for guiApp's DatabaseManager: same method names, results and
+# exceptions, so the GUI (or a script) can work against the server instead of
+# opening students.data itself. AsyncServiceClient is the asyncio equivalent.
+
+Row = Tuple[str, str, Optional[float]]
+
+def _result(msg: Dict[str, Any]) -> Any:
+    if msg.get("ok"):
+        return msg.get("result")
+    raise ServiceError(msg.get("error") or "error")
+
+REPORT_TRIES = 5   # times a paged report is started again because a write came between its pages
+
+def _fill(buckets: Dict[str, List[Row]], page: Dict[str, Any]) -> int:
+    # add one grades_by_* page ([bucket, id, name, average] rows) to the buckets; rows added
+    for bucket, *row in page["rows"]:
+        buckets[bucket].append(tuple(row))
+    return len(page["rows"])
+
+def _changing() -> ServiceError:
+    return ServiceError("busy", "the report kept changing while it was read")
+
+class ServiceClient:
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._file = sock.makefile("rwb")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()        # one request in flight per connection
+        self._seq: Optional[int] = None      # change number changes() asks from
+
+    @staticmethod
+    def connect(address: Optional[str] = None, timeout: Optional[float] = 30.0) -> "ServiceClient":
+        where = parse_address(address or server_address())
+        if where[0] == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(where[1])
+        else:
+            sock = socket.create_connection((where[1], where[2]), timeout=timeout)
+        return ServiceClient(sock)
+
+    def call(self, op: str, **args: Any) -> Any:
+        with self._lock:
+            if self._file is None:
+                raise ConnectionError("connection was dropped after a bad reply")
+            try:
+                self._file.write(encode({"id": next(self._ids), "op": op, "args": args}))
+                self._file.flush()
+                line = self._file.readline()      # replies are not length-limited
+                if not line:
+                    raise ConnectionError("server closed the connection")
+                msg = decode(line)
+            except (OSError, ValueError):
+                self.close()                      # the stream is no longer in step with the requests
+                raise
+        return _result(msg)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._sock.close()
+            self._file = None
+
+    def _report(self, op: str) -> Dict[str, List[Row]]:
+        # the whole report, read a page at a time; started again if it changes meanwhile
+        for _ in range(REPORT_TRIES):
+            page = self.call(op)
+            seq, buckets = page["seq"], {k: [] for k in page["buckets"]}
+            got = _fill(buckets, page)
+            while got < page["total"] and page["rows"]:
+                page = self.call(op, start=got)
+                if page["seq"] != seq:
+                    break
+                got += _fill(buckets, page)
+            else:
+                return buckets
+        raise _changing()
+
+    def __enter__(self) -> "ServiceClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ----- DatabaseManager API -----
+    def authenticate(self, email: str, password: str) -> Tuple[bool, str]:
+        ok, code = self.call("authenticate", email=email, password=password)
+        return ok, code
+
+    def get_student(self, email: str) -> Dict:
+        try:
+            return self.call("get_student", email=email)
+        except ServiceError as e:
+            if e.code == "no_such_student":
+                raise KeyError("Student not found") from None
+            raise
+
+    def enrol_new_subject(self, email: str) -> Dict:
+        try:
+            return self.call("enrol_new_subject", email=email)
+        except ServiceError as e:
+            if e.code == "limit_reached":
+                raise ValueError("limit_reached") from None
+            if e.code == "no_such_student":
+                raise KeyError("Student not found") from None
+            raise
+
+    def delete_subject(self, email: str, subject_id) -> None:
+        try:
+            self.call("delete_subject", email=email, subject_id=str(subject_id))
+        except ServiceError as e:
+            if e.code == "no_such_student":
+                raise KeyError("Student not found") from None
+            raise
+
+    def search(self, text: str, limit: int = 10) -> List[Dict]:
+        return self.call("search", text=text, limit=limit)
+
+    def student_page(self, start: int = 0, count: int = 100) -> Dict:
+        return self.call("student_page", start=start, count=count)
+
+    def changes(self) -> Optional[List[str]]:
+        # ids changed since the last call (empty on the first); None: take everything as changed
+        answer = self.call("changes", since=self._seq)
+        self._seq = answer["seq"]
+        return answer["ids"]
+
+    # ----- admin reports: rows of (id, name, average or None) per bucket -----
+    def grades_by_grade(self) -> Dict[str, List[Row]]:
+        return self._report("grades_by_grade")
+
+    def grades_by_pass_fail(self) -> Dict[str, List[Row]]:
+        return self._report("grades_by_pass_fail")
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    # one reply line whatever its length: the reader's limit only sizes its buffer
+    parts = []
+    while True:
+        try:
+            parts.append(await reader.readuntil(b"\n"))
+            return b"".join(parts)
+        except asyncio.LimitOverrunError as e:
+            parts.append(await reader.readexactly(e.consumed))
+        except asyncio.IncompleteReadError as e:
+            parts.append(e.partial)               # connection closed
+            return b"".join(parts)
+
+class AsyncServiceClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._seq: Optional[int] = None
+
+    @staticmethod
+    async def connect(address: Optional[str] = None) -> "AsyncServiceClient":
+        where = parse_address(address or server_address())
+        if where[0] == "unix":
+            reader, writer = await asyncio.open_unix_connection(where[1], limit=MAX_LINE)
+        else:
+            reader, writer = await asyncio.open_connection(where[1], where[2], limit=MAX_LINE)
+        return AsyncServiceClient(reader, writer)
+
+    async def call(self, op: str, **args: Any) -> Any:
+        async with self._lock:
+            if self._writer.is_closing():
+                raise ConnectionError("connection was dropped after a bad reply")
+            try:
+                self._writer.write(encode({"id": next(self._ids), "op": op, "args": args}))
+                await self._writer.drain()
+                line = await _read_line(self._reader)
+                if not line:
+                    raise ConnectionError("server closed the connection")
+                msg = decode(line)
+            except (OSError, ValueError):
+                self._writer.close()              # the stream is no longer in step with the requests
+                raise
+        return _result(msg)
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def _report(self, op: str) -> Dict[str, List[Row]]:
+        for _ in range(REPORT_TRIES):
+            page = await self.call(op)
+            seq, buckets = page["seq"], {k: [] for k in page["buckets"]}
+            got = _fill(buckets, page)
+            while got < page["total"] and page["rows"]:
+                page = await self.call(op, start=got)
+                if page["seq"] != seq:
+                    break
+                got += _fill(buckets, page)
+            else:
+                return buckets
+        raise _changing()
+
+    async def authenticate(self, email: str, password: str) -> Tuple[bool, str]:
+        ok, code = await self.call("authenticate", email=email, password=password)
+        return ok, code
+
+    async def get_student(self, email: str) -> Dict:
+        return await self.call("get_student", email=email)
+
+    async def enrol_new_subject(self, email: str) -> Dict:
+        return await self.call("enrol_new_subject", email=email)
+
+    async def delete_subject(self, email: str, subject_id) -> None:
+        await self.call("delete_subject", email=email, subject_id=str(subject_id))
+
+    async def search(self, text: str, limit: int = 10) -> List[Dict]:
+        return await self.call("search", text=text, limit=limit)
+
+    async def student_page(self, start: int = 0, count: int = 100) -> Dict:
+        return await self.call("student_page", start=start, count=count)
+
+    async def changes(self) -> Optional[List[str]]:
+        answer = await self.call("changes", since=self._seq)
+        self._seq = answer["seq"]
+        return answer["ids"]
+
+    async def grades_by_grade(self) -> Dict[str, List[Row]]:
+        return await self._report("grades_by_grade")
+
+    async def grades_by_pass_fail(self) -> Dict[str, List[Row]]:
+        return await self._report("grades_by_pass_fail")
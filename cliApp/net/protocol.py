@@ -0,0 +1,43 @@
+import json, os
+from typing import Any, Dict, Tuple, Union
+
+# Wire format shared by the enrolment server and its clients: one JSON object
+# per line in each direction.
+#   request:  {"id": 7, "op": "get_student", "args": {"email": "..."}}
+#   response: {"id": 7, "ok": true, "result": ...}
+#             {"id": 7, "ok": false, "error": "no_such_student"}
+# Requests on one connection are answered in order. Requests are at most
+# MAX_LINE bytes; replies can be any length (bulk answers are paged, see
+# net.server), so clients read each reply line whole.
+
+SERVER_ENV = "UNI_SERVER"          # where clients find the server, e.g. "127.0.0.1:8765" or "unix:/tmp/uni.sock"
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+MAX_LINE = 1024 * 1024
+
+Address = Union[Tuple[str, str], Tuple[str, str, int]]   # ("unix", path) or ("tcp", host, port)
+
+class ServiceError(Exception):
+    # an error reported by the server; `code` is the machine-readable reason
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(message or code)
+        self.code = code
+
+def parse_address(text: str) -> Address:
+    if text.startswith("unix:"):
+        return ("unix", text[len("unix:"):])
+    host, _, port = text.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"bad server address {text!r} (want host:port or unix:/path)")
+    return ("tcp", host, int(port))
+
+def server_address() -> str:
+    return os.environ.get(SERVER_ENV) or DEFAULT_ADDRESS
+
+def encode(msg: Dict[str, Any]) -> bytes:
+    return (json.dumps(msg, separators=(",", ":")) + "\n").encode("utf-8")
+
+def decode(line: bytes) -> Dict[str, Any]:
+    msg = json.loads(line)
+    if not isinstance(msg, dict):
+        raise ValueError("message is not an object")
+    return msg
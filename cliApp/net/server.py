@@ -0,0 +1,380 @@
+import asyncio, inspect, os, random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from ..core.events import ChangeFeed, replay, touched
+from ..core.grade_view import GradeView
+from ..core.idalloc import pick_unused
+from ..core.models import grade_from_mark
+from ..core.search import SearchIndex
+from ..core.sidecar import tracked_write
+from ..core.store import StaleRecordError, Store, copy_record
+from .protocol import MAX_LINE, ServiceError, decode, encode, parse_address
+
+# Asyncio server for the DatabaseManager API (authenticate, get_student,
+# enrol_new_subject, delete_subject, search, student_page, changes) plus the
+# admin grade reports.
+#
+# The whole dataset is held in memory and every request is answered from it.
+# Writes change memory at once and are then group-committed: whatever arrives
+# within commit_delay is written to the store in one upsert_many, and each
+# writer's response is sent only once its batch is on disk. The store is only
+# touched from one worker thread, so the event loop never blocks on file I/O.
+# Writes made by other processes are picked up from the store's change feed
+# (core.events) when it covers them, and by reloading everything otherwise.
+
+MAX_PAGE = 1000     # most students one student_page answer carries
+REPORT_PAGE = 5000  # most report rows one grades_by_* answer carries
+CHANGE_LOG = 1000   # changes kept for clients asking what changed since they last looked
+
+class EnrolmentService:
+    def __init__(self, store: Store, commit_delay: float = 0.002, max_batch: int = 1000,
+                 poll_interval: float = 0.5):
+        self.store = store
+        self.commit_delay = commit_delay      # how long a batch stays open for more writes
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval    # how often to look for writes made by other processes
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+        self._by_id: Dict[str, Dict] = {}
+        self._order: List[str] = []
+        self._by_email: Dict[str, str] = {}   # exact email -> id, like DatabaseManager's lookup
+        self._view = GradeView(store.path + GradeView.suffix)
+        self._search = SearchIndex(store.path + SearchIndex.suffix)   # names/emails only change on reload
+        self._sig = None
+        self._touched: Dict[str, None] = {}
+        self._waiters: List[Tuple[str, asyncio.Future]] = []   # (student id, its writer)
+        self._reports: Dict[str, Tuple[List[str], List[List]]] = {}   # report (buckets, rows), kept until the next write
+        self._feed = ChangeFeed(store)
+        self._seq = 0                          # numbers the changes, for the changes op
+        self._changes: Deque[Tuple[int, Optional[List[str]]]] = deque(maxlen=CHANGE_LOG)
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.ops = {
+            "authenticate": self.authenticate,
+            "get_student": self.get_student,
+            "enrol_new_subject": self.enrol_new_subject,
+            "delete_subject": self.delete_subject,
+            "search": self.search,
+            "student_page": self.student_page,
+            "changes": self.changes,
+            "grades_by_grade": self.grades_by_grade,
+            "grades_by_pass_fail": self.grades_by_pass_fail,
+        }
+
+    # ----------------------------- lifecycle ------------------------------
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        await self._reload()
+        self._tasks = [asyncio.ensure_future(self._committer()), asyncio.ensure_future(self._watcher())]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await self._commit()                  # whatever is still pending
+        self._io.shutdown(wait=True)
+
+    async def _reload(self) -> None:
+        def load():
+            with self.store.lock.shared():
+                return self.store.signature(), self.store.load_all()
+        sig, records = await self._run(load)
+        self._by_id = {r["id"]: r for r in records}
+        self._order = list(self._by_id)        # ids in file order, for student_page
+        self._by_email = {r.get("email", ""): r["id"] for r in records}
+        self._view.rebuild(records)
+        self._search.rebuild(records)
+        self._reports.clear()
+        self._sig = sig
+        self._note(None)
+
+    async def _catch_up(self) -> bool:
+        # apply to memory what other processes logged on the change feed since
+        # our last read or write; False if it does not cover it (reload instead)
+        found = await self._run(lambda: self._feed.since(self._sig))
+        if found is None:
+            return False
+        ops, sig = found
+        ids = touched(ops)
+        if ids is None:
+            return False
+        records = {sid: copy_record(self._by_id[sid]) for sid in ids if sid in self._by_id}
+        try:
+            replay(records, ops)
+        except StaleRecordError:
+            return False
+        for sid in ids:
+            old = self._by_id.get(sid)
+            if old is not None and self._by_email.get(old.get("email", "")) == sid:
+                del self._by_email[old.get("email", "")]
+            rec = records.get(sid)
+            if rec is None:
+                if old is not None:
+                    del self._by_id[sid]
+                    self._order.remove(sid)
+                    self._view.remove(sid)
+                    self._search.remove(sid)
+                continue
+            if old is None:
+                self._order.append(sid)
+            self._by_id[sid] = rec
+            self._by_email[rec.get("email", "")] = sid
+            self._view.update(sid, rec.get("name", ""), [int(s["mark"]) for s in rec.get("subjects", [])])
+            self._search.update(sid, rec.get("name", ""), rec.get("email", ""))
+        self._reports.clear()
+        self._sig = sig
+        self._note(ids)
+        return True
+
+    def _note(self, ids: Optional[List[str]]) -> None:
+        # record a change for the changes op; ids None: everything was reloaded
+        self._seq += 1
+        self._changes.append((self._seq, ids))
+
+    async def _run(self, fn: Callable[[], Any]) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn)
+
+    # ------------------------------- API ----------------------------------
+
+    async def authenticate(self, email: str = "", password: str = "") -> List:
+        email, password = (email or "").strip(), (password or "").strip()
+        if not email or not password:
+            return [False, "empty"]
+        rec = self._find(email)
+        if rec is None:
+            return [False, "no_such_student"]
+        if rec.get("password") != password:
+            return [False, "bad_password"]
+        return [True, ""]
+
+    async def get_student(self, email: str = "") -> Dict:
+        rec = self._require(email)
+        out = copy_record(rec)
+        out.pop("password", None)
+        return out
+
+    async def enrol_new_subject(self, email: str = "") -> Dict:
+        rec = self._require(email)
+        subjects = rec.setdefault("subjects", [])
+        if len(subjects) >= 4:
+            raise ServiceError("limit_reached")
+        used = (int(s["id"]) for s in subjects if str(s.get("id")).isdigit())
+        mark = random.randint(25, 100)
+        sub = {"id": f"{pick_unused(used, 0, 999):03d}", "mark": mark, "grade": grade_from_mark(mark)}
+        subjects.append(sub)
+        await self._changed(rec)
+        return dict(sub)
+
+    async def delete_subject(self, email: str = "", subject_id: Any = "") -> None:
+        rec = self._require(email)
+        sid = str(subject_id).zfill(3) if str(subject_id).isdigit() else str(subject_id)
+        before = len(rec.get("subjects", []))
+        rec["subjects"] = [s for s in rec.get("subjects", []) if str(s.get("id")) != sid]
+        if len(rec["subjects"]) != before:
+            await self._changed(rec)
+
+    async def search(self, text: str = "", limit: int = 10) -> List[Dict]:
+        if not isinstance(text, str) or not isinstance(limit, int):
+            raise ServiceError("bad_request")
+        return [{"id": sid, "name": name, "email": email} for sid, name, email in self._search.search(text, limit)]
+
+    async def student_page(self, start: int = 0, count: int = 100) -> Dict:
+        if not isinstance(start, int) or not isinstance(count, int) or start < 0 or count < 0:
+            raise ServiceError("bad_request")
+        rows = []
+        for sid in self._order[start:start + min(count, MAX_PAGE)]:
+            rec = self._by_id[sid]
+            marks = [int(s["mark"]) for s in rec.get("subjects", [])]
+            rows.append({"id": sid, "name": rec.get("name", ""), "email": rec.get("email", ""),
+                         "average": sum(marks) / len(marks) if marks else None, "subjects": len(marks)})
+        return {"total": len(self._order), "students": rows}
+
+    async def changes(self, since: Optional[int] = None) -> Dict:
+        # the ids changed after change number `since`, and the number to ask from
+        # next; "ids" is None if that is too far back (or everything was reloaded)
+        if since is None:
+            return {"seq": self._seq, "ids": []}
+        if not isinstance(since, int):
+            raise ServiceError("bad_request")
+        if since > self._seq or (since < self._seq and self._changes[0][0] > since + 1):
+            return {"seq": self._seq, "ids": None}
+        ids: Dict[str, None] = {}
+        for seq, changed in self._changes:
+            if seq > since:
+                if changed is None:
+                    return {"seq": self._seq, "ids": None}
+                ids.update(dict.fromkeys(changed))
+        return {"seq": self._seq, "ids": list(ids)}
+
+    async def grades_by_grade(self, start: int = 0, count: int = REPORT_PAGE) -> Dict:
+        return self._report("grade", self._view.by_grade, start, count)
+
+    async def grades_by_pass_fail(self, start: int = 0, count: int = REPORT_PAGE) -> Dict:
+        return self._report("pass_fail", self._view.by_pass_fail, start, count)
+
+    def _report(self, key: str, build: Callable[[], Dict[str, List]], start: int, count: int) -> Dict:
+        # one page of the report's rows, [bucket, id, name, average], bucket by
+        # bucket; "seq" tells the client whether a write came between its pages
+        if not isinstance(start, int) or not isinstance(count, int) or start < 0 or count < 0:
+            raise ServiceError("bad_request")
+        if key not in self._reports:
+            buckets = build()
+            self._reports[key] = (list(buckets), [[k, *r] for k, rows in buckets.items() for r in rows])
+        names, rows = self._reports[key]
+        return {"seq": self._seq, "buckets": names, "total": len(rows),
+                "rows": rows[start:start + min(count, REPORT_PAGE)]}
+
+    def _find(self, email: str) -> Optional[Dict]:
+        sid = self._by_email.get((email or "").strip())
+        return self._by_id.get(sid) if sid is not None else None
+
+    def _require(self, email: str) -> Dict:
+        rec = self._find(email)
+        if rec is None:
+            raise ServiceError("no_such_student", "Student not found")
+        return rec
+
+    # --------------------------- group commit -----------------------------
+
+    async def _changed(self, rec: Dict) -> None:
+        # memory (and the in-memory report view) already show the change; wait for it to be durable
+        self._view.update(rec["id"], rec.get("name", ""), [int(s["mark"]) for s in rec.get("subjects", [])])
+        self._reports.clear()
+        self._note([rec["id"]])
+        self._touched[rec["id"]] = None
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((rec["id"], fut))
+        self._wake.set()
+        await fut
+
+    async def _committer(self) -> None:
+        while True:
+            await self._wake.wait()
+            if len(self._touched) < self.max_batch:
+                await asyncio.sleep(self.commit_delay)   # let the batch fill up
+            self._wake.clear()
+            await self._commit()
+
+    async def _commit(self) -> None:
+        if not self._waiters:
+            return
+        ids, waiters = list(self._touched), self._waiters
+        self._touched, self._waiters = {}, []
+        failed: Dict[str, Exception] = {}
+
+        def upsert(records: List[Dict]) -> None:
+            tracked_write(self.store, lambda: self.store.upsert_many(records),
+                          {GradeView: lambda v: [v.update(r["id"], r.get("name", ""),
+                                                          [int(s["mark"]) for s in r.get("subjects", [])])
+                                                 for r in records]},
+                          [{"op": "upsert", "student": r} for r in records])
+
+        def write():
+            # the batch in one write; if a student in it is stale, one write per
+            # student (as GroupCommit does), so only that student's writer fails
+            try:
+                upsert(batch)
+            except StaleRecordError as e:
+                if len(batch) == 1:
+                    failed[batch[0]["id"]] = e
+                else:
+                    for r in batch:
+                        try:
+                            upsert([r])
+                        except Exception as e:
+                            failed[r["id"]] = e
+            return self.store.signature()
+        try:
+            batch = [copy_record(self._by_id[i]) for i in ids if i in self._by_id]
+            self._sig = await self._run(write)
+        except Exception as e:
+            failed = dict.fromkeys(ids, e)
+        if failed:
+            # memory shows writes that did not land; a stale student's version from
+            # the other process wins
+            try:
+                await self._reload()
+            except Exception:
+                self._sig = None                  # the watcher reloads
+        else:
+            for r in batch:
+                self._by_id[r["id"]]["rev"] = r["rev"]
+        for sid, f in waiters:
+            if not f.done():
+                if sid in failed:
+                    f.set_exception(_service_error(failed[sid]))
+                else:
+                    f.set_result(None)
+
+    async def _watcher(self) -> None:
+        # pick up writes made without the server (CLI, GUI on the files directly)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self._waiters:
+                continue
+            if await self._run(self.store.signature) != self._sig and not self._waiters:
+                if not await self._catch_up():
+                    await self._reload()
+
+    # ---------------------------- connections -----------------------------
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(encode(await self.dispatch(line)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass                              # client went away or sent an oversized line
+        finally:
+            writer.close()
+
+    async def dispatch(self, line: bytes) -> Dict:
+        try:
+            msg = decode(line)
+        except ValueError:
+            return {"id": None, "ok": False, "error": "bad_request"}
+        fn = self.ops.get(msg.get("op"))
+        args = msg.get("args") or {}
+        if fn is None or not isinstance(args, dict):
+            return {"id": msg.get("id"), "ok": False, "error": "bad_request"}
+        try:
+            inspect.signature(fn).bind(**args)   # unknown or missing arguments
+        except TypeError:
+            return {"id": msg.get("id"), "ok": False, "error": "bad_request"}
+        try:
+            return {"id": msg.get("id"), "ok": True, "result": await fn(**args)}
+        except ServiceError as e:
+            return {"id": msg.get("id"), "ok": False, "error": e.code}
+        except Exception:
+            return {"id": msg.get("id"), "ok": False, "error": "internal"}
+
+def _service_error(e: Exception) -> ServiceError:
+    # how a failed write is reported to the client that asked for it
+    if isinstance(e, StaleRecordError):
+        return ServiceError("conflict", "student was changed elsewhere; reload and retry")
+    if isinstance(e, OSError):
+        return ServiceError("storage_error", str(e))
+    return ServiceError("internal", str(e))
+
+async def serve(store: Store, address: str, ready: Optional[Callable[[str], None]] = None, **options) -> None:
+    # run until cancelled; `ready` is called with the address once it is listening
+    service = EnrolmentService(store, **options)
+    await service.start()
+    where = parse_address(address)
+    if where[0] == "unix":
+        if os.path.exists(where[1]):
+            os.remove(where[1])               # left over from an earlier run
+        server = await asyncio.start_unix_server(service.handle, where[1], limit=MAX_LINE, backlog=1024)
+    else:
+        server = await asyncio.start_server(service.handle, where[1], where[2], limit=MAX_LINE, backlog=1024)
+    if ready is not None:
+        ready(address)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
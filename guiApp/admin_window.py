@@ -0,0 +1,89 @@
+import hmac, os
+import tkinter as tk
+from tkinter import ttk, messagebox, simpledialog
+from typing import Dict, List, Optional
+from .change_watcher import ChangeWatcher
+from .student_list_window import StudentListWindow
+from .worker import BackgroundWorker
+
+ADMIN_ENV = "UNI_ADMIN_PASSWORD"   # the GUI's admin password; admin access is off while unset
+
+def admin_sign_in(parent) -> bool:
+    """
+    Ask for the admin password (UNI_ADMIN_PASSWORD). The login window only
+    takes student credentials: anything that shows other students' details
+    lives behind this check.
+    """
+    expected = os.environ.get(ADMIN_ENV)
+    if not expected:
+        messagebox.showerror("admin", f"admin access is off: set {ADMIN_ENV} to turn it on", parent=parent)
+        return False
+    given: Optional[str] = simpledialog.askstring("admin", "admin password", show="•", parent=parent)
+    if given is None:
+        return False
+    if not hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8")):
+        messagebox.showerror("admin", "Incorrect password", parent=parent)
+        return False
+    return True
+
+class AdminWindow(tk.Toplevel):
+    """
+    Admin tools, opened from the login window once admin_sign_in() passes.
+    The student lookup finds students by part of a name or email (typos
+    allowed) and lists them with their ids; "all students" opens every
+    student in a list that loads as it scrolls.
+    """
+
+    def __init__(self, parent, db, worker: BackgroundWorker, changes: ChangeWatcher = None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.changes = changes
+
+        self.title("admin")
+        self.geometry("720x420")
+        self.configure(padx=20, pady=20)
+
+        ttk.Label(self, text="admin", font=("Arial", 22, "bold")).grid(row=0, column=0, columnspan=2, pady=(0, 10))
+
+        # Student lookup
+        ttk.Label(self, text="find", font=("Arial", 16, "bold")).grid(row=1, column=0, sticky="e", padx=(0, 12))
+        self.find_var = tk.StringVar()
+        self.find_entry = ttk.Entry(self, textvariable=self.find_var, width=60)
+        self.find_entry.grid(row=1, column=1, sticky="w")
+        self.find_entry.focus()
+        self.matches = tk.Listbox(self, height=10, width=70, activestyle="none", exportselection=False)
+        self.matches.grid(row=2, column=1, sticky="w", pady=(6, 0))
+        self._found: List[Dict] = []
+        self.find_var.trace_add("write", lambda *_: self._lookup())
+
+        # every student, in a list that loads as it scrolls
+        ttk.Button(self, text="all students", command=self._show_students).grid(row=3, column=1, sticky="w", pady=(12, 0))
+        self.students_window = None  # type: StudentListWindow|None
+
+        self.grid_columnconfigure(1, weight=1)
+
+    def _show_students(self):
+        if self.students_window is not None and self.students_window.winfo_exists():
+            self.students_window.lift()
+            return
+        self.students_window = StudentListWindow(self, self.db, self.worker, changes=self.changes)
+
+    def _lookup(self):
+        text = self.find_var.get()
+        if not text.strip():
+            self._show_matches(text, [])
+            return
+        # coalesced: while one lookup runs, only the text typed last is looked up after it
+        self.worker.submit(lambda: self.db.search(text),
+                           on_done=lambda found: self._show_matches(text, found),
+                           on_error=lambda error: self._show_matches(text, []),
+                           key="lookup")
+
+    def _show_matches(self, text: str, found: List[Dict]):
+        if not self.winfo_exists() or text != self.find_var.get():
+            return  # closed, or typed on since; the newer lookup will fill the list
+        self._found = found
+        self.matches.delete(0, tk.END)
+        for s in found:
+            self.matches.insert(tk.END, f"{s['name']} :: {s['id']} --> {s['email']}")
@@ -2,13 +2,38 @@
 Entry point for the GUI app.
 
 Run with:
-    python -m guiApp.app
+    python -m guiApp.app [--profile] [--cprofile FILE]
+
+--profile (or UNI_PROFILE=1) times the data calls and prints a report when the
+window is closed; --cprofile also runs the whole session under cProfile.
+
+With UNI_SERVER set (e.g. "127.0.0.1:8765", see `python -m cliApp.app serve`)
+the GUI talks to the enrolment server instead of opening students.data.
 """
+import argparse, os
+
+from cliApp.core import metrics
+from cliApp.net.protocol import SERVER_ENV
 from .database_manager import DatabaseManager
 from .login_window import LoginWindow
 
-def main():
-    db = DatabaseManager()
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m guiApp.app")
+    parser.add_argument("--profile", action="store_true", help="time data calls and print a report at exit")
+    parser.add_argument("--cprofile", metavar="FILE", default=None, help="also run under cProfile, stats saved to FILE")
+    args = parser.parse_args(argv)
+    if args.profile:
+        metrics.enable()
+    else:
+        metrics.enable_from_env()
+    metrics.run_profiled(run, args.cprofile)
+
+def run():
+    if os.environ.get(SERVER_ENV):
+        from cliApp.net.client import ServiceClient   # pulls in asyncio: only imported when it is used
+        db = ServiceClient.connect()
+    else:
+        db = DatabaseManager()
     app = LoginWindow(db)
     app.mainloop()
 
@@ -0,0 +1,59 @@
+import tkinter as tk
+from typing import Callable, List, Optional
+from .worker import BackgroundWorker
+
+Listener = Callable[[Optional[List[str]]], None]
+
+class ChangeWatcher:
+    """
+    Tells the open windows when students are written by anyone, the CLI in
+    another terminal included, so they can redraw what changed without being
+    asked to.
+
+    Every `interval` ms, while something is subscribed, db.changes() is asked
+    on the background worker (quietly: no progress bar) which students were
+    written since the last look; DatabaseManager answers from the store's
+    change feed, ServiceClient from the server. Each subscriber is then called
+    with the ids, or with None when it cannot be told which (take everything
+    as changed); nothing is called when nothing changed.
+    """
+
+    def __init__(self, root: tk.Misc, db, worker: BackgroundWorker, interval: int = 500):
+        self._root = root
+        self._db = db
+        self._worker = worker
+        self._interval = interval
+        self._listeners: List[Listener] = []
+        self._after: Optional[str] = None
+
+    def subscribe(self, listener: Listener) -> None:
+        self._listeners.append(listener)
+        if self._after is None:
+            self._schedule()
+
+    def unsubscribe(self, listener: Listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def close(self) -> None:
+        self._listeners.clear()
+        if self._after is not None:
+            self._root.after_cancel(self._after)
+            self._after = None
+
+    def _schedule(self) -> None:
+        self._after = self._root.after(self._interval, self._tick)
+
+    def _tick(self) -> None:
+        self._after = None
+        if not self._listeners:
+            return                       # asked again once something subscribes
+        self._worker.submit(self._db.changes, on_done=self._changed, on_error=lambda e: None,
+                            key="changes", quiet=True)
+        self._schedule()
+
+    def _changed(self, ids: Optional[List[str]]) -> None:
+        if ids is not None and not ids:
+            return
+        for listener in list(self._listeners):
+            listener(ids)
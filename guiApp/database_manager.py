@@ -1,8 +1,17 @@
 # guiApp/database_manager.py
 from __future__ import annotations
-import json, os, random
+import os, random
 from typing import Dict, List, Optional, Tuple
 
+from cliApp.core import metrics, snapshot
+from cliApp.core.events import ChangeFeed, replay, touched
+from cliApp.core.grade_view import GradeView, grade_view_for
+from cliApp.core.idalloc import IdAllocator, pick_unused
+from cliApp.core.query import Query, StudentIndex, student_index_for
+from cliApp.core.search import SearchIndex, search_index_for
+from cliApp.core.sidecar import tracked_write
+from cliApp.core.store import Signature, StaleRecordError, Store, copy_record, open_store
+
 # ----------------------------- public helpers -----------------------------
 
 def grade_from_mark(mark: int) -> str:
@@ -12,6 +21,17 @@ def grade_from_mark(mark: int) -> str:
     if mark >= 50: return "P"
     return "Z"
 
+def _update_view(view: GradeView, student: Dict) -> None:
+    marks = [int(s["mark"]) for s in student.get("subjects", [])]
+    view.update(student["id"], student.get("name", ""), marks)
+
+def _update_search(index: SearchIndex, student: Dict) -> None:
+    index.update(student["id"], student.get("name", ""), student.get("email", ""))
+
+def _update_index(index: StudentIndex, student: Dict) -> None:
+    marks = [int(s["mark"]) for s in student.get("subjects", [])]
+    index.update(student["id"], student.get("name", ""), student.get("email", ""), marks)
+
 # ------------------------------ data manager ------------------------------
 
 class DatabaseManager:
@@ -21,22 +41,56 @@ class DatabaseManager:
     students.data (list-root):
     [
       { "id": "561005", "name": "...", "email": "...", "password": "...",
-        "subjects": [ { "id": "017", "mark": 36, "grade": "Z" }, ... ] },
+        "subjects": [ { "id": "017", "mark": 36, "grade": "Z" }, ... ],
+        "rev": 3 },
       ...
     ]
 
+    "rev" counts the writes to a student (missing means 0); it lets a save
+    based on an out-of-date read be rejected instead of overwriting.
+
     Path: project_root/students.data  (project_root contains the guiApp/ folder)
+
+    Persistence goes through a cliApp.core.store.Store, chosen by the
+    UNI_STORAGE environment variable unless one is passed in; with the
+    "journal" backend a save appends one record instead of rewriting the file.
+    The CLI and this GUI may run at the same time: the store locks the data
+    file for every read and write (shared for readers, exclusive for writers).
+
+    Reads are served from a parsed copy of the file with an email index. The
+    copy is trusted only while the store's signature (mtime/size/inode of the
+    data file) is the one it was loaded at; our own writes update it in place,
+    anyone else's write makes the next read reload. cache_hits / cache_misses
+    count how reads were answered. Stores that can be queried by email
+    (sqlite) are asked directly instead. The copy comes from the startup
+    snapshot (cliApp.core.snapshot) when that still matches the data, and a
+    student's dict is only built when it is first looked up.
+
+    When the file was written by someone else, the copy is first brought up to
+    date from the store's change feed (cliApp.core.events): only the students
+    they wrote are replaced, and it is reloaded only if the feed cannot say
+    which. changes() follows the same feed for the windows to refresh live.
     """
 
-    def __init__(self, data_path: Optional[str] = None):
+    def __init__(self, data_path: Optional[str] = None, store: Optional[Store] = None):
         # Default: <project_root>/students.data, where project_root is the parent of guiApp/
         pkg_dir = os.path.dirname(os.path.abspath(__file__))   # find the folder where database_manager.py is at
         project_root = os.path.dirname(pkg_dir)                # go one level up to the main project folder
         self.path = data_path or os.path.join(project_root, "students.data") # if user provided a path, use that, other wise use project_root to store "students.data"
+        self.store = store or open_store(self.path)
+        self._cache: Optional[Dict[str, Dict]] = None   # exact email -> student, in file order
+        self._cache_ids: Optional[Dict[str, Dict]] = None   # id -> the same student dicts
+        self._cache_sig: Signature = None
+        self._feed = ChangeFeed(self.store)
+        self.cache_hits = 0
+        self.cache_misses = 0
         self._ensure_file()
+        self._watch = ChangeFeed(self.store)            # for changes(), apart from the cache's
+        self._watch_sig = self.store.signature()
 
     # ----------------------------- public API -----------------------------
     # user would login 
+    @metrics.timed("gui.authenticate")
     def authenticate(self, email: str, password: str) -> Tuple[bool, str]:
         """
         Returns (ok, code). Codes: "empty" | "no_such_student" | "bad_password" | "" (success)
@@ -53,6 +107,7 @@ class DatabaseManager:
             return False, "bad_password"
         return True, ""
 
+    @metrics.timed("gui.get_student")
     def get_student(self, email: str) -> Dict:
         """Return the student dict for an email or raise KeyError."""
         student = self._find_student_by_email(email)
@@ -62,20 +117,19 @@ class DatabaseManager:
         student.setdefault("subjects", [])
         return student
 
+    @metrics.timed("gui.save_student")
     def save_student(self, student: Dict) -> None:
         """
-        Upsert by email.
-        If a student with the same email exists, replace it; otherwise append.
+        Upsert by student id.
+        If a student with the same id exists, replace it; otherwise append.
+        Raises cliApp.core.store.StaleRecordError if the stored student changed
+        since this dict was read (its "rev" is no longer current); on success
+        student["rev"] is moved to the new revision.
         """
-        students = self._read()
-        for i, s in enumerate(students):
-            if s.get("email") == student.get("email"):
-                students[i] = student
-                self._write(students)
-                return
-        students.append(student)
-        self._write(students)
+        self._tracked(lambda: self.store.upsert(student), student,
+                      ops=[{"op": "upsert", "student": copy_record(student)}])
 
+    @metrics.timed("gui.enrol_new_subject")
     def enrol_new_subject(self, email: str) -> Dict:
         """
         Add a new subject with a unique 3-digit string id ("000".."999"),
@@ -92,9 +146,11 @@ class DatabaseManager:
         grade = grade_from_mark(mark)
         new_subject = {"id": new_id, "mark": mark, "grade": grade}
         subjects.append(new_subject)
-        self.save_student(student)
+        self._tracked(lambda: self.store.add_subject(student["id"], new_subject), student, bump=True,
+                      ops=[{"op": "add_subject", "id": student["id"], "subject": dict(new_subject)}])
         return new_subject
 
+    @metrics.timed("gui.delete_subject")
     def delete_subject(self, email: str, subject_id) -> None:
         """Delete a subject by its id (string or int accepted)."""
         student = self.get_student(email)
@@ -102,35 +158,192 @@ class DatabaseManager:
         before = len(student.get("subjects", []))
         student["subjects"] = [s for s in student.get("subjects", []) if str(s.get("id")) != sid]
         if len(student["subjects"]) != before:
-            self.save_student(student)
+            self._tracked(lambda: self.store.remove_subject(student["id"], sid), student, bump=True,
+                          ops=[{"op": "remove_subject", "id": student["id"], "subject": sid}])
+
+    @metrics.timed("gui.search")
+    def search(self, text: str, limit: int = 10) -> List[Dict]:
+        """
+        Students whose name, a word of it or email starts with `text`, then
+        near misses ("jhon" finds John): up to `limit` dicts of id, name, email.
+        """
+        index = search_index_for(self.store).ensure(self.store)
+        return [{"id": sid, "name": name, "email": email} for sid, name, email in index.search(text, limit)]
+
+    def changes(self) -> Optional[List[str]]:
+        """
+        Ids of the students written since the last call, by anyone (this
+        manager included); None when that cannot be told from the change feed
+        (the data was replaced as a whole): take everything as changed.
+        """
+        found = self._watch.since(self._watch_sig)
+        if found is None:
+            self._watch_sig = self.store.signature()
+            return None
+        ops, self._watch_sig = found
+        return touched(ops)
+
+    @metrics.timed("gui.student_page")
+    def student_page(self, start: int = 0, count: int = 100) -> Dict:
+        """
+        Students start..start+count-1 in file order, for a list that loads as it
+        scrolls: {"total": how many there are, "students": [dicts of id, name,
+        email, average (None without subjects), subjects (how many)]}. Read from
+        the student index, so a page costs the same wherever it is in the file.
+        """
+        index = student_index_for(self.store).ensure(self.store)
+        hits, total = index.select(Query(offset=max(0, start), limit=max(0, count)))
+        return {"total": total,
+                "students": [{"id": sid, "name": name, "email": email, "average": avg, "subjects": n}
+                             for sid, name, email, avg, n in hits]}
 
     # ----------------------------- internals ------------------------------
 
     def _ensure_file(self) -> None:
         """Create an empty list file if missing; otherwise leave as-is."""
-        if not os.path.exists(self.path):
-            os.makedirs(os.path.dirname(self.path), exist_ok=True)
-            self._write([])
+        self.store.ensure()
 
+    @metrics.timed("gui.read")
     def _read(self) -> List[Dict]:
-        """Always returns a list of students."""
-        with open(self.path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        # Be strict: expect a list; if not, reset to empty list.
-        return data if isinstance(data, list) else []
+        """Always returns a list of students (fresh copies)."""
+        return [copy_record(s) for s in self._cached().values()]
 
+    @metrics.timed("gui.write")
     def _write(self, students: List[Dict]) -> None:
-        """Overwrite the file with the list of students (pretty-printed)."""
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(students, f, indent=2)
+        """Replace the whole dataset."""
+        rebuild = lambda sc: sc.rebuild(students)
+        with self.store.lock.exclusive():
+            try:
+                tracked_write(self.store, lambda: self.store.save_all(students),
+                              {GradeView: rebuild, IdAllocator: rebuild, SearchIndex: rebuild,
+                               StudentIndex: rebuild})
+            except BaseException:
+                self._cache_sig = None
+                raise
+            self._fill_cache(students, self.store.signature())
+
+    @metrics.timed("gui.write")
+    def _tracked(self, write, student: Dict, bump: bool = False, ops: Optional[List[Dict]] = None) -> None:
+        """
+        Run a single-student write and update the shared grade view for it.
+        bump: the write is one the store counts as a revision without touching
+        the dict (add/remove subject), so advance student["rev"] here.
+        ops: the same write as store ops, for the change feed.
+        Written through to the read cache if nobody else wrote since it was loaded.
+        """
+        with self.store.lock.exclusive():
+            fresh = self._cache is not None and self.store.signature() == self._cache_sig
+            try:
+                tracked_write(self.store, write, {GradeView: lambda v: _update_view(v, student),
+                                                  SearchIndex: lambda x: _update_search(x, student),
+                                                  StudentIndex: lambda x: _update_index(x, student)}, ops)
+            except BaseException:
+                self._cache_sig = None
+                raise
+            if bump:
+                student["rev"] = int(student.get("rev", 0)) + 1
+            if fresh:
+                self._cache_put(student)
+                self._cache_sig = self.store.signature()
+            else:
+                self._cache_sig = None
 
     def _find_student_by_email(self, email: str) -> Optional[Dict]:
         """Exact match on email (case-sensitive)."""
-        for s in self._read():
-            if s.get("email") == email:
-                # Return a *fresh* object; callers may mutate and then call save_student
-                return s
-        return None
+        if self.store.queryable:
+            # indexed lookup; the index is case-insensitive, so confirm the exact match
+            s = self.store.find_by_email(email)
+            return s if s is not None and s.get("email") == email else None
+        s = self._cached().get(email)
+        # Return a *fresh* object; callers may mutate and then call save_student
+        return copy_record(s) if s is not None else None
+
+    # ---- read cache ----
+
+    def _cached(self) -> Dict[str, Dict]:
+        """The parsed dataset keyed by email, reloaded if the file changed since."""
+        sig = self.store.signature()
+        if self._cache is not None and sig == self._cache_sig:
+            self.cache_hits += 1
+            metrics.count("gui.cache_hits")
+            return self._cache
+        if self._cache is not None and self._catch_up():
+            metrics.count("gui.cache_caught_up")
+            return self._cache
+        self.cache_misses += 1
+        metrics.count("gui.cache_misses")
+        with self.store.lock.shared(), metrics.span("gui.load"):
+            # signature and contents taken under one lock, so they belong together
+            if snapshot.enabled(self.store):
+                image, self._cache_sig = snapshot.image_for(self.store)
+                rows = snapshot.Built(image.record)
+                self._cache = snapshot.LazyIndex(image.emails, lambda e: image.find_email(e, exact=True),
+                                                 rows, first_wins=True)
+                self._cache_ids = snapshot.LazyIndex(image.ids, image.find_id, rows)
+            else:
+                sig = self.store.signature()
+                self._fill_cache(self.store.load_all(), sig)
+        return self._cache
+
+    def _fill_cache(self, students: List[Dict], sig: Signature) -> None:
+        self._cache, self._cache_ids = {}, {}
+        for s in students:
+            s = copy_record(s)
+            self._cache.setdefault(s.get("email", ""), s)  # first match wins, as before
+            self._cache_ids[s.get("id")] = s
+        self._cache_sig = sig
+
+    def _cache_put(self, student: Dict) -> None:
+        # replace by id (the email may have changed), keeping file order
+        record = copy_record(student)
+        old = self._cache_ids.get(student.get("id"))
+        if old is not None:
+            same = self._cache.get(old.get("email", ""))
+            if same is not None and same.get("id") == record.get("id"):
+                if old.get("email", "") == record.get("email", ""):
+                    self._cache[record.get("email", "")] = record
+                    self._cache_ids[record.get("id")] = record
+                    return
+                del self._cache[old.get("email", "")]
+        self._cache.setdefault(record.get("email", ""), record)
+        self._cache_ids[record.get("id")] = record
+
+    def _cache_drop(self, sid: str) -> None:
+        old = self._cache_ids.pop(sid, None)
+        if old is not None:
+            same = self._cache.get(old.get("email", ""))
+            if same is not None and same.get("id") == sid:
+                del self._cache[old.get("email", "")]
+
+    def _catch_up(self) -> bool:
+        """
+        Replay onto the copy what others wrote since it was loaded (from the
+        change feed); False if the feed cannot tell, and it is reloaded instead.
+        """
+        found = self._feed.since(self._cache_sig)
+        if found is None:
+            return False
+        ops, sig = found
+        ids = touched(ops)
+        if ids is None:
+            return False
+        records = {sid: copy_record(self._cache_ids[sid]) for sid in ids if sid in self._cache_ids}
+        try:
+            replay(records, ops)
+        except StaleRecordError:
+            return False
+        for sid in ids:
+            if sid in records:
+                self._cache_put(records[sid])
+            else:
+                self._cache_drop(sid)
+        self._cache_sig = sig
+        return True
+
+    @property
+    def grades(self) -> GradeView:
+        """Grade/pass-fail aggregate for admin reports, rebuilt first if stale."""
+        return grade_view_for(self.store).ensure(self.store)
 
     # ---- subject ID generation (3-digit strings "000".."999") ----
 
@@ -142,7 +355,7 @@ class DatabaseManager:
         return {str(s.get("id")).zfill(3) for s in subjects if s.get("id") is not None and str(s.get("id")).isdigit()}
 
     def _random_subject_id(self, subjects: List[Dict]) -> str:
-        """Pick an unused 3-digit id. Try random picks; fallback to linear."""
+        """Pick an unused 3-digit id with a single random draw over the free ids."""
         used = self._used_ids(subjects)
         # If saturated (unlikely), grow beyond 999 linearly.
         if len(used) >= 1000:
@@ -150,16 +363,4 @@ class DatabaseManager:
             while self._format_id(n) in used:
                 n += 1
             return self._format_id(n)
-
-        # Try random first for nicer distribution
-        for _ in range(1000):
-            n = random.randint(0, 999)
-            cand = self._format_id(n)
-            if cand not in used:
-                return cand
-
-        # Fallback: linear probe
-        n = 0
-        while self._format_id(n) in used:
-            n += 1
-        return self._format_id(n)
+        return self._format_id(pick_unused((int(u) for u in used), 0, 999))
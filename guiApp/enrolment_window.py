@@ -1,14 +1,21 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from .change_watcher import ChangeWatcher
 from .database_manager import DatabaseManager
 from .subject_popup import SubjectPopup
+from .views import KeyedRows
+from .worker import BackgroundWorker
 
 class EnrolmentWindow(tk.Toplevel):
-    def __init__(self, parent, db: DatabaseManager, email: str, on_back):
+    def __init__(self, parent, db: DatabaseManager, email: str, on_back, worker: BackgroundWorker = None,
+                 changes: ChangeWatcher = None):
         super().__init__(parent)
         self.db = db
         self.email = email
         self.on_back = on_back
+        self.worker = worker or BackgroundWorker(self)
+        self.changes = changes
+        self._student_id = None    # known once the first refresh is back
 
         self.title("enrolment")
         self.geometry("720x520")
@@ -19,55 +26,114 @@ class EnrolmentWindow(tk.Toplevel):
 
         self.list_frame = ttk.Frame(self, padding=4)
         self.list_frame.grid(row=1, column=0, columnspan=3, sticky="nsew", pady=(8, 8))
+        self.list_frame.grid_columnconfigure(0, weight=1)
+        # one row per subject, kept by subject id: a refresh only touches the rows that changed
+        self.rows = KeyedRows(self.list_frame, key=lambda s: str(s.get("id")),
+                              make=self._make_row, refresh=self._refresh_row, sticky="ew", pady=6)
         self.grid_rowconfigure(1, weight=1); self.grid_columnconfigure(1, weight=1)
 
-        ttk.Button(self, text="enrol", command=self._enrol_one, width=18).grid(row=2, column=1, pady=(8, 0))
+        self.enrol_button = ttk.Button(self, text="enrol", command=self._enrol_one, width=18)
+        self.enrol_button.grid(row=2, column=1, pady=(8, 0))
+
+        # progress bar, shown only while data calls are running in the background
+        self.progress = ttk.Progressbar(self, mode="indeterminate", length=160)
+        self.worker.watch(self._show_busy)
 
         self._refresh_list()
+        if self.changes is not None:
+            self.changes.subscribe(self._on_changes)   # redrawn when someone else writes this student
         self.protocol("WM_DELETE_WINDOW", self._back) # upon clicking the "X" button, call self.back()
 
     def _back(self):
+        if self.changes is not None:
+            self.changes.unsubscribe(self._on_changes)
+        self.worker.unwatch(self._show_busy)
         self.destroy()
         if callable(self.on_back):
             self.on_back()
 
+    def _show_busy(self, busy: bool):
+        if busy:
+            self.progress.grid(row=3, column=1, pady=(8, 0))
+            self.progress.start(12)
+        else:
+            self.progress.stop()
+            self.progress.grid_remove()
+
     def _enrol_one(self):
-        try:
-            _ = self.db.enrol_new_subject(self.email)
+        self.enrol_button.state(["disabled"])  # one enrolment at a time: until this one is back
+        self.worker.submit(lambda: self.db.enrol_new_subject(self.email),
+                           on_done=lambda _: self._enrol_finished(None),
+                           on_error=self._enrol_finished)
+
+    def _enrol_finished(self, error):
+        if not self.winfo_exists():
+            return
+        self.enrol_button.state(["!disabled"])
+        if error is None:
             self._refresh_list()
-        except ValueError as e:
-            if str(e) == "limit_reached":
-                self._popup_error("each student can only enrol in 4 subject maximum")
-            else:
-                self._popup_error("unknown error while enrolling")
+        elif isinstance(error, ValueError) and str(error) == "limit_reached":
+            self._popup_error("each student can only enrol in 4 subject maximum")
+        else:
+            self._popup_error("unknown error while enrolling")
 
     def _popup_error(self, message: str):
+        if not self.winfo_exists():
+            return  # answer arrived after the window was closed
         messagebox.showerror("error", message, parent=self)
 
     def _refresh_list(self):
-        for w in self.list_frame.winfo_children():
-            w.destroy()
-
-        student = self.db.get_student(self.email)
-        subjects = student.get("subjects", [])
-
-        for row, s in enumerate(subjects):
-            row_frame = ttk.Frame(self.list_frame, padding=6)
-            row_frame.grid(row=row, column=0, sticky="ew", pady=6)
-            self.list_frame.grid_columnconfigure(0, weight=1)
-
-            subj_id_str = str(s.get("id")) if s.get("id") is not None else "?"
-            ttk.Button(row_frame, text=f"Subject-{subj_id_str}",
-                       command=lambda subj=s: self._open_subject(subj)
-                       ).pack(side="left", padx=(0, 10))
+        # coalesced: refreshes asked for while one is still queued share its single read
+        self.worker.submit(lambda: self.db.get_student(self.email), on_done=self._show_subjects,
+                           on_error=self._refresh_failed, key="refresh:" + self.email)
+
+    def _refresh_failed(self, error):
+        if not self.winfo_exists():
+            return
+        if isinstance(error, KeyError):
+            # removed (by an admin in the CLI, say) while this window was open
+            messagebox.showinfo("removed", "this student no longer exists", parent=self)
+            self._back()
+            return
+        self._popup_error("could not load your subjects")
+
+    def _on_changes(self, ids):
+        # ids None: could be anyone
+        if ids is None or self._student_id is None or self._student_id in ids:
+            self._refresh_list()
 
-            ttk.Button(row_frame, text="🗑", width=3,
-                       command=lambda sid=subj_id_str: self._delete_subject(sid)
-                       ).pack(side="right")
+    def _show_subjects(self, student: dict):
+        if not self.winfo_exists():
+            return
+        self._student_id = student.get("id")
+        self.rows.update(student.get("subjects", []))
+
+    def _make_row(self, parent, subject: dict):
+        row = ttk.Frame(parent, padding=6)
+        row.subject = ttk.Button(row, text="")
+        row.subject.pack(side="left", padx=(0, 10))
+        row.trash = ttk.Button(row, text="🗑", width=3)
+        row.trash.pack(side="right")
+        self._refresh_row(row, subject)
+        return row
+
+    def _refresh_row(self, row, subject: dict):
+        subj_id_str = str(subject.get("id")) if subject.get("id") is not None else "?"
+        row.subject.configure(text=f"Subject-{subj_id_str}", command=lambda subj=dict(subject): self._open_subject(subj))
+        row.trash.configure(command=lambda sid=subj_id_str, btn=row.trash: self._delete_subject(sid, btn))
+        row.trash.state(["!disabled"])
 
     def _open_subject(self, subject: dict):
         SubjectPopup(self, subject)
 
-    def _delete_subject(self, subject_id: str):
-        self.db.delete_subject(self.email, subject_id)
-        self._refresh_list()
+    def _delete_subject(self, subject_id: str, button: ttk.Button = None):
+        if button is not None:
+            button.state(["disabled"])  # until the list is redrawn without this subject
+        self.worker.submit(lambda: self.db.delete_subject(self.email, subject_id),
+                           on_done=lambda _: self._refresh_list(),
+                           on_error=lambda e: self._delete_failed(button))
+
+    def _delete_failed(self, button: ttk.Button = None):
+        if button is not None and self.winfo_exists():
+            button.state(["!disabled"])  # the subject is still there: let it be tried again
+        self._popup_error("unknown error while deleting")
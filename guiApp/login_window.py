@@ -1,15 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+from .admin_window import AdminWindow, admin_sign_in
+from .change_watcher import ChangeWatcher
 from .database_manager import DatabaseManager
 from .enrolment_window import EnrolmentWindow
+from .worker import BackgroundWorker
 
 class LoginWindow(tk.Tk):
     def __init__(self, db: DatabaseManager):
         super().__init__()
         self.db = db
+        self.worker = BackgroundWorker(self)  # every data call runs off the Tk thread
+        self.changes = ChangeWatcher(self, db, self.worker)  # writes made elsewhere, for the open windows
 
         self.title("login")
-        self.geometry("820x500")
+        self.geometry("820x680")
         self.resizable(False, False)# x and y resizing disabled
         self.configure(padx=28, pady=28)# add outer padding inside window around everything
 
@@ -33,7 +38,15 @@ class LoginWindow(tk.Tk):
         self.pw_entry.grid(row=2, column=1, columnspan=2, sticky="w")
 
         # Login button
-        ttk.Button(self, text="login!", command=self._handle_login, width=22).grid(row=3, column=1, pady=(24, 0))
+        self.login_btn = ttk.Button(self, text="login!", command=self._handle_login, width=22)
+        self.login_btn.grid(row=3, column=1, pady=(24, 0))
+
+        # shown while the sign-in check runs
+        self.progress = ttk.Progressbar(self, mode="indeterminate", length=180)
+
+        # admin tools (student lookup, every student) behind their own password
+        ttk.Button(self, text="admin", command=self._open_admin).grid(row=5, column=1, sticky="w", pady=(24, 0))
+        self.admin_window = None  # type: AdminWindow|None
 
         # key bindings
         self.bind("<Return>", lambda e: self._handle_login())
@@ -42,16 +55,27 @@ class LoginWindow(tk.Tk):
         self.grid_columnconfigure(1, weight=1)
 
         self.enrol_window = None  # type: EnrolmentWindow|None
+        self._checking = False
 
     # --------------- actions ---------------
     def _exit_app(self):
+        self.changes.close()
+        self.worker.close()
         self.destroy()
 
     def _handle_login(self):
+        if self._checking:
+            return  # a sign-in is already being checked
         email = self.email_var.get().strip()
         pw = self.pw_var.get().strip()
 
-        ok, reason = self.db.authenticate(email, pw)
+        self._set_busy(True)
+        self.worker.submit(lambda: self.db.authenticate(email, pw),
+                           on_done=lambda result: self._login_checked(email, *result),
+                           on_error=self._login_failed)
+
+    def _login_checked(self, email: str, ok: bool, reason: str):
+        self._set_busy(False)
         if not ok:
             if reason == "empty":
                 self._popup_error("email or password is empty")
@@ -65,7 +89,30 @@ class LoginWindow(tk.Tk):
 
         # success → open enrolment and hide login window
         self.withdraw()
-        self.enrol_window = EnrolmentWindow(self, self.db, email, on_back=self._back_from_enrolment)
+        self.enrol_window = EnrolmentWindow(self, self.db, email, on_back=self._back_from_enrolment,
+                                            worker=self.worker, changes=self.changes)
+
+    def _login_failed(self, error: BaseException):
+        self._set_busy(False)
+        self._popup_error("Unknown error")
+
+    def _set_busy(self, busy: bool):
+        # disable the button and show progress while the worker checks the credentials
+        self._checking = busy
+        self.login_btn.state(["disabled"] if busy else ["!disabled"])
+        if busy:
+            self.progress.grid(row=4, column=1, pady=(12, 0))
+            self.progress.start(12)
+        else:
+            self.progress.stop()
+            self.progress.grid_remove()
+
+    def _open_admin(self):
+        if self.admin_window is not None and self.admin_window.winfo_exists():
+            self.admin_window.lift()
+            return
+        if admin_sign_in(self):
+            self.admin_window = AdminWindow(self, self.db, self.worker, changes=self.changes)
 
     def _back_from_enrolment(self):
         # called by enrolment window when back
@@ -0,0 +1,71 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Dict, List, Tuple
+from .change_watcher import ChangeWatcher
+from .database_manager import DatabaseManager
+from .views import VirtualList
+from .worker import BackgroundWorker
+
+class StudentListWindow(tk.Toplevel):
+    """
+    Every student, in file order, in a list that only reads the pages being
+    looked at: opening it for a million students costs one page. Clicking a
+    student passes their email to on_pick, if given. Opened from the admin window.
+    With a ChangeWatcher it reloads what is in view whenever students are
+    written elsewhere.
+    """
+
+    def __init__(self, parent, db: DatabaseManager, worker: BackgroundWorker, on_pick=None,
+                 changes: ChangeWatcher = None):
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.on_pick = on_pick
+        self.changes = changes
+
+        self.title("students")
+        self.geometry("720x560")
+        self.configure(padx=20, pady=20)
+
+        ttk.Label(self, text="students", font=("Arial", 22, "bold")).grid(row=0, column=0, pady=(0, 10))
+        self.count_label = ttk.Label(self, text="")
+        self.count_label.grid(row=0, column=1, sticky="e")
+        ttk.Button(self, text="refresh", command=self.refresh).grid(row=0, column=2, sticky="e", padx=(10, 0))
+
+        self.list = VirtualList(self, worker, load=self._load, text=self._text, on_pick=self._pick, rows=20)
+        self.list.grid(row=1, column=0, columnspan=3, sticky="nsew")
+        self.list.bind("<<PageLoaded>>", lambda e: self._show_count())
+        self.grid_rowconfigure(1, weight=1); self.grid_columnconfigure(0, weight=1)
+
+        self.refresh()
+        if self.changes is not None:
+            self.changes.subscribe(self._on_changes)
+        self.protocol("WM_DELETE_WINDOW", self._close)
+
+    def _close(self):
+        if self.changes is not None:
+            self.changes.unsubscribe(self._on_changes)
+        self.destroy()
+
+    def _on_changes(self, ids):
+        self.list.refresh()   # only the page in view is read again
+
+    def refresh(self):
+        self.list.refresh()
+
+    def _load(self, start: int, count: int) -> Tuple[int, List[Dict]]:
+        # runs on the worker thread
+        page = self.db.student_page(start, count)
+        return page["total"], page["students"]
+
+    @staticmethod
+    def _text(s: Dict) -> str:
+        avg = f"{s['average']:.2f}" if s.get("average") is not None else "-"
+        return f"{s['name']} :: {s['id']} --> {s['email']}   ({s['subjects']} subjects, average {avg})"
+
+    def _show_count(self):
+        self.count_label.configure(text=f"{self.list.total} students")
+
+    def _pick(self, s: Dict):
+        if callable(self.on_pick):
+            self.on_pick(s["email"])
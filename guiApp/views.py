@@ -0,0 +1,195 @@
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from .worker import BackgroundWorker
+
+class KeyedRows:
+    """
+    The rows of a short list (a student's subjects), kept in step with the data
+    by key instead of being rebuilt: update(items) makes rows for new keys,
+    destroys the rows of keys that are gone and calls refresh(row, item) only
+    for items that changed. Rows are re-gridded only when their order changed.
+
+    make(parent, item) builds a row widget (it is gridded here, with `grid`
+    options); refresh(row, item) brings an existing row up to date.
+    """
+
+    def __init__(self, parent: tk.Misc, key: Callable[[Any], Hashable], make: Callable[[tk.Misc, Any], tk.Widget],
+                 refresh: Callable[[tk.Widget, Any], None], **grid):
+        self.parent = parent
+        self._key = key
+        self._make = make
+        self._refresh = refresh
+        self._grid = grid
+        self._rows: Dict[Hashable, Tuple[tk.Widget, Any]] = {}   # key -> (row, item it shows)
+        self._order: List[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def row(self, key: Hashable) -> Optional[tk.Widget]:
+        entry = self._rows.get(key)
+        return entry[0] if entry is not None else None
+
+    def update(self, items: Iterable[Any]) -> None:
+        wanted: Dict[Hashable, Any] = {}
+        for item in items:
+            wanted.setdefault(self._key(item), item)   # first of a repeated key wins
+        for key in [k for k in self._rows if k not in wanted]:
+            self._rows.pop(key)[0].destroy()
+        for key, item in wanted.items():
+            entry = self._rows.get(key)
+            if entry is None:
+                self._rows[key] = (self._make(self.parent, item), _copy(item))
+            elif entry[1] != item:
+                self._refresh(entry[0], item)
+                self._rows[key] = (entry[0], _copy(item))
+        order = list(wanted)
+        if order != self._order:
+            for i, key in enumerate(order):
+                self._rows[key][0].grid(row=i, column=0, **self._grid)
+            self._order = order
+
+def _copy(item: Any) -> Any:
+    # what a row shows, kept apart from the caller's (mutable) dict to compare against next time
+    return dict(item) if isinstance(item, dict) else item
+
+class VirtualList(ttk.Frame):
+    """
+    A scrolling list over any number of items, drawn with a fixed pool of
+    `rows` labels that are relabelled as it scrolls: a redraw costs the same
+    for ten students or a million, and a label is only touched when its text
+    changes.
+
+    Items come from load(start, count) -> (total, [item, ...]), run on the
+    background worker a page at a time as pages come into view (pages scrolled
+    past before their turn are skipped); up to max_pages are kept, the least
+    recently shown dropped first. text(item) is what a row shows, and
+    on_pick(item) is called when one is clicked; <<PageLoaded>> is generated
+    after each page arrives. refresh() forgets every page and reloads what is
+    in view, e.g. after a write.
+    """
+
+    def __init__(self, parent: tk.Misc, worker: BackgroundWorker,
+                 load: Callable[[int, int], Tuple[int, List[Any]]], text: Callable[[Any], str],
+                 on_pick: Optional[Callable[[Any], None]] = None,
+                 rows: int = 20, page: int = 100, max_pages: int = 50):
+        super().__init__(parent)
+        self._worker = worker
+        self._load = load
+        self._text = text
+        self._on_pick = on_pick
+        self._page = page
+        self._max_pages = max_pages
+        self._pages: "OrderedDict[int, List[Any]]" = OrderedDict()   # page number -> items, least recent first
+        self._loading: Set[int] = set()
+        self._generation = 0       # bumped by refresh(); pages loaded before it are dropped
+        self._total = 0
+        self._top = 0              # index of the first item in view
+        self._shown: List[Optional[str]] = [None] * rows
+
+        self._labels = [ttk.Label(self, anchor="w", padding=(6, 2)) for _ in range(rows)]
+        for i, label in enumerate(self._labels):
+            label.grid(row=i, column=0, sticky="ew")
+            label.bind("<Button-1>", lambda e, i=i: self._pick(i))
+        self._bar = ttk.Scrollbar(self, orient="vertical", command=self._scroll)
+        self._bar.grid(row=0, column=1, rowspan=rows, sticky="ns")
+        self.grid_columnconfigure(0, weight=1)
+        for widget in [self] + self._labels:
+            widget.bind("<MouseWheel>", self._wheel)                     # Windows, macOS
+            widget.bind("<Button-4>", lambda e: self.scroll_to(self._top - 3))   # X11
+            widget.bind("<Button-5>", lambda e: self.scroll_to(self._top + 3))
+
+    # ----------------------------- public API -----------------------------
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def refresh(self) -> None:
+        self._generation += 1
+        self._pages.clear()
+        self._loading.clear()
+        self._request(self._top // self._page)
+
+    def scroll_to(self, top: int) -> None:
+        top = max(0, min(top, self._total - len(self._labels)))
+        if top != self._top:
+            self._top = top
+            self._draw()
+
+    # ----------------------------- internals ------------------------------
+
+    def _draw(self) -> None:
+        missing = set()
+        for i, label in enumerate(self._labels):
+            n = self._top + i
+            if n >= self._total:
+                text = ""
+            else:
+                items = self._pages.get(n // self._page)
+                if items is None:
+                    missing.add(n // self._page)
+                    text = "…"
+                else:
+                    self._pages.move_to_end(n // self._page)
+                    text = self._text(items[n % self._page]) if n % self._page < len(items) else ""
+            if text != self._shown[i]:
+                label.configure(text=text)
+                self._shown[i] = text
+        rows = len(self._labels)
+        if self._total > rows:
+            self._bar.set(self._top / self._total, (self._top + rows) / self._total)
+        else:
+            self._bar.set(0.0, 1.0)
+        for p in sorted(missing):
+            self._request(p)
+
+    def _in_view(self, p: int) -> bool:
+        # read from the worker thread: plain ints, no Tk calls
+        first, last = self._top // self._page, (self._top + len(self._labels) - 1) // self._page
+        return first <= p <= last
+
+    def _request(self, p: int) -> None:
+        if p in self._loading:
+            return
+        self._loading.add(p)
+        gen = self._generation
+        self._worker.submit(lambda: self._load(p * self._page, self._page) if self._in_view(p) else None,
+                            on_done=lambda result: self._loaded(gen, p, result),
+                            on_error=lambda e: self._loaded(gen, p, None, failed=True))
+
+    def _loaded(self, gen: int, p: int, result: Optional[Tuple[int, List[Any]]], failed: bool = False) -> None:
+        if gen != self._generation or not self.winfo_exists():
+            return
+        self._loading.discard(p)
+        if result is None:
+            # skipped as out of view: ask again if it has come back since (a failure waits for the next scroll)
+            if not failed and self._in_view(p):
+                self._request(p)
+            return
+        self._total, self._pages[p] = result
+        while len(self._pages) > self._max_pages:
+            self._pages.popitem(last=False)
+        self._top = max(0, min(self._top, self._total - len(self._labels)))
+        self._draw()
+        self.event_generate("<<PageLoaded>>")
+
+    def _scroll(self, *args) -> None:
+        # the scrollbar's command: ("moveto", fraction) or ("scroll", n, "units"|"pages")
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self._total))
+        elif args[0] == "scroll":
+            step = len(self._labels) if args[2] == "pages" else 1
+            self.scroll_to(self._top + int(args[1]) * step)
+
+    def _wheel(self, event) -> None:
+        self.scroll_to(self._top - (3 if event.delta > 0 else -3))
+
+    def _pick(self, i: int) -> None:
+        n = self._top + i
+        items = self._pages.get(n // self._page)
+        if self._on_pick is not None and items is not None and n % self._page < len(items):
+            self._on_pick(items[n % self._page])
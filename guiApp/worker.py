@@ -0,0 +1,142 @@
+import queue, threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+class _Job:
+    __slots__ = ("fn", "on_done", "on_error", "key", "merged", "quiet")
+
+    def __init__(self, fn, on_done, on_error, key, quiet=False):
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.key = key
+        self.merged = 0
+        self.quiet = quiet
+
+class BackgroundWorker:
+    """
+    Runs data calls (DatabaseManager or ServiceClient) off the Tk event loop.
+
+    Jobs run on a single background thread, one at a time and in order, so the
+    data manager is never used from two threads at once and a refresh queued
+    after a write sees that write. Results travel back through a queue that the
+    Tk thread polls with after(); on_done/on_error always run on the Tk thread.
+
+    submit(..., key="x") coalesces: while a job with the same key is queued but
+    not started yet, submitting again does not queue another one, it only
+    replaces the callbacks of the waiting job. Ten refresh requests made while
+    a write is running therefore cost a single read.
+
+    watch(callback) is told busy=True/False when work starts and when the last
+    outstanding job has been delivered (for progress bars and button states).
+    Jobs submitted with quiet=True (background polling) do not count as busy.
+    """
+
+    def __init__(self, root: tk.Misc, poll_ms: int = 20):
+        self._root = root
+        self._poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui-data")
+        self._results: "queue.Queue" = queue.Queue()
+        self._waiting: Dict[str, _Job] = {}     # key -> job not picked up by the thread yet
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._loud = 0                          # outstanding jobs that are not quiet
+        self._watchers: List[Callable[[bool], None]] = []
+        self._polling = False
+        self._closed = False
+
+    # ----------------------------- public API -----------------------------
+
+    def submit(self, fn: Callable[[], Any], on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None, key: Optional[str] = None,
+               quiet: bool = False) -> bool:
+        """
+        Queue fn() for the background thread. Returns False if it was merged
+        into a waiting job with the same key instead of being queued.
+        """
+        if self._closed:
+            return False
+        with self._lock:
+            waiting = self._waiting.get(key) if key is not None else None
+            if waiting is not None:
+                waiting.fn, waiting.on_done, waiting.on_error = fn, on_done, on_error
+                waiting.merged += 1
+                return False
+            job = _Job(fn, on_done, on_error, key, quiet)
+            if key is not None:
+                self._waiting[key] = job
+        self._outstanding += 1
+        if not quiet:
+            self._loud += 1
+            if self._loud == 1:
+                self._notify(True)
+        self._pool.submit(self._run, job)
+        self._schedule_poll()
+        return True
+
+    @property
+    def busy(self) -> bool:
+        return self._loud > 0
+
+    def watch(self, callback: Callable[[bool], None]) -> None:
+        self._watchers.append(callback)
+
+    def unwatch(self, callback: Callable[[bool], None]) -> None:
+        if callback in self._watchers:
+            self._watchers.remove(callback)
+
+    def close(self) -> None:
+        """Stop accepting work; jobs already running are allowed to finish."""
+        self._closed = True
+        self._watchers.clear()
+        self._pool.shutdown(wait=False)
+
+    # ----------------------------- internals ------------------------------
+
+    def _run(self, job: _Job) -> None:
+        # background thread
+        with self._lock:
+            if job.key is not None and self._waiting.get(job.key) is job:
+                del self._waiting[job.key]
+            fn = job.fn
+        try:
+            self._results.put((job, True, fn()))
+        except BaseException as e:
+            self._results.put((job, False, e))
+
+    def _schedule_poll(self) -> None:
+        if self._polling or self._closed:
+            return
+        try:
+            self._root.after(self._poll_ms, self._poll)
+            self._polling = True
+        except tk.TclError:
+            pass                                   # window already gone
+
+    def _poll(self) -> None:
+        # Tk thread: deliver every finished job, keep polling while work is outstanding
+        self._polling = False
+        delivered = False                          # a job that counted as busy
+        while True:
+            try:
+                job, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._outstanding -= 1
+            if not job.quiet:
+                self._loud -= 1
+                delivered = True
+            callback = job.on_done if ok else job.on_error
+            if callback is not None:
+                callback(value)
+            elif not ok:
+                self._root.report_callback_exception(type(value), value, value.__traceback__)
+        if self._outstanding:
+            self._schedule_poll()
+        if delivered and not self._loud:
+            self._notify(False)
+
+    def _notify(self, busy: bool) -> None:
+        for cb in list(self._watchers):
+            cb(busy)
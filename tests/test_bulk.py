@@ -0,0 +1,66 @@
+import os, shutil, tempfile, unittest
+
+from cliApp.core.bulk import import_students
+from cliApp.core.db import Database
+from cliApp.core.idalloc import IdAllocator
+from cliApp.core.sidecar import _open, sidecar_for
+from cliApp.core.store import open_store
+
+CSV = """id,name,email,password,subjects
+,,ann.lee@university.com,Abcdef123,017:36;102:88
+654321,Bo Chan,bo.chan@university.com,Abcdef123,
+,,not-an-email,Abcdef123,
+,,cy.dee@university.com,abc,
+,,ANN.LEE@university.com,Abcdef123,
+,,dan.eve@university.com,Abcdef123,017:101
+,,eli.fox@university.com,Abcdef123,17a:50
+,,fay.gil@university.com,Abcdef123,017:50;017:60
+,,guy.hal@university.com,Abcdef123,001:50;002:50;003:50;004:50;005:50
+,,ivy.jon@university.com,Abcdef123,017:fifty
+,,kim.lam@university.com,Abcdef123,001:50;002:60;003:70;004:80
+"""
+
+class ImportTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = open_store(os.path.join(self.folder, "students.data"), "json")
+        Database.use(self.store)
+        self.csv = os.path.join(self.folder, "students.csv")
+        with open(self.csv, "w", encoding="utf-8") as f:
+            f.write(CSV)
+
+    def tearDown(self):
+        for key in [k for k in _open if k[1].startswith(self.folder)]:
+            _open.pop(key).flush()            # before the folder goes, not at exit
+        self.store.close()
+        Database._store = None
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_rejection_reasons(self):
+        res = import_students(self.csv)
+        self.assertEqual(res.imported, 3)
+        self.assertEqual(res.rejected, {"bad email": 1, "bad password": 1, "duplicate email": 1, "bad mark": 1,
+                                        "bad subject id": 1, "duplicate subject": 1, "more than 4 subjects": 1,
+                                        "bad subjects": 1})
+        stored = {r["email"]: r for r in self.store.load_all()}
+        self.assertEqual(sorted(stored), ["ann.lee@university.com", "bo.chan@university.com", "kim.lam@university.com"])
+        self.assertEqual(stored["bo.chan@university.com"]["id"], "654321")
+        self.assertEqual(stored["ann.lee@university.com"]["name"], "Ann Lee")
+        self.assertEqual(stored["ann.lee@university.com"]["subjects"],
+                         [{"id": "017", "mark": 36, "grade": "Z"}, {"id": "102", "mark": 88, "grade": "HD"}])
+
+        # emails already stored count as duplicates on the next import
+        again = import_students(self.csv)
+        self.assertEqual(again.imported, 0)
+        self.assertEqual(again.rejected["duplicate email"], 4)
+
+    def test_failed_batch_frees_its_ids(self):
+        def fail(records):
+            raise OSError("disk full")
+        self.store.upsert_many = fail
+        with self.assertRaises(OSError):
+            import_students(self.csv)
+        self.assertEqual(len(sidecar_for(IdAllocator, self.store)), 0)
+
+if __name__ == "__main__":
+    unittest.main()
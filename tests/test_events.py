@@ -0,0 +1,67 @@
+import os, shutil, tempfile, unittest
+from unittest import mock
+
+from cliApp.core import events
+from cliApp.core.events import ChangeFeed, replay
+from cliApp.core.sidecar import tracked_write
+from cliApp.core.store import copy_record, open_store
+
+def student(n, name=None):
+    return {"id": f"{100000 + n}", "name": name or f"Student{n}", "email": f"student{n}@university.com",
+            "password": "Abcdef123", "subjects": []}
+
+class ChangeFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.store = open_store(os.path.join(self.folder, "students.data"), "json")
+        self.store.ensure()
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def _upsert(self, record, logged=True):
+        ops = [{"op": "upsert", "student": copy_record(record)}] if logged else None
+        tracked_write(self.store, lambda: self.store.upsert(record), ops=ops)
+
+    def _copy(self):
+        return {r["id"]: r for r in self.store.load_all()}
+
+    def test_catches_a_copy_up(self):
+        feed = ChangeFeed(self.store)
+        copy, sig = self._copy(), self.store.signature()
+        self.assertEqual(feed.since(sig), ([], sig))
+
+        first, second = student(1), student(2)
+        self._upsert(first)
+        self._upsert(second)
+        first["name"] = "Renamed"
+        self._upsert(first)
+        ops, now = feed.since(sig)
+        self.assertEqual(events.touched(ops), ["100001", "100002"])
+        replay(copy, ops)
+        self.assertEqual(copy, self._copy())
+        self.assertEqual(now, self.store.signature())
+
+        # a write that was not logged breaks the chain: the copy has to be read again
+        self._upsert(student(3), logged=False)
+        self.assertIsNone(feed.since(now))
+
+    def test_catches_up_across_a_log_restart(self):
+        feed = ChangeFeed(self.store)
+        start = self.store.signature()
+        self._upsert(student(1))
+        copy, sig = self._copy(), self.store.signature()
+        feed.since(start)                        # the feed now reads on from the end of the first log
+
+        with mock.patch.object(events, "LOG_BYTES", 1):
+            self._upsert(student(2))             # starts the log afresh
+        ops, now = feed.since(sig)
+        replay(copy, ops)
+        self.assertEqual(copy, self._copy())
+        self.assertEqual(now, self.store.signature())
+        # the write before the restart is no longer in the log
+        self.assertIsNone(feed.since(start))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import os, shutil, tempfile, unittest
+
+from cliApp.core.grade_view import GradeView
+
+# records the packed subject columns (models.SubjectTable) cannot hold
+ODD = [
+    {"id": "100001", "name": "Low", "email": "low@university.com", "password": "Abcdef123",
+     "subjects": [{"id": "001", "mark": -5, "grade": "Z"}, {"id": "002", "mark": 60, "grade": "P"}]},
+    {"id": "100002", "name": "High", "email": "high@university.com", "password": "Abcdef123",
+     "subjects": [{"id": "x17", "mark": 70000, "grade": "HD"}]},
+    {"id": "100003", "name": "Plain", "email": "plain@university.com", "password": "Abcdef123",
+     "subjects": [{"id": "003", "mark": 80, "grade": "D"}]},
+    {"id": "100004", "name": "None", "email": "none@university.com", "password": "Abcdef123", "subjects": []},
+]
+
+class GradeViewRebuildTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_rebuild_over_records_the_columns_cannot_hold(self):
+        view = GradeView(os.path.join(self.folder, "students.data.grades"))
+        view.rebuild(ODD)
+        grades = {k: [row[0] for row in rows] for k, rows in view.by_grade().items()}
+        self.assertEqual(grades["Z"], ["100001"])
+        self.assertEqual(grades["HD"], ["100002"])
+        self.assertEqual(grades["D"], ["100003"])
+        self.assertEqual(grades["N/A"], ["100004"])
+        self.assertEqual(view.by_grade()["Z"][0][2], 27.5)
+        self.assertEqual(view.verify(ODD), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os, shutil, tempfile, unittest
+
+from cliApp.core.idalloc import PERSIST_IDS, IdAllocator
+
+class IdAllocatorTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "students.data.ids")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def _synced(self, records):
+        alloc = IdAllocator(self.path)
+        alloc.rebuild(records)
+        alloc._synced, alloc._dirty = "stamp", True       # as ensure() leaves it
+        return alloc
+
+    def test_ids_are_unique_and_released_ids_come_back(self):
+        alloc = IdAllocator(self.path, max_width=6)
+        ids = alloc.allocate_many(2000)
+        self.assertEqual(len(set(ids)), 2000)
+        self.assertTrue(all(len(s) == 6 and s.isdigit() and alloc.taken(s) for s in ids))
+        self.assertEqual(len(alloc), 2000)
+        alloc.release(ids[0])
+        self.assertFalse(alloc.taken(ids[0]))
+        self.assertEqual(len(alloc), 1999)
+        alloc.mark(ids[0])
+        self.assertEqual(len(alloc), 2000)
+
+    def test_bitmap_is_only_written_for_large_stores(self):
+        small = self._synced([{"id": "000001"}])
+        small.flush()
+        self.assertFalse(os.path.exists(self.path))
+
+        large = self._synced([{"id": f"{i:06d}"} for i in range(1, PERSIST_IDS + 1)])
+        large.flush()
+        again = IdAllocator.load(self.path)
+        self.assertEqual(len(again), PERSIST_IDS)
+        self.assertTrue(again.taken("000001"))
+        self.assertNotIn(again.allocate(), {f"{i:06d}" for i in range(1, PERSIST_IDS + 1)})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os, shutil, tempfile, unittest
+
+from cliApp.core.db import Database
+from cliApp.core.repository import student_listing
+from cliApp.core.store import BACKENDS, open_store
+
+STUDENTS = [
+    {"id": f"{100001 + i}", "name": f"Student{i}", "email": f"student{i}@university.com",
+     "password": "Abcdef123", "subjects": [{"id": "001", "mark": 50 + i, "grade": "P"}]}
+    for i in range(12)
+]
+
+class StudentListingTest(unittest.TestCase):
+    # the admin "s" listing, on every storage backend
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if Database._store is not None:
+            Database._store.close()
+            Database._store = None
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def _use(self, kind):
+        folder = os.path.join(self.folder, kind)
+        os.makedirs(folder, exist_ok=True)
+        store = open_store(os.path.join(folder, "students.data"), kind)
+        store.upsert_many([dict(s) for s in STUDENTS])
+        Database.use(store)
+
+    def test_lists_every_student_in_order(self):
+        for kind in BACKENDS:
+            with self.subTest(kind=kind):
+                self._use(kind)
+                self.assertEqual(list(student_listing()), [(s["name"], s["id"], s["email"]) for s in STUDENTS])
+
+    def test_closes_when_stopped_early(self):
+        for kind in BACKENDS:
+            with self.subTest(kind=kind):
+                self._use(kind)
+                listing = student_listing()
+                self.assertEqual(next(listing), ("Student0", "100001", "student0@university.com"))
+                listing.close()
+                # the store is still usable after the early stop
+                self.assertEqual(len(list(student_listing())), len(STUDENTS))
+
+if __name__ == "__main__":
+    unittest.main()
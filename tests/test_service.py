@@ -0,0 +1,73 @@
+import asyncio, os, shutil, tempfile, threading, unittest
+
+from cliApp.core.store import open_store
+from cliApp.net.client import AsyncServiceClient, ServiceClient
+from cliApp.net.protocol import MAX_LINE, encode
+from cliApp.net.server import REPORT_PAGE, serve
+
+STUDENTS = 12_000   # a few report pages, each well past MAX_LINE with these names
+
+def cohort():
+    return [{"id": f"{100000 + i}", "name": f"Student{i} " + "x" * 300, "email": f"student{i}@university.com",
+             "password": "Abcdef123", "subjects": [{"id": "001", "mark": 40 + i % 60, "grade": "P"}]}
+            for i in range(STUDENTS)]
+
+class ServiceRoundTripTest(unittest.TestCase):
+    # a server on a unix socket in a thread of its own, and both clients against it
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.mkdtemp()
+        cls.store = open_store(os.path.join(cls.folder, "students.data"), "json")
+        cls.store.save_all(cohort())
+        cls.address = "unix:" + os.path.join(cls.folder, "uni.sock")
+        cls.loop = asyncio.new_event_loop()
+        listening = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(cls.loop)
+            cls.server = cls.loop.create_task(serve(cls.store, cls.address, ready=lambda _: listening.set()))
+            try:
+                cls.loop.run_until_complete(cls.server)
+            except asyncio.CancelledError:
+                pass
+        cls.thread = threading.Thread(target=run, daemon=True)
+        cls.thread.start()
+        if not listening.wait(30):
+            raise RuntimeError("server did not start")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.server.cancel)
+        cls.thread.join(30)
+        cls.loop.close()
+        cls.store.close()
+        shutil.rmtree(cls.folder, ignore_errors=True)
+
+    def _check_report(self, buckets):
+        rows = [row for rows in buckets.values() for row in rows]
+        self.assertEqual(len(rows), STUDENTS)
+        self.assertEqual(len({sid for sid, _, _ in rows}), STUDENTS)
+
+    def test_blocking_client(self):
+        with ServiceClient.connect(self.address) as client:
+            page = client.call("grades_by_grade")
+            self.assertEqual(len(page["rows"]), REPORT_PAGE)
+            self.assertGreater(len(encode(page)), MAX_LINE)
+            self._check_report(client.grades_by_grade())
+            self._check_report(client.grades_by_pass_fail())
+            # the connection is still in step after the large replies
+            self.assertEqual(client.authenticate("student7@university.com", "Abcdef123"), (True, ""))
+            self.assertEqual(client.get_student("student7@university.com")["id"], "100007")
+
+    def test_async_client(self):
+        async def run():
+            client = await AsyncServiceClient.connect(self.address)
+            try:
+                self._check_report(await client.grades_by_grade())
+                return await client.authenticate("student7@university.com", "wrong")
+            finally:
+                await client.close()
+        self.assertEqual(asyncio.run(run()), (False, "bad_password"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os, shutil, tempfile, unittest
+
+from cliApp.core.store import BACKENDS, StaleRecordError, open_store
+
+def student(n, *subjects):
+    return {"id": f"{100000 + n}", "name": f"Student{n}", "email": f"student{n}@university.com",
+            "password": "Abcdef123", "subjects": [{"id": sid, "mark": mark, "grade": grade} for sid, mark, grade in subjects]}
+
+def plain(records):
+    # what the stores must agree on, without the revisions
+    return sorted(({k: v for k, v in r.items() if k != "rev"} for r in records), key=lambda r: r["id"])
+
+class StoreTest(unittest.TestCase):
+    # the Store contract, on every storage backend
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def _open(self, kind):
+        folder = os.path.join(self.folder, kind)
+        os.makedirs(folder, exist_ok=True)
+        store = open_store(os.path.join(folder, "students.data"), kind)
+        self.stores.append(store)
+        return store
+
+    def test_round_trip(self):
+        for kind in BACKENDS:
+            with self.subTest(kind=kind):
+                store = self._open(kind)
+                store.upsert_many([student(1, ("001", 80, "D")), student(2), student(3, ("002", 40, "Z"))])
+                store.add_subject("100002", {"id": "003", "mark": 90, "grade": "HD"})
+                store.remove_subject("100001", "001")
+                self.assertTrue(store.delete("100003"))
+                self.assertFalse(store.delete("100003"))
+                expected = [student(1), student(2, ("003", 90, "HD"))]
+                self.assertEqual(plain(store.load_all()), expected)
+
+                # a second instance reads what the first wrote
+                again = self._open(kind)
+                self.assertEqual(plain(again.load_all()), expected)
+                self.assertEqual(again.count(), 2)
+                self.assertEqual(again.get("100002")["subjects"], [{"id": "003", "mark": 90, "grade": "HD"}])
+                self.assertEqual(again.find_by_email("STUDENT1@university.com")["id"], "100001")
+                self.assertIsNone(again.get("100003"))
+
+    def test_stale_revision_is_rejected(self):
+        for kind in BACKENDS:
+            with self.subTest(kind=kind):
+                store = self._open(kind)
+                store.upsert(student(1))
+                other = self._open(kind)
+                mine, theirs = store.get("100001"), other.get("100001")
+                mine["name"] = "Mine"
+                store.upsert(mine)
+                self.assertEqual(mine["rev"], theirs["rev"] + 1)
+
+                theirs["name"] = "Theirs"
+                with self.assertRaises(StaleRecordError):
+                    other.upsert(theirs)
+                # a batch with one stale record writes none of it
+                with self.assertRaises(StaleRecordError):
+                    other.commit([{"op": "upsert", "student": student(2)}, {"op": "upsert", "student": theirs}])
+                self.assertEqual([r["name"] for r in other.load_all()], ["Mine"])
+
+                # a record that does not exist yet has to come with revision 0
+                with self.assertRaises(StaleRecordError):
+                    other.upsert(dict(student(4), rev=3))
+
+if __name__ == "__main__":
+    unittest.main()